@@ -10,6 +10,17 @@ from models.user import User
 from config import config
 import sub.socket_events as socket_events
 import sub.app_config as app_config
+import sub.cli as cli
+import utils.template_filters as template_filters
+import utils.fragment_cache as fragment_cache
+import utils.image_pipeline as image_pipeline
+import utils.assets as assets
+import utils.compression as compression
+import utils.thumbnails as thumbnails
+from handlers.like_buffer import like_buffer
+from handlers.trending_handler import trending
+from handlers.badge_counter import badge_counter
+from handlers.ranking_handler import ranking_job
 
 # Import routes
 from routes.auth_routes import auth
@@ -18,6 +29,7 @@ from routes.profile_routes import profile
 from routes.message_routes import messages
 from routes.friendship_routes import friendship
 from routes.api_routes import api
+from routes.media_routes import media, thumbnails as thumbnail_routes
 from routes.err_routers import bp as err_bp
 
 def create_app(config_name='default'):
@@ -51,6 +63,8 @@ def create_app(config_name='default'):
     app.register_blueprint(messages, url_prefix='/messages')
     app.register_blueprint(friendship, url_prefix='/friendship')
     app.register_blueprint(api)
+    app.register_blueprint(media, url_prefix='/media')
+    app.register_blueprint(thumbnail_routes)
     app.register_blueprint(err_bp, url_prefix='/error')
 
     # Register error handlers
@@ -87,6 +101,39 @@ def create_app(config_name='default'):
     # Initialize application with JSON configuration
     app_config.init_app(app)
 
+    # Template filters, e.g. |datetime
+    template_filters.init_app(app)
+
+    # Cache rendered post cards
+    fragment_cache.init_app(app)
+
+    # Responsive post image helper for templates
+    image_pipeline.init_app(app)
+
+    # Fingerprinted CSS/JS bundles
+    assets.init_app(app)
+
+    # gzip/brotli responses, precompressed static files
+    compression.init_app(app)
+
+    # Resized avatars and image attachments
+    thumbnails.init_app(app)
+
+    # Buffer like toggles and flush them in batches
+    like_buffer.init_app(app)
+
+    # Restore trending counters and snapshot them periodically
+    trending.init_app(app)
+
+    # Unread message and friend request badges, pushed over Socket.IO
+    badge_counter.init_app(app)
+
+    # Rescore posts with new engagement for the ranked feed
+    ranking_job.init_app(app)
+
+    # Register maintenance CLI commands
+    cli.init_app(app)
+
     return app
 
 if __name__ == '__main__':
@@ -8,6 +8,67 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload size
 
+    # Home timeline: authors whose audience exceeds the threshold are merged
+    # at read time instead of being pushed to every follower on write
+    FEED_FANOUT_THRESHOLD = int(os.environ.get('FEED_FANOUT_THRESHOLD', 1000))
+    # A flagged author goes back to being pushed once their audience drops to this
+    FEED_FANOUT_RESUME_THRESHOLD = int(os.environ.get('FEED_FANOUT_RESUME_THRESHOLD', FEED_FANOUT_THRESHOLD * 4 // 5))
+    FEED_TIMELINE_BACKFILL = 50  # Recent posts copied into a timeline on follow
+
+    # How often posts with new likes or comments are rescored for the ranked feed
+    RANKING_RESCORE_INTERVAL_S = 60
+
+    # Byte budget of the in-process rendered post card cache
+    FRAGMENT_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+    # Write-behind like buffer, flushed in batched transactions
+    LIKE_BUFFER_ENABLED = True
+    LIKE_FLUSH_INTERVAL_MS = 250
+
+    # Trending: sliding window of per-minute engagement counters
+    TRENDING_WINDOW_MINUTES = 60
+    TRENDING_TOP_K = 50
+    TRENDING_SNAPSHOT_INTERVAL_S = 300  # How often the top posts are saved to the database
+
+    # Unread message / pending friend request badges cached per user
+    BADGE_RECONCILE_INTERVAL_S = 300  # How often cached counts are checked against the database
+    BADGE_CACHE_MAX_USERS = 10000
+
+    # Most messages one conversation history API request may return
+    MESSAGES_PAGE_MAX_LIMIT = 100
+
+    # Responsive post image variants (data-saver width/quality come from config.json)
+    IMAGE_VARIANT_WIDTHS = (320, 640, 960, 1280)
+    IMAGE_QUALITY = 80
+    IMAGE_PIPELINE_WORKERS = 2
+
+    # Resumable chunked message attachment uploads; partial files stay out of static/
+    CHUNKED_UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance/uploads')
+    CHUNKED_UPLOAD_MAX_SIZE = 100 * 1024 * 1024
+    CHUNKED_UPLOAD_CHUNK_SIZE = 1024 * 1024  # Suggested to clients; each PUT stays under MAX_CONTENT_LENGTH
+    CHUNKED_UPLOAD_TTL_HOURS = 24  # Unfinished uploads older than this are pruned
+
+    # Message attachments live outside static/ and are only served after the participant check
+    MESSAGE_ATTACHMENT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance/message_attachments')
+
+    # Upload serving: None sends files from the app, 'x-accel-redirect' (nginx, with internal
+    # locations at MEDIA_ACCEL_PREFIX aliased to static/ and MEDIA_ACCEL_ATTACHMENT_PREFIX
+    # aliased to MESSAGE_ATTACHMENT_FOLDER) or 'x-sendfile' offloads them
+    MEDIA_SENDFILE_MODE = os.environ.get('MEDIA_SENDFILE_MODE')
+    MEDIA_ACCEL_PREFIX = '/protected/'
+    MEDIA_ACCEL_ATTACHMENT_PREFIX = '/protected-attachments/'
+    MEDIA_MAX_AGE = 86400
+
+    # On-demand thumbnails: only these (width, height) pairs are rendered; height 0 keeps the aspect ratio
+    THUMBNAIL_SIZES = ((64, 64), (72, 72), (80, 80), (96, 96), (120, 120), (160, 160), (200, 200),
+                       (320, 0), (640, 0))
+    THUMBNAIL_CACHE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance/thumbnails')
+    THUMBNAIL_CACHE_MAX_BYTES = 256 * 1024 * 1024
+    THUMBNAIL_QUALITY = 82
+
+    # Responses smaller than this are sent uncompressed (level/enabled come from config.json)
+    COMPRESSION_MIN_SIZE = 1024
+
 class DevelopmentConfig(Config):
     """Development configuration."""
     DEBUG = True
@@ -17,6 +78,7 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test.db'
     WTF_CSRF_ENABLED = False
+    LIKE_BUFFER_ENABLED = False  # Write likes through so tests see them immediately
 
 class ProductionConfig(Config):
     """Production configuration."""
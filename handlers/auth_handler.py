@@ -3,8 +3,9 @@ from flask_login import login_user, current_user, logout_user
 from flask_bcrypt import Bcrypt
 from datetime import datetime, timezone
 from models.user import User
+from models.post import Post
 from utils.db_utils import commit_to_db
-from utils.auth_utils import save_profile_picture
+from utils.auth_utils import save_profile_picture, release_profile_picture
 
 bcrypt = Bcrypt()
 
@@ -54,8 +55,8 @@ def login_handler(form):
 
             # If no specific page requested, check for unread messages
             if not next_page:
-                from models.message import Message
-                unread_count = Message.query.filter_by(recipient_id=user.id, read=False).count()
+                from handlers.badge_counter import badge_counter
+                unread_count = badge_counter.get(user.id)['messages']
 
                 # If there are unread messages, redirect to inbox
                 if unread_count > 0:
@@ -87,8 +88,9 @@ def update_profile_handler(form):
     if form.validate_on_submit():
         # Update profile picture if provided
         if form.picture.data:
-            picture_file = save_profile_picture(form.picture.data)
-            current_user.profile_image = picture_file
+            old_picture = current_user.profile_image
+            current_user.set_profile_image(save_profile_picture(form.picture.data))
+            release_profile_picture(old_picture)
 
         # Update user information
         current_user.username = form.username.data
@@ -97,6 +99,9 @@ def update_profile_handler(form):
         current_user.last_name = form.last_name.data
         current_user.bio = form.bio.data
 
+        # Author details are rendered on every post card
+        Post.bump_author_versions(current_user.id)
+
         # Save changes
         commit_to_db()
 
@@ -0,0 +1,258 @@
+"""
+Unread message and pending friend request badges.
+
+Per-user counts are cached in memory and adjusted incrementally: every
+flush records the changes to unread messages and pending friend requests,
+and they are applied once the transaction commits. Changed counts are
+pushed to the user's Socket.IO ``user_{id}`` room as ``badge_counts``, and
+a background task periodically reconciles cached users against SQL.
+"""
+
+import threading
+from collections import OrderedDict
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from models import db
+from models.message import Message
+from models.friendship import FriendRequest
+
+BADGE_KINDS = ('messages', 'friend_requests')
+
+# session.info key of the count changes made by the current transaction
+PENDING_BADGE_DELTAS = 'badge_deltas'
+
+class BadgeCounter:
+    """In-process cache of per-user badge counts."""
+
+    def __init__(self):
+        self._counts = OrderedDict()  # user_id -> {kind: count}, least recently used first
+        self._versions = {}           # user_id -> number of changes applied since cached
+        self._lock = threading.Lock()
+        self._app = None
+        self._running = False
+        self.interval = 300
+        self.max_users = 10000
+
+    def init_app(self, app):
+        """Bind the counter to an application and push counts to templates."""
+        self._app = app
+        self.interval = app.config.get('BADGE_RECONCILE_INTERVAL_S', self.interval)
+        self.max_users = app.config.get('BADGE_CACHE_MAX_USERS', self.max_users)
+
+        @app.context_processor
+        def inject_badge_counts():
+            from flask_login import current_user
+            if not current_user.is_authenticated:
+                return {'badge_counts': None}
+            return {'badge_counts': self.get(current_user.id)}
+
+    def _query(self, user_ids):
+        """Count unread messages and pending friend requests in SQL.
+
+        Returns:
+            dict: user_id -> {kind: count}
+        """
+        counts = {user_id: dict.fromkeys(BADGE_KINDS, 0) for user_id in user_ids}
+        queries = (
+            ('messages', db.select(Message.recipient_id, func.count(Message.id))
+                .where(Message.read.is_(False))
+                .group_by(Message.recipient_id), Message.recipient_id),
+            ('friend_requests', db.select(FriendRequest.recipient_id, func.count(FriendRequest.id))
+                .where(FriendRequest.is_pending())
+                .group_by(FriendRequest.recipient_id), FriendRequest.recipient_id),
+        )
+        ids = list(user_ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            for kind, query, column in queries:
+                for user_id, count in db.session.execute(query.where(column.in_(chunk))):
+                    counts[user_id][kind] = count
+        return counts
+
+    def _store(self, user_id, counts):
+        """Cache a user's counts. Caller holds the lock."""
+        self._counts[user_id] = counts
+        self._counts.move_to_end(user_id)
+        self._versions.setdefault(user_id, 0)
+        while len(self._counts) > self.max_users:
+            evicted, _ = self._counts.popitem(last=False)
+            self._versions.pop(evicted, None)
+
+    def get(self, user_id):
+        """Get a user's badge counts, loading them from SQL on a miss.
+
+        Returns:
+            dict: ``{'messages': int, 'friend_requests': int}``
+        """
+        with self._lock:
+            counts = self._counts.get(user_id)
+            if counts is not None:
+                self._counts.move_to_end(user_id)
+                return dict(counts)
+
+        counts = self._query([user_id])[user_id]
+        with self._lock:
+            # A commit may have cached newer counts while we queried
+            if user_id not in self._counts:
+                self._store(user_id, counts)
+            counts = dict(self._counts[user_id])
+
+        self._ensure_running()
+        return counts
+
+    def apply(self, deltas):
+        """Apply committed count changes and push them to the users.
+
+        Args:
+            deltas (dict): ``(user_id, kind)`` -> change in count
+        """
+        changed = {}
+        uncached = set()
+        with self._lock:
+            for (user_id, kind), delta in deltas.items():
+                counts = self._counts.get(user_id)
+                if counts is None:
+                    uncached.add(user_id)
+                    continue
+                counts[kind] = max(counts[kind] + delta, 0)
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+                changed[user_id] = dict(counts)
+
+        for user_id, counts in changed.items():
+            self.push(user_id, counts)
+        if uncached and self._app is not None:
+            # The session can't query after its commit; load them off the request
+            from sub.socket_events import socketio
+            socketio.start_background_task(self._push_fresh, uncached)
+
+    def _push_fresh(self, user_ids):
+        try:
+            with self._app.app_context():
+                for user_id in user_ids:
+                    self.push(user_id, self.get(user_id))
+        except Exception as e:
+            print(f"Error pushing badge counts: {str(e)}")
+
+    def push(self, user_id, counts):
+        """Send a user's badge counts to their open pages."""
+        from sub.socket_events import socketio
+        try:
+            socketio.emit('badge_counts', counts, room=f'user_{user_id}')
+        except Exception as e:
+            print(f"Error pushing badge counts to user {user_id}: {str(e)}")
+
+    def reconcile(self):
+        """Correct cached counts that have drifted from the database.
+
+        Returns:
+            int: Number of users whose counts were corrected
+        """
+        with self._lock:
+            snapshot = dict(self._versions)
+        if not snapshot:
+            return 0
+
+        fresh = self._query(snapshot)
+        corrected = {}
+        with self._lock:
+            for user_id, counts in fresh.items():
+                # Skip users changed while we queried; the next run checks them
+                if self._versions.get(user_id) != snapshot[user_id]:
+                    continue
+                if self._counts.get(user_id) != counts:
+                    self._counts[user_id] = counts
+                    corrected[user_id] = dict(counts)
+
+        for user_id, counts in corrected.items():
+            self.push(user_id, counts)
+        return len(corrected)
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self._versions.clear()
+
+    def _ensure_running(self):
+        if self._running or self._app is None:
+            return
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+
+        from sub.socket_events import socketio
+        socketio.start_background_task(self._run)
+
+    def _run(self):
+        from sub.socket_events import socketio
+        while True:
+            socketio.sleep(self.interval)
+            try:
+                with self._app.app_context():
+                    self.reconcile()
+            except Exception as e:
+                print(f"Error in badge reconcile loop: {str(e)}")
+
+badge_counter = BadgeCounter()
+
+def record_badge_change(session, user_id, kind, delta):
+    """Change a user's count once the session's transaction commits.
+
+    Flushed ORM changes are recorded automatically; bulk UPDATE/DELETE
+    statements bypass the flush and report their changes through this.
+    """
+    pending = session.info.setdefault(PENDING_BADGE_DELTAS, {})
+    key = (user_id, kind)
+    pending[key] = pending.get(key, 0) + delta
+
+def _changed(obj, attribute):
+    """Return ``(old, new)`` for an attribute changed in this flush, or None."""
+    history = db.inspect(obj).attrs[attribute].history
+    if history.added and history.deleted:
+        return history.deleted[0], history.added[0]
+    return None
+
+@event.listens_for(FriendRequest.status, 'set', active_history=True)
+def _load_previous_status(target, value, oldvalue, initiator):
+    """Load a request's stored status before it is overwritten.
+
+    Does nothing itself: registering with ``active_history=True`` makes
+    SQLAlchemy load the old value when the status is set on an expired
+    request, so a flush can tell a real transition from writing the same
+    value again. ``Message.read`` gets the same in models/message.py.
+    """
+
+@event.listens_for(Session, 'after_flush')
+def _record_badge_changes(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, Message) and not obj.read:
+            record_badge_change(session, obj.recipient_id, 'messages', 1)
+        elif isinstance(obj, FriendRequest) and obj.status == 'pending':
+            record_badge_change(session, obj.recipient_id, 'friend_requests', 1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Message):
+            change = _changed(obj, 'read')
+            if change and bool(change[0]) != bool(change[1]):
+                record_badge_change(session, obj.recipient_id, 'messages', -1 if change[1] else 1)
+        elif isinstance(obj, FriendRequest):
+            change = _changed(obj, 'status')
+            if change and (change[0] == 'pending') != (change[1] == 'pending'):
+                record_badge_change(session, obj.recipient_id, 'friend_requests',
+                                    1 if change[1] == 'pending' else -1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Message) and not obj.read:
+            record_badge_change(session, obj.recipient_id, 'messages', -1)
+        elif isinstance(obj, FriendRequest) and obj.status == 'pending':
+            record_badge_change(session, obj.recipient_id, 'friend_requests', -1)
+
+@event.listens_for(Session, 'after_commit')
+def _apply_badge_changes(session):
+    deltas = session.info.pop(PENDING_BADGE_DELTAS, None)
+    if deltas:
+        badge_counter.apply({key: delta for key, delta in deltas.items() if delta})
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_badge_changes(session):
+    session.info.pop(PENDING_BADGE_DELTAS, None)
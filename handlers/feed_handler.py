@@ -1,27 +1,99 @@
-from flask import flash, redirect, url_for
+from flask import flash, redirect, url_for, request, jsonify
 from flask_login import current_user
 from models.post import Post, Like
 from models.comment import Comment
+from models.trending import TrendingSnapshot
 from utils.db_utils import commit_to_db, delete_from_db
-import os
+from utils.pagination import paginate_keyset
+from utils.image_pipeline import process_post_image, variant_paths
+from utils.blob_store import store_blob, release_blob, discard_files
+from handlers.like_buffer import like_buffer
+from datetime import datetime
+from PIL import Image
+from sqlalchemy.orm import selectinload
 from flask import current_app
 
-def get_posts(page=1, per_page=10):
-    """Get paginated posts for the feed."""
-    return Post.query.order_by(Post.created_at.desc()).paginate(page=page, per_page=per_page)
+def get_posts(page=1, per_page=10, before=None):
+    """Get a page of posts for the feed.
+
+    With ``page=None`` the feed is paged by keyset on ``(created_at, id)``:
+    ``before`` is the opaque cursor of the previous page and no total count
+    is computed. Otherwise the classic page-number pagination is used.
+
+    Each page is loaded in a fixed number of queries regardless of its size:
+    the page itself, its authors (selectinload) and the viewer's likes.
+    Like and comment totals come from the denormalized counters on Post.
+    """
+    query = Post.query.options(selectinload(Post.author))
+
+    if page is None:
+        posts = paginate_keyset(query, (Post.created_at, Post.id), before=before, per_page=per_page)
+    else:
+        posts = query.order_by(Post.created_at.desc())\
+            .paginate(page=page, per_page=per_page)
+
+    attach_viewer_state(posts.items, current_user.id)
+    return posts
+
+def attach_viewer_state(posts, viewer_id):
+    """Project per-viewer state onto a page of posts.
+
+    Sets ``post.liked_by_viewer`` on every post using a single
+    ``SELECT post_id FROM likes WHERE user_id = ? AND post_id IN (...)``
+    query over the page, instead of loading ``post.likes`` per post.
+
+    Args:
+        posts: Iterable of Post objects
+        viewer_id: ID of the user viewing the posts
+
+    Returns:
+        The same posts, for chaining.
+    """
+    posts = list(posts)
+    post_ids = [post.id for post in posts]
+    liked_ids = set()
+
+    if post_ids:
+        liked_ids = {
+            post_id for (post_id,) in Like.query
+            .with_entities(Like.post_id)
+            .filter(Like.user_id == viewer_id, Like.post_id.in_(post_ids))
+        }
+
+    for post in posts:
+        post.liked_by_viewer = post.id in liked_ids
+
+    # Read-your-writes: apply the viewer's likes still waiting to be flushed
+    like_buffer.overlay(posts, viewer_id, liked_ids)
+
+    return posts
 
 def create_post_handler(form):
     """Handle post creation."""
     if form.validate_on_submit():
+        # Save the image first, so an unreadable one leaves nothing behind
+        image = None
+        if form.image.data:
+            image = save_post_image(form.image.data)
+            if image is None:
+                return _reject_image(form)
+
         post = Post(content=form.content.data, author=current_user)
+
+        # Seed the ranking score; the ranking job refines it later
+        from handlers.ranking_handler import initial_score
+        post.created_at = datetime.utcnow()
+        post.score = initial_score(post)
         
-        # Handle image upload if provided
-        if form.image.data:
-            # Save the image
-            image_file = save_post_image(form.image.data)
-            post.image = image_file
+        if image:
+            post.set_image(image)
         
         commit_to_db(post)
+
+        # Push the post into the author's audience timelines
+        from handlers.timeline_handler import fan_out_post
+        fan_out_post(post)
+
         flash('Your post has been created!', 'success')
         return redirect(url_for('feed.index'))
     
@@ -37,17 +109,20 @@ def update_post_handler(post_id, form):
         return redirect(url_for('feed.index'))
     
     if form.validate_on_submit():
-        post.content = form.content.data
-        
         # Handle image update if provided
         if form.image.data:
-            # Delete old image if it exists
-            if post.image:
-                delete_post_image(post.image)
-            
-            # Save the new image
-            image_file = save_post_image(form.image.data)
-            post.image = image_file
+            image = save_post_image(form.image.data)
+            if image is None:
+                return _reject_image(form)
+
+            # Point the post at the new image, then release the old one if it exists
+            old_image = (post.image, post.image_widths)
+            post.set_image(image)
+            if old_image[0]:
+                release_post_image(*old_image)
+
+        post.content = form.content.data
+        post.version = Post.version + 1
         
         commit_to_db()
         flash('Your post has been updated!', 'success')
@@ -67,14 +142,56 @@ def delete_post_handler(post_id):
         flash('You do not have permission to delete this post.', 'danger')
         return redirect(url_for('feed.index'))
     
-    # Delete post image if it exists
-    if post.image:
-        delete_post_image(post.image)
-    
-    delete_from_db(post)
+    if not bulk_delete_post(post):
+        flash('Your post could not be deleted. Please try again.', 'danger')
+        return redirect(url_for('feed.view_post', post_id=post_id))
+
     flash('Your post has been deleted!', 'success')
     return redirect(url_for('feed.index'))
 
+def bulk_delete_post(post):
+    """Delete a post and everything that depends on it with set-based statements.
+
+    Instead of letting the ORM cascade load every like and comment into the
+    session and delete them one by one, this issues one
+    ``DELETE ... WHERE post_id = ?`` per dependent table plus the post
+    itself, all in a single transaction. The image files are removed only
+    after the commit succeeds and once no other post shares them, in a
+    background task off the request.
+
+    Args:
+        post: The Post to delete
+
+    Returns:
+        bool: True if the post was deleted, False otherwise.
+    """
+    from models import db
+    from handlers.timeline_handler import remove_post_from_timelines
+
+    post_id = post.id
+    try:
+        if post.image:
+            release_post_image(post.image, post.image_widths)
+        Like.query.filter_by(post_id=post_id).delete(synchronize_session=False)
+        Comment.query.filter_by(post_id=post_id).delete(synchronize_session=False)
+        remove_post_from_timelines(post_id)
+        TrendingSnapshot.query.filter_by(post_id=post_id).delete(synchronize_session=False)
+        Post.query.filter_by(id=post_id).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error deleting post: {str(e)}")
+        return False
+
+    # The deleted rows may still be in the identity map; drop them
+    db.session.expunge(post)
+    like_buffer.discard_post(post_id)
+
+    from handlers.trending_handler import trending
+    trending.discard(post_id)
+
+    return True
+
 def create_comment_handler(post_id, form):
     """Handle comment creation."""
     post = Post.query.get_or_404(post_id)
@@ -85,46 +202,126 @@ def create_comment_handler(post_id, form):
             post=post,
             author=current_user
         )
+        Post.adjust_counters(post.id, comments=1)
         commit_to_db(comment)
+
+        from handlers.trending_handler import trending
+        trending.record(post.id, comments=1)
         flash('Your comment has been added!', 'success')
         return redirect(url_for('feed.view_post', post_id=post_id))
     
     return None  # Form validation failed
 
 def like_post_handler(post_id):
-    """Handle post like/unlike."""
+    """Handle post like/unlike.
+
+    With LIKE_BUFFER_ENABLED the toggle goes to the write-behind buffer and
+    is flushed in batches; otherwise it is written through immediately.
+    AJAX callers asking for JSON get the new state instead of a redirect.
+    """
     post = Post.query.get_or_404(post_id)
     
-    # Check if the user already liked the post
-    like = Like.query.filter_by(user_id=current_user.id, post_id=post_id).first()
-    
-    if like:
-        # Unlike the post
-        delete_from_db(like)
-        flash('Post unliked!', 'info')
+    if current_app.config.get('LIKE_BUFFER_ENABLED'):
+        liked = like_buffer.toggle(current_user.id, post.id)
     else:
-        # Like the post
-        like = Like(user_id=current_user.id, post_id=post_id)
-        commit_to_db(like)
+        # Check if the user already liked the post
+        like = Like.query.filter_by(user_id=current_user.id, post_id=post_id).first()
+        
+        if like:
+            # Unlike the post
+            Post.adjust_counters(post.id, likes=-1)
+            delete_from_db(like)
+            liked = False
+        else:
+            # Like the post
+            like = Like(user_id=current_user.id, post_id=post_id)
+            Post.adjust_counters(post.id, likes=1)
+            commit_to_db(like)
+            liked = True
+
+    from handlers.trending_handler import trending
+    trending.record(post.id, likes=1 if liked else -1)
+
+    if request.accept_mimetypes.best == 'application/json':
+        attach_viewer_state([post], current_user.id)
+        return jsonify({'post_id': post.id, 'liked': post.liked_by_viewer, 'like_count': post.like_count})
+
+    if liked:
         flash('Post liked!', 'success')
+    else:
+        flash('Post unliked!', 'info')
     
     return redirect(url_for('feed.view_post', post_id=post_id))
 
+def get_comments(post_id, before=None, per_page=20):
+    """Get a page of a post's comments, newest first.
+
+    Paged by keyset on ``(created_at, id)`` within the post, which the
+    ``(post_id, created_at, id)`` index serves directly; comment authors
+    are batch-loaded with selectinload.
+
+    Args:
+        post_id: ID of the post
+        before (str): Cursor token of the previous page
+        per_page (int): Number of comments per page
+
+    Returns:
+        CursorPage: The comments and the cursor for the next page
+    """
+    query = Comment.query.options(selectinload(Comment.author))\
+        .filter(Comment.post_id == post_id)
+    return paginate_keyset(query, (Comment.created_at, Comment.id), before=before, per_page=per_page)
+
+def reconcile_post_counters():
+    """Recompute every post's like and comment counters from the source tables.
+
+    Used to backfill the counters after the columns are added and to repair
+    any drift. Runs as one set-based UPDATE with correlated subqueries.
+
+    Returns:
+        int: Number of posts updated.
+    """
+    from sqlalchemy import func, select
+    from models import db
+
+    like_total = select(func.count(Like.id))\
+        .where(Like.post_id == Post.id).scalar_subquery()
+    comment_total = select(func.count(Comment.id))\
+        .where(Comment.post_id == Post.id).scalar_subquery()
+
+    updated = Post.query.update({
+        Post.like_count: like_total,
+        Post.comment_count: comment_total
+    }, synchronize_session=False)
+    db.session.commit()
+    return updated
+
 def save_post_image(form_image):
-    """Save post image with a random name."""
-    import secrets
-    random_hex = secrets.token_hex(8)
-    _, f_ext = os.path.splitext(form_image.filename)
-    image_fn = random_hex + f_ext
-    image_path = os.path.join(current_app.root_path, 'static/img/post_images', image_fn)
-    
-    # Save the image
-    form_image.save(image_path)
-    
-    return image_fn
+    """Save a post image as responsive variants, reusing identical uploads.
+
+    Returns:
+        StoredBlob: The stored image, see ``Post.set_image``, or None if
+        the upload is not an image Pillow can decode
+    """
+    try:
+        return store_blob('post_images', form_image, process_post_image)
+    except (OSError, Image.DecompressionBombError) as e:
+        # UnidentifiedImageError and truncated files are OSErrors
+        print(f"Error processing post image {form_image.filename}: {str(e)}")
+        return None
+
+def _reject_image(form):
+    """Report an unreadable image on the post form, which is shown again."""
+    form.image.errors.append('This image could not be read. Please upload a JPG or PNG file.')
+    # Nothing was stored, so there is no preview to show
+    form.image.data = None
+    return None
+
+def release_post_image(image_filename, image_widths=None):
+    """Drop a post's reference to its image.
 
-def delete_post_image(image_filename):
-    """Delete post image from the filesystem."""
-    image_path = os.path.join(current_app.root_path, 'static/img/post_images', image_filename)
-    if os.path.exists(image_path):
-        os.remove(image_path)
+    The variants are removed after the commit once no post uses them any
+    more; images uploaded before the blob store are always removed.
+    """
+    if release_blob('post_images', image_filename) is not False:
+        discard_files(variant_paths(image_filename, image_widths))
@@ -3,6 +3,7 @@ from flask_login import current_user
 from models.user import User
 from models.friendship import FriendRequest, Friendship, Follow
 from utils.db_utils import commit_to_db, delete_from_db
+from handlers.timeline_handler import backfill_timeline, prune_timeline
 
 def send_friend_request_handler(username):
     """Handle sending a friend request."""
@@ -60,6 +61,10 @@ def accept_friend_request_handler(username):
     commit_to_db(friend_request)
     commit_to_db(friendship1)
     commit_to_db(friendship2)
+
+    # Each new friend's recent posts show up in the other's timeline
+    backfill_timeline(current_user.id, user.id)
+    backfill_timeline(user.id, current_user.id)
     
     flash(f'You are now friends with {user.first_name} {user.last_name}.', 'success')
     return redirect(url_for('profile.view', username=username))
@@ -112,6 +117,9 @@ def unfriend_handler(username):
     
     if friendship2:
         delete_from_db(friendship2)
+
+    prune_timeline(current_user.id, user.id)
+    prune_timeline(user.id, current_user.id)
     
     flash(f'You are no longer friends with {user.first_name} {user.last_name}.', 'info')
     return redirect(url_for('profile.view', username=username))
@@ -133,6 +141,7 @@ def follow_user_handler(username):
     # Create a new follow relationship
     follow = Follow(follower_id=current_user.id, followed_id=user.id)
     commit_to_db(follow)
+    backfill_timeline(current_user.id, user.id)
     
     flash(f'You are now following {user.first_name} {user.last_name}.', 'success')
     return redirect(url_for('profile.view', username=username))
@@ -144,13 +153,14 @@ def unfollow_user_handler(username):
     # Find and delete the follow relationship
     follow = Follow.query.filter_by(follower_id=current_user.id, followed_id=user.id).first_or_404()
     delete_from_db(follow)
+    prune_timeline(current_user.id, user.id)
     
     flash(f'You have unfollowed {user.first_name} {user.last_name}.', 'info')
     return redirect(url_for('profile.view', username=username))
 
 def get_friend_requests(page=1, per_page=10):
     """Get paginated friend requests for the current user."""
-    return FriendRequest.query.filter_by(recipient_id=current_user.id, status='pending')\
+    return FriendRequest.query.filter(FriendRequest.recipient_id == current_user.id, FriendRequest.is_pending())\
         .order_by(FriendRequest.created_at.desc())\
         .paginate(page=page, per_page=per_page)
 
@@ -0,0 +1,195 @@
+"""
+Write-behind like ingestion.
+
+Like toggles are collected in memory, keyed by (user, post), so repeated
+toggles by the same user collapse into the final desired state. A
+background task flushes the buffer every LIKE_FLUSH_INTERVAL_MS in one
+transaction: bulk INSERT/DELETE on ``likes`` plus one counter UPDATE per
+touched post. Reads overlay the viewer's own pending toggles so users
+always see their own likes, and the buffer is drained on shutdown.
+"""
+
+import atexit
+import threading
+from sqlalchemy import insert, tuple_
+from sqlalchemy.orm.attributes import set_committed_value
+from models import db
+from models.post import Post, Like
+
+class LikeBuffer:
+    """In-memory buffer of pending like toggles."""
+
+    def __init__(self):
+        self._pending = {}   # (user_id, post_id) -> desired liked state
+        self._inflight = {}  # Entries currently being flushed
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._app = None
+        self._running = False
+        self.interval = 0.25
+
+    def init_app(self, app):
+        """Bind the buffer to an application and drain it at interpreter exit."""
+        if self._app is None:
+            atexit.register(self.drain)
+        self._app = app
+        self.interval = app.config.get('LIKE_FLUSH_INTERVAL_MS', 250) / 1000.0
+
+    def _stored_state(self, user_id, post_id):
+        return Like.query.filter_by(user_id=user_id, post_id=post_id).first() is not None
+
+    def toggle(self, user_id, post_id):
+        """Toggle a user's like on a post.
+
+        Returns:
+            bool: True if the post is now liked by the user
+        """
+        key = (user_id, post_id)
+        with self._lock:
+            current = self._pending.get(key, self._inflight.get(key))
+
+        if current is None:
+            current = self._stored_state(user_id, post_id)
+
+        with self._lock:
+            # Another request may have toggled while we read the database
+            current = self._pending.get(key, self._inflight.get(key, current))
+            self._pending[key] = not current
+
+        self._ensure_running()
+        return not current
+
+    def overlay(self, posts, viewer_id, stored_liked_ids):
+        """Apply the viewer's unflushed toggles to a page of posts.
+
+        Sets ``liked_by_viewer`` and adjusts the displayed ``like_count``
+        without marking the posts dirty. Posts with a pending toggle get
+        ``viewer_pending`` so cached markup is bypassed for them.
+
+        Args:
+            posts: Post objects on the page
+            viewer_id: ID of the viewing user
+            stored_liked_ids: IDs of posts the viewer has liked in the database
+        """
+        with self._lock:
+            if not self._pending and not self._inflight:
+                return
+            states = {}
+            for post in posts:
+                key = (viewer_id, post.id)
+                state = self._pending.get(key, self._inflight.get(key))
+                if state is not None:
+                    states[post.id] = state
+
+        for post in posts:
+            state = states.get(post.id)
+            if state is None:
+                continue
+            stored = post.id in stored_liked_ids
+            post.liked_by_viewer = state
+            post.viewer_pending = True
+            if state != stored:
+                set_committed_value(post, 'like_count', post.like_count + (1 if state else -1))
+
+    def discard_post(self, post_id):
+        """Drop pending toggles for a post that has been deleted."""
+        with self._lock:
+            for key in [key for key in self._pending if key[1] == post_id]:
+                del self._pending[key]
+
+    def flush(self):
+        """Write every pending toggle to the database in one transaction.
+
+        Returns:
+            int: Number of toggles written
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._inflight, self._pending = self._pending, {}
+                batch = dict(self._inflight)
+
+            try:
+                written = self._write(batch)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error flushing likes: {str(e)}")
+                with self._lock:
+                    # Re-queue toggles that were not superseded meanwhile
+                    for key, state in batch.items():
+                        self._pending.setdefault(key, state)
+                    self._inflight = {}
+                return 0
+
+            with self._lock:
+                self._inflight = {}
+            return written
+
+    def _write(self, batch):
+        # Skip toggles on posts deleted since they were buffered
+        post_ids = {post_id for _, post_id in batch}
+        live = set(db.session.scalars(db.select(Post.id).where(Post.id.in_(post_ids))))
+        batch = {key: liked for key, liked in batch.items() if key[1] in live}
+
+        keys = list(batch)
+        existing = set()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            existing.update(db.session.execute(
+                db.select(Like.user_id, Like.post_id)
+                .where(tuple_(Like.user_id, Like.post_id).in_(chunk))
+            ).tuples())
+
+        to_insert = [key for key, liked in batch.items() if liked and key not in existing]
+        to_delete = [key for key, liked in batch.items() if not liked and key in existing]
+
+        deltas = {}
+        for _, post_id in to_insert:
+            deltas[post_id] = deltas.get(post_id, 0) + 1
+        for _, post_id in to_delete:
+            deltas[post_id] = deltas.get(post_id, 0) - 1
+
+        if to_insert:
+            db.session.execute(insert(Like), [
+                {'user_id': user_id, 'post_id': post_id} for user_id, post_id in to_insert
+            ])
+        for start in range(0, len(to_delete), 500):
+            chunk = to_delete[start:start + 500]
+            Like.query.filter(tuple_(Like.user_id, Like.post_id).in_(chunk))\
+                .delete(synchronize_session=False)
+        for post_id, delta in deltas.items():
+            Post.adjust_counters(post_id, likes=delta)
+
+        db.session.commit()
+        return len(to_insert) + len(to_delete)
+
+    def drain(self):
+        """Flush whatever is left in the buffer, e.g. on shutdown."""
+        if self._app is None:
+            return
+        with self._app.app_context():
+            self.flush()
+
+    def _ensure_running(self):
+        if self._running or self._app is None:
+            return
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+
+        from sub.socket_events import socketio
+        socketio.start_background_task(self._run)
+
+    def _run(self):
+        from sub.socket_events import socketio
+        while True:
+            socketio.sleep(self.interval)
+            try:
+                with self._app.app_context():
+                    self.flush()
+            except Exception as e:
+                print(f"Error in like flush loop: {str(e)}")
+
+like_buffer = LikeBuffer()
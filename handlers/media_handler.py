@@ -0,0 +1,200 @@
+"""
+Media file serving for uploads.
+
+Files are sent with byte-range and conditional GET support. In production
+the transfer can be handed to the front-end server with X-Accel-Redirect
+(nginx) or X-Sendfile (Apache, lighttpd), so a large download never ties
+up an application worker.
+"""
+
+import mimetypes
+import os
+from urllib.parse import quote
+from flask import abort, current_app, request, send_file
+from flask_login import current_user
+from werkzeug.security import safe_join
+from models.message import Message
+from utils.blob_store import namespace_folder
+
+# Namespaces anyone may read; message attachments go through the ACL
+PUBLIC_NAMESPACES = ('post_images', 'profile_pics')
+
+def _offload(path, mimetype):
+    """Build an empty response telling the front-end server to send the file."""
+    mode = current_app.config.get('MEDIA_SENDFILE_MODE')
+    if mode == 'x-accel-redirect':
+        root, prefix = current_app.static_folder, current_app.config.get('MEDIA_ACCEL_PREFIX', '/protected/')
+        attachments = namespace_folder('message_attachments')
+        if os.path.commonpath([path, attachments]) == attachments:
+            root, prefix = attachments, current_app.config.get('MEDIA_ACCEL_ATTACHMENT_PREFIX',
+                                                               '/protected-attachments/')
+        relative = os.path.relpath(path, root).replace(os.sep, '/')
+        location = prefix.rstrip('/') + '/' + quote(relative)
+        header = ('X-Accel-Redirect', location)
+    elif mode == 'x-sendfile':
+        header = ('X-Sendfile', path)
+    else:
+        return None
+
+    response = current_app.response_class(mimetype=mimetype)
+    response.headers[header[0]] = header[1]
+    return response
+
+def send_media(path, private=False, download_name=None):
+    """Send an uploaded file.
+
+    Without an offload mode the file object is passed to the WSGI server,
+    which sends it with zero-copy sendfile when it provides
+    ``wsgi.file_wrapper``; Range and If-None-Match/If-Modified-Since are
+    answered with 206 and 304 responses.
+
+    Args:
+        path (str): Absolute path of the file
+        private (bool): Only the requesting user may cache the response
+        download_name (str): Filename offered to the browser
+
+    Returns:
+        Response: The file response
+    """
+    if not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    max_age = current_app.config.get('MEDIA_MAX_AGE', 86400)
+
+    response = _offload(path, mimetype)
+    if response is None:
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=True, max_age=max_age)
+
+    if download_name:
+        response.headers.set('Content-Disposition', 'inline', filename=download_name)
+
+    # Stored names are random and never reused, so the content never changes
+    if private:
+        response.headers['Cache-Control'] = f'private, max-age={max_age}'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={max_age}, immutable'
+    return response
+
+def get_attachment_path(message_id):
+    """Resolve a message attachment the current user may read.
+
+    Returns:
+        tuple: ``(message, absolute path)``; aborts with 403/404 otherwise
+    """
+    message = Message.query.get_or_404(message_id)
+    if not message.is_participant(current_user):
+        abort(403)
+
+    if not message.attachment_filename or (message.deleted and not message.content):
+        abort(404)
+
+    return message, os.path.join(namespace_folder('message_attachments'), message.attachment_filename)
+
+def get_public_media_path(namespace, filename):
+    """Resolve a post image or profile picture, aborting with 404 if invalid."""
+    if namespace not in PUBLIC_NAMESPACES:
+        abort(404)
+    path = safe_join(namespace_folder(namespace), filename)
+    if path is None:
+        abort(404)
+    return path
+
+def send_message_attachment(message_id):
+    """Send a message attachment to the message's sender or recipient."""
+    message, path = get_attachment_path(message_id)
+    # Stored as "<random stem>_<original name>"
+    download_name = message.attachment_filename.split('_', 1)[-1]
+    return send_media(path, private=True, download_name=download_name)
+
+def send_public_media(namespace, filename):
+    """Send a post image or profile picture."""
+    return send_media(get_public_media_path(namespace, filename))
+
+def _send_thumbnail(source_path, namespace, filename, width, height, private):
+    from utils.thumbnails import thumbnail, THUMBNAIL_FORMATS
+
+    if (width, height) not in current_app.config.get('THUMBNAIL_SIZES', ()):
+        abort(404)
+    if not os.path.isfile(source_path):
+        abort(404)
+
+    ext = 'webp' if request.accept_mimetypes['image/webp'] else 'jpg'
+    try:
+        path = thumbnail(source_path, namespace, filename, width, height, ext)
+    except (OSError, ValueError) as e:
+        # Not an image Pillow can read
+        print(f"Error rendering thumbnail of {filename}: {str(e)}")
+        abort(404)
+
+    response = send_media(path, private=private)
+    response.mimetype = THUMBNAIL_FORMATS[ext][1]
+    response.vary.add('Accept')
+    return response
+
+def send_public_thumbnail(namespace, filename, width, height):
+    """Send a resized post image or profile picture."""
+    path = get_public_media_path(namespace, filename)
+    return _send_thumbnail(path, namespace, filename, width, height, private=False)
+
+def send_attachment_thumbnail(message_id, width, height):
+    """Send a resized image attachment to the message's sender or recipient."""
+    message, path = get_attachment_path(message_id)
+    if message.attachment_type != 'image':
+        abort(404)
+    return _send_thumbnail(path, 'message_attachments', message.attachment_filename, width, height, private=True)
+
+def backfill_placeholders(batch_size=200):
+    """Compute sizes and placeholders for images uploaded before they existed.
+
+    The matching blob rows are updated too, so a later upload of the same
+    bytes reuses the placeholder.
+
+    Returns:
+        int: Number of posts and users updated
+    """
+    from PIL import Image
+    from models import db
+    from models.blob import Blob
+    from models.post import Post
+    from models.user import User
+    from utils.image_pipeline import make_placeholder
+
+    def describe(path):
+        try:
+            with Image.open(path) as image:
+                width, height = image.size
+                image.draft('RGB', (256, 256))
+                return width, height, make_placeholder(image)
+        except OSError as e:
+            print(f"Error reading image {path}: {str(e)}")
+            return None
+
+    updated = 0
+    targets = (
+        (Post, Post.image, Post.image_placeholder, 'post_images',
+         ('image_width', 'image_height', 'image_placeholder')),
+        (User, User.profile_image, User.profile_image_placeholder, 'profile_pics',
+         ('profile_image_width', 'profile_image_height', 'profile_image_placeholder')),
+    )
+    for model, image_column, placeholder_column, namespace, fields in targets:
+        last_id = 0
+        while True:
+            rows = model.query.filter(model.id > last_id, image_column.isnot(None),
+                                      placeholder_column.is_(None))\
+                .order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            for row in rows:
+                filename = getattr(row, image_column.key)
+                info = describe(os.path.join(namespace_folder(namespace), filename))
+                if info:
+                    for field, value in zip(fields, info):
+                        setattr(row, field, value)
+                    Blob.query.filter_by(namespace=namespace, filename=filename)\
+                        .filter(Blob.placeholder.is_(None))\
+                        .update(dict(zip(('width', 'height', 'placeholder'), info)), synchronize_session=False)
+                    updated += 1
+            last_id = rows[-1].id
+            db.session.commit()
+    return updated
@@ -3,52 +3,32 @@ import os
 from datetime import datetime, timezone
 from flask import flash, redirect, url_for, request, jsonify, current_app
 from flask_login import current_user
+from models import db
 from models.user import User
 from models.message import Message
+from models.conversation import Conversation
 from utils.db_utils import commit_to_db, delete_from_db
 from werkzeug.utils import secure_filename
+from utils.blob_store import store_blob
 
 def get_received_messages(page=1, per_page=10):
-    """Get paginated received messages for the current user, grouped by sender."""
-    from sqlalchemy import func
-    from sqlalchemy.orm import aliased
-
-    # Use a subquery to get the most recent message from each sender
-    subq = Message.query.filter_by(recipient=current_user)\
-        .with_entities(
-            Message.sender_id,
-            func.max(Message.created_at).label('max_date')
-        ).group_by(Message.sender_id).subquery()
-
-    # Join the subquery with the messages table to get the actual messages
-    messages = Message.query.join(
-        subq,
-        (Message.sender_id == subq.c.sender_id) &
-        (Message.created_at == subq.c.max_date)
-    ).filter(Message.recipient == current_user)\
-        .order_by(Message.created_at.desc())\
+    """Get paginated conversations of the current user, newest activity first.
+
+    Each item is the conversation's latest message, in either direction.
+    """
+    messages = Message.query.join(Conversation, Conversation.last_message_id == Message.id)\
+        .filter((Conversation.user_a_id == current_user.id) | (Conversation.user_b_id == current_user.id))\
+        .order_by(Conversation.last_activity_at.desc(), Conversation.id.desc())\
         .paginate(page=page, per_page=per_page)
 
     return messages
 
 def get_sent_messages(page=1, per_page=10):
-    """Get paginated sent messages for the current user, grouped by recipient."""
-    from sqlalchemy import func
-
-    # Use a subquery to get the most recent message to each recipient
-    subq = Message.query.filter_by(sender=current_user)\
-        .with_entities(
-            Message.recipient_id,
-            func.max(Message.created_at).label('max_date')
-        ).group_by(Message.recipient_id).subquery()
-
-    # Join the subquery with the messages table to get the actual messages
-    messages = Message.query.join(
-        subq,
-        (Message.recipient_id == subq.c.recipient_id) &
-        (Message.created_at == subq.c.max_date)
-    ).filter(Message.sender == current_user)\
-        .order_by(Message.created_at.desc())\
+    """Get paginated conversations whose latest message the current user sent."""
+    messages = Message.query.join(Conversation, Conversation.last_message_id == Message.id)\
+        .filter((Conversation.user_a_id == current_user.id) | (Conversation.user_b_id == current_user.id))\
+        .filter(Message.sender_id == current_user.id)\
+        .order_by(Conversation.last_activity_at.desc(), Conversation.id.desc())\
         .paginate(page=page, per_page=per_page)
 
     return messages
@@ -58,54 +38,79 @@ def get_conversation(username, page=1, per_page=20):
     user = User.query.filter_by(username=username).first_or_404()
 
     # Get messages between current user and the specified user
-    messages = Message.query.filter(
-        ((Message.sender_id == current_user.id) & (Message.recipient_id == user.id)) |
-        ((Message.sender_id == user.id) & (Message.recipient_id == current_user.id))
-    ).order_by(Message.created_at.asc()).paginate(page=page, per_page=per_page)
-
-    # Mark unread messages as read
-    unread_messages = Message.query.filter_by(
-        sender_id=user.id,
-        recipient_id=current_user.id,
-        read=False
-    ).all()
-
-    for message in unread_messages:
-        message.mark_as_read()
+    messages = Message.query.filter(Message.between(current_user.id, user.id))\
+        .order_by(Message.id.asc()).paginate(page=page, per_page=per_page)
 
-    # Mark undelivered messages as delivered
-    undelivered_messages = Message.query.filter_by(
-        sender_id=user.id,
-        recipient_id=current_user.id,
-        delivered=False
-    ).all()
+    # Everything the other user has sent so far is now read
+    mark_conversation_read(current_user.id, user.id)
 
-    for message in undelivered_messages:
-        message.mark_as_delivered()
+    return messages, user
 
-    if unread_messages or undelivered_messages:
-        commit_to_db()
+def mark_conversation_read(user_id, other_id, up_to_id=None):
+    """Mark the messages another user sent up to a watermark as read.
 
-    return messages, user
+    One UPDATE over ix_messages_recipient_read_sender covers every message
+    up to the watermark, however many there are. The conversation stores
+    the high-water mark, so repeating it is a no-op, and the sender gets a
+    single ``messages_read_up_to`` event.
 
-def save_message_attachment(file):
-    """Save message attachment and return the filename."""
-    if not file:
-        return None
+    Args:
+        user_id (int): ID of the reader
+        other_id (int): ID of the sender
+        up_to_id (int): Newest message seen; defaults to the latest message
+
+    Returns:
+        int: Number of messages updated
+    """
+    from handlers.badge_counter import record_badge_change
+    from models.conversation import record_read
+    from sub.socket_events import socketio
+
+    conversation = Conversation.between(user_id, other_id)
+    if conversation is None or conversation.last_message_id is None:
+        return 0
+
+    watermark = min(up_to_id or conversation.last_message_id, conversation.last_message_id)
+    if getattr(conversation, f'read_up_to_{conversation.side(user_id)}') >= watermark:
+        return 0
+
+    now = datetime.now(timezone.utc)
+    count = Message.query.filter(Message.recipient_id == user_id, Message.sender_id == other_id,
+                                 Message.id <= watermark, Message.read.is_(False)).update({
+        Message.read: True,
+        Message.read_at: now,
+        Message.delivered: True,
+        Message.delivered_at: db.func.coalesce(Message.delivered_at, now)
+    }, synchronize_session='fetch')
+    # Relative to the stored values, so a message sent meanwhile keeps its unread count
+    record_read(db.session, other_id, user_id, count, up_to_id=watermark)
+    record_badge_change(db.session, user_id, 'messages', -count)
+    commit_to_db()
 
-    # Create directory if it doesn't exist
-    upload_folder = os.path.join(current_app.static_folder, 'uploads', 'message_attachments')
-    os.makedirs(upload_folder, exist_ok=True)
+    if count:
+        socketio.emit('messages_read_up_to', {
+            'reader_id': user_id,
+            'reader_username': db.session.get(User, user_id).username,
+            'up_to_id': watermark,
+            'read_at': now.isoformat()
+        }, room=f'user_{other_id}')
+    return count
+
+def _write_message_attachment(file, folder, stem):
+    """Write a new attachment to the blob folder."""
+    filename = f"{stem}_{secure_filename(file.filename)}"
+    file.save(os.path.join(folder, filename))
+    return filename, None
 
-    # Generate a unique filename
-    filename = secure_filename(file.filename)
-    unique_filename = f"{uuid.uuid4()}_{filename}"
+def save_message_attachment(file):
+    """Save message attachment and return the filename.
 
-    # Save the file
-    file_path = os.path.join(upload_folder, unique_filename)
-    file.save(file_path)
+    Identical files are stored once and shared between messages.
+    """
+    if not file:
+        return None
 
-    return unique_filename
+    return store_blob('message_attachments', file, _write_message_attachment).filename
 
 def get_attachment_type(filename):
     """Determine the type of attachment based on file extension."""
@@ -220,43 +225,53 @@ def edit_message_handler(message_id, new_content):
         return redirect(url_for('messages.inbox'))
 
 # API Handlers for AJAX requests
-def get_messages_api(username, since_id=None, limit=50):
-    """Get messages for API."""
-    user = User.query.filter_by(username=username).first_or_404()
-
-    # Base query
-    query = Message.query.filter(
-        ((Message.sender_id == current_user.id) & (Message.recipient_id == user.id)) |
-        ((Message.sender_id == user.id) & (Message.recipient_id == current_user.id))
-    ).order_by(Message.created_at.desc())
+def get_messages_api(username, since_id=None, limit=50, before_id=None, after_id=None):
+    """Get a page of a conversation for the API, newest message first.
 
-    # If since_id is provided, get only newer messages
-    if since_id:
-        last_message = Message.query.get(since_id)
-        if last_message:
-            query = query.filter(Message.created_at > last_message.created_at)
-
-    # Limit the number of messages
-    messages = query.limit(limit).all()
-
-    # Mark messages as read and delivered
-    unread_messages = [m for m in messages if m.recipient_id == current_user.id and not m.read]
-    undelivered_messages = [m for m in messages if m.recipient_id == current_user.id and not m.delivered]
-
-    for message in unread_messages:
-        message.mark_as_read()
+    Pages are keyed on message id, the order of ix_messages_conversation_id,
+    so each page is one index range whatever its depth: ``before_id`` pages
+    back through older history and ``after_id`` (``since_id`` in older
+    clients) fetches what arrived after the newest message the client has,
+    taking the oldest of those first so none are skipped.
 
-    for message in undelivered_messages:
-        message.mark_as_delivered()
+    Args:
+        username (str): The other participant
+        since_id (int): Alias of ``after_id``
+        limit (int): Page size, capped at MESSAGES_PAGE_MAX_LIMIT
+        before_id (int): Only messages older than this one
+        after_id (int): Only messages newer than this one
+
+    Returns:
+        list: Message dictionaries
+    """
+    user = User.query.filter_by(username=username).first_or_404()
+    limit = max(1, min(limit or 50, current_app.config.get('MESSAGES_PAGE_MAX_LIMIT', 100)))
+    after_id = after_id or since_id
+
+    query = Message.query.filter(Message.between(current_user.id, user.id))
+    if before_id:
+        query = query.filter(Message.id < before_id)
+    if after_id:
+        messages = query.filter(Message.id > after_id).order_by(Message.id.asc()).limit(limit).all()
+        messages.reverse()
+    else:
+        messages = query.order_by(Message.id.desc()).limit(limit).all()
 
-    if unread_messages or undelivered_messages:
-        commit_to_db()
+    # Mark messages as read and delivered up to the newest one returned
+    received_ids = [m.id for m in messages if m.recipient_id == current_user.id]
+    if received_ids:
+        mark_conversation_read(current_user.id, user.id, up_to_id=max(received_ids))
 
     # Convert to dict for JSON response
     return [message.to_dict() for message in messages]
 
-def send_message_api(recipient_username, content, client_message_id=None, attachment=None):
-    """Send a message via API."""
+def send_message_api(recipient_username, content, client_message_id=None, attachment=None,
+                     attachment_filename=None):
+    """Send a message via API.
+
+    ``attachment`` is a file uploaded with the request; ``attachment_filename``
+    names one already in the attachment store, e.g. a finalized chunked upload.
+    """
     recipient = User.query.filter_by(username=recipient_username).first()
 
     if not recipient:
@@ -267,11 +282,11 @@ def send_message_api(recipient_username, content, client_message_id=None, attach
         client_message_id = str(uuid.uuid4())
 
     # Handle attachment if provided
-    attachment_filename = None
     attachment_type = None
 
     if attachment and attachment.filename:
         attachment_filename = save_message_attachment(attachment)
+    if attachment_filename:
         attachment_type = get_attachment_type(attachment_filename)
 
     # Create message
@@ -288,6 +303,8 @@ def send_message_api(recipient_username, content, client_message_id=None, attach
     # Check for spam
     is_spam = message.check_for_spam()
     if is_spam:
+        # Undo the attachment reference taken above
+        db.session.rollback()
         return {'error': 'Message flagged as potential spam'}, 400
 
     commit_to_db(message)
@@ -299,7 +316,7 @@ def update_message_status_api(message_id, status):
     message = Message.query.get_or_404(message_id)
 
     # Verify the current user is either the sender or recipient
-    if message.sender != current_user and message.recipient != current_user:
+    if not message.is_participant(current_user):
         return {'error': 'Unauthorized'}, 403
 
     # Update status based on request
@@ -1,6 +1,9 @@
 from flask import abort
+from flask_login import current_user
+from sqlalchemy.orm import selectinload
 from models.user import User
 from models.post import Post
+from handlers.feed_handler import attach_viewer_state
 
 def get_user_profile(username):
     """Get user profile by username."""
@@ -10,6 +13,9 @@ def get_user_profile(username):
 def get_user_posts(username, page=1, per_page=5):
     """Get paginated posts for a specific user."""
     user = User.query.filter_by(username=username).first_or_404()
-    return Post.query.filter_by(author=user)\
+    posts = Post.query.filter_by(author=user)\
+        .options(selectinload(Post.author))\
         .order_by(Post.created_at.desc())\
         .paginate(page=page, per_page=per_page)
+    attach_viewer_state(posts.items, current_user.id)
+    return posts
@@ -0,0 +1,185 @@
+"""
+Feed ranking.
+
+Every post carries a precomputed ``score`` that combines engagement, author
+affinity and age. The age term is measured against a fixed epoch instead of
+"now", so a post's score only changes when its engagement does: rescoring
+is incremental and the ranked feed is a range scan over ``(score, id)``.
+A background task rescores the posts with new engagement every
+RANKING_RESCORE_INTERVAL_S, started by the first ranked feed read.
+"""
+
+import threading
+from datetime import datetime
+import numpy as np
+from flask_login import current_user
+from sqlalchemy import func, update
+from sqlalchemy.orm import selectinload
+from models import db
+from models.post import Post
+from models.friendship import Friendship, Follow
+from handlers.feed_handler import attach_viewer_state
+from utils.pagination import paginate_keyset
+
+# Scoring weights
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 3.0
+AFFINITY_WEIGHT = 0.5
+AFFINITY_SATURATION = 1000  # Audience size at which author affinity maxes out
+
+# Every DECAY_SECONDS of age costs a post one order of magnitude of engagement
+DECAY_SECONDS = 45000.0
+SCORE_EPOCH = datetime(2024, 1, 1)
+
+def compute_scores(likes, comments, affinity, created_at):
+    """Compute ranking scores for a batch of posts.
+
+    Args:
+        likes: Array of like counts
+        comments: Array of comment counts
+        affinity: Array of author affinities in [0, 1]
+        created_at: Array of post creation times as seconds since SCORE_EPOCH
+
+    Returns:
+        numpy.ndarray: The scores, higher ranks first
+    """
+    likes = np.asarray(likes, dtype=np.float64)
+    comments = np.asarray(comments, dtype=np.float64)
+    affinity = np.asarray(affinity, dtype=np.float64)
+    created_at = np.asarray(created_at, dtype=np.float64)
+
+    engagement = LIKE_WEIGHT * likes + COMMENT_WEIGHT * comments
+    boost = np.log10(np.maximum(engagement, 1.0)) * (1.0 + AFFINITY_WEIGHT * affinity)
+    return boost + created_at / DECAY_SECONDS
+
+def initial_score(post):
+    """Score a brand-new post that has no engagement yet."""
+    age = (post.created_at - SCORE_EPOCH).total_seconds()
+    return float(compute_scores([0], [0], [0.0], [age])[0])
+
+def _author_affinities(author_ids):
+    """Compute author affinity in [0, 1] from the size of each author's audience."""
+    audience = dict.fromkeys(author_ids, 0)
+    if not audience:
+        return audience
+
+    followers = db.session.execute(
+        db.select(Follow.followed_id, func.count())
+        .where(Follow.followed_id.in_(audience))
+        .group_by(Follow.followed_id)
+    )
+    friends = db.session.execute(
+        db.select(Friendship.friend_id, func.count())
+        .where(Friendship.friend_id.in_(audience))
+        .group_by(Friendship.friend_id)
+    )
+    for author_id, count in list(followers) + list(friends):
+        audience[author_id] += count
+
+    ids = list(audience)
+    sizes = np.array([audience[author_id] for author_id in ids], dtype=np.float64)
+    values = np.minimum(np.log1p(sizes) / np.log1p(AFFINITY_SATURATION), 1.0)
+    return dict(zip(ids, values.tolist()))
+
+def _rescore_batches(condition, batch_size):
+    """Score every post matching ``condition`` in primary-key batches."""
+    rescored = 0
+    last_id = 0
+    while True:
+        query = db.select(Post.id, Post.user_id, Post.like_count, Post.comment_count,
+                          Post.created_at, Post.engaged_at)
+        if condition is not None:
+            query = query.where(condition)
+        rows = db.session.execute(
+            query.where(Post.id > last_id).order_by(Post.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        ids, author_ids, likes, comments, created_at, engaged_at = zip(*rows)
+        affinities = _author_affinities(set(author_ids))
+        ages = [(created - SCORE_EPOCH).total_seconds() for created in created_at]
+        scores = compute_scores(likes, comments, [affinities[a] for a in author_ids], ages)
+
+        # scored_at records the engagement the score reflects; any later
+        # like or comment moves engaged_at past it and re-flags the post
+        db.session.execute(update(Post), [
+            {'id': post_id, 'score': score, 'scored_at': engaged or created}
+            for post_id, score, engaged, created in zip(ids, scores.tolist(), engaged_at, created_at)
+        ])
+        db.session.commit()
+
+        rescored += len(ids)
+        last_id = ids[-1]
+
+    return rescored
+
+def rescore_posts(batch_size=1000, full=False):
+    """Recompute scores for posts with new engagement since they were last scored.
+
+    Only posts that were never scored, or whose ``engaged_at`` is newer than
+    their ``scored_at``, are touched; both sets are read from partial
+    indexes. Each batch is scored with one vectorized NumPy pass and written
+    back with one executemany UPDATE.
+
+    Args:
+        batch_size (int): Number of posts scored per batch
+        full (bool): Rescore every post, e.g. after changing the weights
+
+    Returns:
+        int: Number of posts rescored
+    """
+    if full:
+        return _rescore_batches(None, batch_size)
+
+    return _rescore_batches(Post.scored_at.is_(None), batch_size) + \
+        _rescore_batches(Post.engaged_at > Post.scored_at, batch_size)
+
+class RankingJob:
+    """Periodic incremental rescoring in a background task."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._app = None
+        self._running = False
+        self.interval = 60
+
+    def init_app(self, app):
+        """Bind the job to an application."""
+        self._app = app
+        self.interval = app.config.get('RANKING_RESCORE_INTERVAL_S', self.interval)
+
+    def _ensure_running(self):
+        if self._running or self._app is None:
+            return
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+
+        from sub.socket_events import socketio
+        socketio.start_background_task(self._run)
+
+    def _run(self):
+        from sub.socket_events import socketio
+        while True:
+            try:
+                with self._app.app_context():
+                    rescore_posts()
+            except Exception as e:
+                print(f"Error in ranking loop: {str(e)}")
+            socketio.sleep(self.interval)
+
+ranking_job = RankingJob()
+
+def get_ranked_posts(before=None, per_page=10):
+    """Get a page of posts ordered by precomputed score.
+
+    Reads the top of the ``(score, id)`` index instead of sorting the
+    posts table, paging with a keyset cursor on the same columns.
+    """
+    ranking_job._ensure_running()
+    query = Post.query.options(selectinload(Post.author))
+    posts = paginate_keyset(query, (Post.score, Post.id), before=before, per_page=per_page)
+    attach_viewer_state(posts.items, current_user.id)
+    return posts
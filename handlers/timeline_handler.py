@@ -0,0 +1,287 @@
+"""
+Home timeline engine.
+
+Timelines are built from Friendship and Follow edges with hybrid fan-out:
+posts by ordinary accounts are pushed into one TimelineEntry row per
+audience member when they are written, while posts by accounts whose
+audience exceeds FEED_FANOUT_THRESHOLD are pulled at read time and merged
+into the pushed rows with a heap-based k-way merge.
+"""
+
+import heapq
+from flask import current_app
+from sqlalchemy import insert, tuple_, union
+from sqlalchemy.orm import selectinload
+from models import db
+from models.user import User
+from models.post import Post
+from models.friendship import Friendship, Follow
+from models.timeline import TimelineEntry
+from handlers.feed_handler import attach_viewer_state
+from utils.db_utils import commit_to_db
+from utils.pagination import CursorPage, decode_cursor, encode_cursor
+
+def _audience_query(author_id):
+    """Select the IDs of users whose timeline should show the author's posts."""
+    return union(
+        db.select(Follow.follower_id).where(Follow.followed_id == author_id),
+        db.select(Friendship.user_id).where(Friendship.friend_id == author_id)
+    )
+
+def _is_connected(user_id, author_id):
+    """Check whether the user follows or is friends with the author."""
+    return Follow.query.filter_by(follower_id=user_id, followed_id=author_id).first() is not None or \
+        Friendship.query.filter_by(user_id=user_id, friend_id=author_id).first() is not None
+
+def fan_out_post(post):
+    """Push a new post into the timelines of its author's audience.
+
+    The author always gets the post in their own timeline. If the author's
+    audience is larger than the configured threshold, the author is flagged
+    for fan-out on read and no per-follower rows are written. The flag is
+    only cleared once the audience drops to the lower resume threshold, so
+    an audience hovering around the threshold doesn't flip it on every
+    post; the posts made while flagged are then pushed to the audience,
+    which stops pulling them.
+
+    Args:
+        post: The newly created Post
+
+    Returns:
+        int: Number of timeline rows written
+    """
+    threshold = current_app.config.get('FEED_FANOUT_THRESHOLD', 1000)
+    resume_threshold = current_app.config.get('FEED_FANOUT_RESUME_THRESHOLD', threshold * 4 // 5)
+    audience = _audience_query(post.user_id).subquery()
+    audience_size = db.session.scalar(db.select(db.func.count()).select_from(audience))
+
+    author = db.session.get(User, post.user_id)
+    resumed = author.fanout_on_read and audience_size <= resume_threshold
+    if audience_size > threshold:
+        author.fanout_on_read = True
+    elif resumed:
+        author.fanout_on_read = False
+
+    owner_ids = {post.user_id}
+    if not author.fanout_on_read:
+        owner_ids.update(db.session.scalars(db.select(audience.c[0])))
+
+    db.session.execute(insert(TimelineEntry), [
+        {
+            'user_id': owner_id,
+            'post_id': post.id,
+            'author_id': post.user_id,
+            'created_at': post.created_at
+        }
+        for owner_id in owner_ids
+    ])
+    commit_to_db()
+
+    if resumed:
+        for owner_id in owner_ids - {post.user_id}:
+            backfill_timeline(owner_id, post.user_id)
+    return len(owner_ids)
+
+def backfill_timeline(user_id, author_id):
+    """Copy an author's recent posts into a user's timeline after a new follow or friendship.
+
+    Authors that fan out on read are skipped since their posts are merged
+    at read time anyway.
+
+    Args:
+        user_id: ID of the timeline owner
+        author_id: ID of the newly followed or befriended user
+    """
+    author = db.session.get(User, author_id)
+    if author is None or author.fanout_on_read:
+        return
+
+    limit = current_app.config.get('FEED_TIMELINE_BACKFILL', 50)
+    recent = Post.query.with_entities(Post.id, Post.created_at)\
+        .filter(Post.user_id == author_id)\
+        .order_by(Post.created_at.desc(), Post.id.desc())\
+        .limit(limit).all()
+    if not recent:
+        return
+
+    existing = set(db.session.scalars(
+        db.select(TimelineEntry.post_id).where(
+            TimelineEntry.user_id == user_id,
+            TimelineEntry.post_id.in_([post_id for post_id, _ in recent])
+        )
+    ))
+    rows = [
+        {'user_id': user_id, 'post_id': post_id, 'author_id': author_id, 'created_at': created_at}
+        for post_id, created_at in recent if post_id not in existing
+    ]
+    if rows:
+        db.session.execute(insert(TimelineEntry), rows)
+        commit_to_db()
+
+def prune_timeline(user_id, author_id):
+    """Remove an author's posts from a user's timeline once they are no longer connected.
+
+    Args:
+        user_id: ID of the timeline owner
+        author_id: ID of the unfollowed or unfriended user
+    """
+    if _is_connected(user_id, author_id):
+        return
+
+    TimelineEntry.query.filter_by(user_id=user_id, author_id=author_id)\
+        .delete(synchronize_session=False)
+    commit_to_db()
+
+def remove_post_from_timelines(post_id):
+    """Delete every timeline row pointing at a post. The caller commits."""
+    TimelineEntry.query.filter_by(post_id=post_id).delete(synchronize_session=False)
+
+def _merge_timeline(user_id, cursor, limit, newer=False):
+    """Merge the pushed and pulled timeline streams around a cursor.
+
+    Args:
+        user_id: ID of the timeline owner
+        cursor: Decoded ``(created_at, post_id)`` cursor, or None
+        limit (int): Maximum number of rows to return
+        newer (bool): Read rows after the cursor, oldest first, instead of
+            rows before it, newest first
+
+    Returns:
+        list: Up to ``limit`` ``(created_at, post_id)`` rows
+    """
+    def around_cursor(select, created_column, id_column):
+        if cursor is not None:
+            key = tuple_(created_column, id_column)
+            select = select.where(key > tuple(cursor) if newer else key < tuple(cursor))
+        if newer:
+            return select.order_by(created_column.asc(), id_column.asc()).limit(limit)
+        return select.order_by(created_column.desc(), id_column.desc()).limit(limit)
+
+    # Stream 1: rows pushed into this user's timeline on write
+    pushed = db.select(TimelineEntry.created_at, TimelineEntry.post_id)\
+        .where(TimelineEntry.user_id == user_id)
+    streams = [db.session.execute(
+        around_cursor(pushed, TimelineEntry.created_at, TimelineEntry.post_id)
+    ).all()]
+
+    # Streams 2..k: followed authors whose posts are merged at read time
+    connections = union(
+        db.select(Follow.followed_id).where(Follow.follower_id == user_id),
+        db.select(Friendship.friend_id).where(Friendship.user_id == user_id)
+    ).subquery()
+    pulled_ids = db.session.scalars(
+        db.select(User.id).where(User.id.in_(db.select(connections.c[0])), User.fanout_on_read.is_(True))
+    ).all()
+
+    for author_id in pulled_ids:
+        pulled = db.select(Post.created_at, Post.id).where(Post.user_id == author_id)
+        streams.append(db.session.execute(around_cursor(pulled, Post.created_at, Post.id)).all())
+
+    # k-way merge of the sorted streams, dropping posts seen twice
+    merged = []
+    seen = set()
+    for created_at, post_id in heapq.merge(*streams, key=lambda row: (row[0], row[1]), reverse=not newer):
+        if post_id in seen:
+            continue
+        seen.add(post_id)
+        merged.append((created_at, post_id))
+        if len(merged) == limit:
+            break
+    return merged
+
+def _load_timeline_posts(user_id, post_ids):
+    """Load posts by ID in the given order, with authors and viewer state."""
+    posts_by_id = {}
+    if post_ids:
+        posts_by_id = {
+            post.id: post for post in
+            Post.query.options(selectinload(Post.author)).filter(Post.id.in_(post_ids))
+        }
+    posts = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+
+    attach_viewer_state(posts, user_id)
+    return posts
+
+def _timeline_cursor(before):
+    cursor = decode_cursor(before)
+    if cursor is not None and len(cursor) != 2:
+        return None
+    return cursor
+
+def get_timeline(user_id, before=None, per_page=10):
+    """Get a page of a user's home timeline.
+
+    Reads at most ``per_page + 1`` pushed rows plus ``per_page + 1`` posts
+    from each followed fan-out-on-read author, all as index range scans,
+    and merges the sorted streams with heapq. The cost of a read therefore
+    depends on the page size, not on how many people the user follows.
+
+    Args:
+        user_id: ID of the timeline owner
+        before (str): Cursor token of the last post of the previous page
+        per_page (int): Number of posts per page
+
+    Returns:
+        CursorPage: The page of posts and the cursor for the next one
+    """
+    merged = _merge_timeline(user_id, _timeline_cursor(before), per_page + 1)
+
+    next_cursor = None
+    if len(merged) > per_page:
+        merged = merged[:per_page]
+        next_cursor = encode_cursor(*merged[-1])
+
+    posts = _load_timeline_posts(user_id, [post_id for _, post_id in merged])
+    return CursorPage(posts, next_cursor)
+
+def get_timeline_since(user_id, since, limit=50):
+    """Get the timeline posts newer than a client's head cursor.
+
+    Used by feed auto-refresh to transfer only what is new. Rows are read
+    oldest first from just after ``since``, so when more than ``limit``
+    posts arrived the client can call again from the returned head without
+    leaving a gap.
+
+    Args:
+        user_id: ID of the timeline owner
+        since (str): Cursor token of the newest post the client has
+        limit (int): Maximum number of posts to return
+
+    Returns:
+        tuple: ``(posts, head, has_more)`` with posts newest first, the
+        cursor of the newest post the client now has and whether more
+        new posts remain
+    """
+    cursor = _timeline_cursor(since)
+    if cursor is None:
+        return [], since, False
+
+    merged = _merge_timeline(user_id, cursor, limit + 1, newer=True)
+    has_more = len(merged) > limit
+    merged = merged[:limit]
+
+    head = encode_cursor(*merged[-1]) if merged else since
+    posts = _load_timeline_posts(user_id, [post_id for _, post_id in reversed(merged)])
+    return posts, head, has_more
+
+def rebuild_timelines(batch_size=500):
+    """Rebuild every timeline from scratch by re-fanning out all posts.
+
+    Returns:
+        int: Number of posts fanned out
+    """
+    TimelineEntry.query.delete(synchronize_session=False)
+    commit_to_db()
+
+    count = 0
+    last_id = 0
+    while True:
+        batch = Post.query.filter(Post.id > last_id).order_by(Post.id).limit(batch_size).all()
+        if not batch:
+            break
+        for post in batch:
+            fan_out_post(post)
+        count += len(batch)
+        last_id = batch[-1].id
+        db.session.expunge_all()
+    return count
@@ -0,0 +1,295 @@
+"""
+Trending posts.
+
+Engagement is counted in memory in per-minute ring buffers, one per post,
+covering the last TRENDING_WINDOW_MINUTES. The tracker keeps the top
+TRENDING_TOP_K posts up to date in a min-heap as counts change, so reading
+the trending list costs O(K) no matter how many posts are active. Old
+minutes are expired once a minute, and the top posts' buckets are
+snapshotted to the database periodically and restored on startup.
+"""
+
+import atexit
+import heapq
+import json
+import threading
+import time
+from datetime import datetime
+from flask_login import current_user
+from sqlalchemy import insert
+from sqlalchemy.orm import selectinload
+from models import db
+from models.post import Post
+from models.trending import TrendingSnapshot
+from handlers.feed_handler import attach_viewer_state
+from handlers.ranking_handler import LIKE_WEIGHT, COMMENT_WEIGHT
+
+class _Counter:
+    """Ring buffer of per-minute engagement weights for one post."""
+
+    __slots__ = ('minutes', 'weights', 'total')
+
+    def __init__(self, window):
+        self.minutes = [-1] * window
+        self.weights = [0.0] * window
+        self.total = 0.0
+
+    def add(self, minute, weight):
+        slot = minute % len(self.minutes)
+        if self.minutes[slot] != minute:
+            # The slot still holds a minute that has left the window
+            self.total -= self.weights[slot]
+            self.minutes[slot] = minute
+            self.weights[slot] = 0.0
+        self.weights[slot] += weight
+        self.total += weight
+
+    def expire(self, minute):
+        """Clear buckets older than the window ending at ``minute``.
+
+        Returns:
+            bool: True if the counter still holds any bucket
+        """
+        oldest = minute - len(self.minutes)
+        for slot, bucket_minute in enumerate(self.minutes):
+            if bucket_minute != -1 and bucket_minute <= oldest:
+                self.minutes[slot] = -1
+                self.weights[slot] = 0.0
+        self.total = sum(self.weights)
+        return any(bucket_minute != -1 for bucket_minute in self.minutes)
+
+    def buckets(self):
+        return {minute: weight for minute, weight in zip(self.minutes, self.weights) if minute != -1}
+
+class TrendingTracker:
+    """Sliding-window engagement counters with a maintained top-K."""
+
+    def __init__(self, window=60, top_k=50):
+        self.window = window
+        self.top_k = top_k
+        self.snapshot_interval = 300
+        self._counters = {}  # post_id -> _Counter
+        self._top = {}       # post_id -> score of the current top K
+        self._heap = []      # (score, post_id), min first; stale entries skipped lazily
+        self._ranked = None  # Cached [(post_id, score)] best first, None when changed
+        self._lock = threading.Lock()
+        self._app = None
+        self._running = False
+
+    def init_app(self, app):
+        """Configure the tracker, restore the last snapshot and save one at exit."""
+        if self._app is None:
+            atexit.register(self.drain)
+        self._app = app
+        self.window = app.config.get('TRENDING_WINDOW_MINUTES', self.window)
+        self.top_k = app.config.get('TRENDING_TOP_K', self.top_k)
+        self.snapshot_interval = app.config.get('TRENDING_SNAPSHOT_INTERVAL_S', self.snapshot_interval)
+
+        with app.app_context():
+            self.load()
+        if self._counters:
+            # Keep expiring the restored minutes even if nothing new is recorded
+            self._ensure_running()
+
+    def record(self, post_id, likes=0, comments=0, now=None):
+        """Count engagement on a post in the current minute.
+
+        Args:
+            post_id: ID of the post
+            likes: Like delta; an unlike is recorded as -1
+            comments: Comment delta
+            now (float): Timestamp to record at, defaults to the current time
+        """
+        weight = LIKE_WEIGHT * likes + COMMENT_WEIGHT * comments
+        if not weight:
+            return
+
+        minute = int((now if now is not None else time.time()) // 60)
+        with self._lock:
+            counter = self._counters.get(post_id)
+            if counter is None:
+                counter = self._counters[post_id] = _Counter(self.window)
+            counter.add(minute, weight)
+            self._offer(post_id, counter.total)
+
+        self._ensure_running()
+
+    def discard(self, post_id):
+        """Forget a post, e.g. after it has been deleted."""
+        with self._lock:
+            self._counters.pop(post_id, None)
+            if self._top.pop(post_id, None) is not None:
+                self._ranked = None
+
+    def _min_entry(self):
+        """Return the lowest (score, post_id) of the top K. Caller holds the lock."""
+        while self._heap:
+            score, post_id = self._heap[0]
+            if self._top.get(post_id) == score:
+                return score, post_id
+            heapq.heappop(self._heap)
+        return None
+
+    def _offer(self, post_id, score):
+        """Update the top K with a post's new score. Caller holds the lock."""
+        if post_id in self._top:
+            if score > 0:
+                self._top[post_id] = score
+                heapq.heappush(self._heap, (score, post_id))
+            else:
+                del self._top[post_id]
+            self._ranked = None
+        elif score > 0:
+            if len(self._top) >= self.top_k:
+                lowest = self._min_entry()
+                if lowest is None or score <= lowest[0]:
+                    return
+                heapq.heappop(self._heap)
+                del self._top[lowest[1]]
+            self._top[post_id] = score
+            heapq.heappush(self._heap, (score, post_id))
+            self._ranked = None
+
+        if len(self._heap) > 4 * self.top_k + 64:
+            # Drop the stale entries left behind by score updates
+            self._heap = [(score, post_id) for post_id, score in self._top.items()]
+            heapq.heapify(self._heap)
+
+    def tick(self, now=None):
+        """Expire minutes that left the window and rebuild the top K exactly."""
+        minute = int((now if now is not None else time.time()) // 60)
+        with self._lock:
+            for post_id in [post_id for post_id, counter in self._counters.items()
+                            if not counter.expire(minute)]:
+                del self._counters[post_id]
+
+            best = heapq.nlargest(self.top_k, (
+                (counter.total, post_id) for post_id, counter in self._counters.items()
+                if counter.total > 0
+            ))
+            self._top = {post_id: score for score, post_id in best}
+            self._heap = list(best)
+            heapq.heapify(self._heap)
+            self._ranked = None
+
+    def top(self, limit=None):
+        """Get the trending posts, best first.
+
+        Only the K maintained entries are read; scanning every counter to
+        expire old minutes is left to the background loop's ``tick``.
+
+        Returns:
+            list: ``(post_id, score)`` pairs
+        """
+        with self._lock:
+            if self._ranked is None:
+                self._ranked = sorted(self._top.items(), key=lambda item: (-item[1], -item[0]))
+            ranked = self._ranked
+        return ranked[:limit] if limit else list(ranked)
+
+    def save(self):
+        """Replace the stored snapshot with the current top posts' buckets."""
+        with self._lock:
+            rows = [
+                {
+                    'post_id': post_id,
+                    'score': score,
+                    'buckets': json.dumps(self._counters[post_id].buckets()),
+                    'captured_at': datetime.utcnow()
+                }
+                for post_id, score in self._top.items() if post_id in self._counters
+            ]
+
+        try:
+            TrendingSnapshot.query.delete(synchronize_session=False)
+            if rows:
+                db.session.execute(insert(TrendingSnapshot), rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error saving trending snapshot: {str(e)}")
+
+    def load(self, now=None):
+        """Restore the counters saved by the last snapshot."""
+        try:
+            snapshots = TrendingSnapshot.query.all()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error loading trending snapshot: {str(e)}")
+            return
+
+        minute = int((now if now is not None else time.time()) // 60)
+        with self._lock:
+            for snapshot in snapshots:
+                counter = _Counter(self.window)
+                for bucket_minute, weight in sorted(json.loads(snapshot.buckets).items()):
+                    if int(bucket_minute) > minute - self.window:
+                        counter.add(int(bucket_minute), weight)
+                self._counters[snapshot.post_id] = counter
+        self.tick(now)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._top.clear()
+            self._heap = []
+            self._ranked = None
+    
+    def drain(self):
+        """Save a final snapshot, e.g. on shutdown."""
+        if self._app is None:
+            return
+        with self._app.app_context():
+            self.save()
+
+    def _ensure_running(self):
+        if self._running or self._app is None:
+            return
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+
+        from sub.socket_events import socketio
+        socketio.start_background_task(self._run)
+
+    def _run(self):
+        from sub.socket_events import socketio
+        last_save = time.time()
+        while True:
+            socketio.sleep(60)
+            try:
+                self.tick()
+                if time.time() - last_save >= self.snapshot_interval:
+                    with self._app.app_context():
+                        self.save()
+                    last_save = time.time()
+            except Exception as e:
+                print(f"Error in trending loop: {str(e)}")
+
+trending = TrendingTracker()
+
+def get_trending_posts(limit=None):
+    """Get the currently trending posts, best first.
+
+    Reads the maintained top K and loads just those posts with their
+    authors and the viewer's like state.
+
+    Args:
+        limit (int): Maximum number of posts, defaults to all K
+
+    Returns:
+        list: ``(post, score)`` pairs
+    """
+    ranked = trending.top(limit)
+    post_ids = [post_id for post_id, _ in ranked]
+    posts_by_id = {}
+    if post_ids:
+        posts_by_id = {
+            post.id: post for post in
+            Post.query.options(selectinload(Post.author)).filter(Post.id.in_(post_ids))
+        }
+
+    results = [(posts_by_id[post_id], score) for post_id, score in ranked if post_id in posts_by_id]
+    attach_viewer_state([post for post, _ in results], current_user.id)
+    return results
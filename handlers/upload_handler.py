@@ -0,0 +1,267 @@
+"""
+Resumable chunked uploads for message attachments.
+
+A client initiates an upload with the file's name and size, PUTs the bytes
+in chunks at explicit offsets, and finalizes it together with the message
+text. Each chunk is streamed from the request body straight into a temp
+file, so nothing is buffered in memory, and after a dropped connection the
+client asks for the current offset and resumes from there.
+"""
+
+import os
+import secrets
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_login import current_user
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+from models import db
+from models.user import User
+from models.upload import UploadSession
+from utils.blob_store import store_blob
+from utils.db_utils import commit_to_db
+
+try:
+    import fcntl
+except ImportError:  # Windows: chunk writes are only serialized within this process
+    fcntl = None
+
+ALLOWED_EXTENSIONS = {'jpg', 'png', 'gif', 'pdf', 'doc', 'docx'}  # Same as MessageForm
+STREAM_BLOCK_SIZE = 64 * 1024
+
+# Uploads a request of this process is writing to, used when fcntl is unavailable
+_writing = set()
+_writing_lock = threading.Lock()
+
+def _upload_folder():
+    folder = current_app.config['CHUNKED_UPLOAD_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+def _temp_path(upload_id):
+    return os.path.join(_upload_folder(), upload_id + '.part')
+
+def _try_lock(upload_id, part):
+    """Take the write lock of an upload without waiting.
+
+    Returns:
+        bool: False if another request is writing a chunk of this upload
+    """
+    if fcntl is not None:
+        try:
+            # Released when the temp file is closed
+            fcntl.flock(part.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    with _writing_lock:
+        if upload_id in _writing:
+            return False
+        _writing.add(upload_id)
+        return True
+
+def _unlock(upload_id):
+    if fcntl is None:
+        with _writing_lock:
+            _writing.discard(upload_id)
+
+def _get_session(upload_id, recipient_username):
+    """Load an upload session owned by the current user for this recipient."""
+    recipient = User.query.filter_by(username=recipient_username).first()
+    if recipient is None:
+        return None
+    return UploadSession.query.filter_by(
+        id=upload_id, user_id=current_user.id, recipient_id=recipient.id
+    ).first()
+
+def initiate_upload(recipient_username, filename, size):
+    """Start a chunked upload.
+
+    Args:
+        recipient_username (str): Username of the message recipient
+        filename (str): Original name of the file
+        size (int): Total size of the file in bytes
+
+    Returns:
+        tuple: Response dict and HTTP status code
+    """
+    recipient = User.query.filter_by(username=recipient_username).first()
+    if not recipient:
+        return {'error': 'User not found'}, 404
+
+    filename = secure_filename(filename or '')
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in ALLOWED_EXTENSIONS:
+        return {'error': 'File type not allowed'}, 400
+
+    max_size = current_app.config.get('CHUNKED_UPLOAD_MAX_SIZE', 100 * 1024 * 1024)
+    if not isinstance(size, int) or size <= 0 or size > max_size:
+        return {'error': f'File size must be between 1 and {max_size} bytes'}, 400
+
+    session = UploadSession(
+        id=secrets.token_hex(16),
+        user_id=current_user.id,
+        recipient_id=recipient.id,
+        filename=filename,
+        size=size
+    )
+
+    # Create the empty temp file the chunks are written into
+    open(_temp_path(session.id), 'wb').close()
+
+    if not commit_to_db(session):
+        return {'error': 'Could not start upload'}, 500
+
+    result = session.to_dict()
+    result['chunk_size'] = current_app.config.get('CHUNKED_UPLOAD_CHUNK_SIZE', 1024 * 1024)
+    return result, 201
+
+def get_upload_status(upload_id, recipient_username):
+    """Return the offset to resume an upload from."""
+    session = _get_session(upload_id, recipient_username)
+    if not session:
+        return {'error': 'Upload not found'}, 404
+    return session.to_dict(), 200
+
+def write_chunk(upload_id, recipient_username, offset, stream):
+    """Append one chunk read from ``stream`` at ``offset``.
+
+    The chunk must start exactly where the previous one ended. The upload
+    is locked before the temp file is touched, so a concurrent or retried
+    PUT at the same offset gets a 409 with the committed offset instead of
+    writing too. Bytes are copied from the request stream to the temp file
+    in small blocks, and if the client disconnects midway the bytes that did
+    arrive are kept, so the next attempt resumes from the last byte on disk.
+
+    Args:
+        upload_id (str): The upload session ID
+        recipient_username (str): Username of the message recipient
+        offset (int): Byte offset the chunk starts at
+        stream: The request body stream
+
+    Returns:
+        tuple: Response dict and HTTP status code
+    """
+    session = _get_session(upload_id, recipient_username)
+    if not session:
+        return {'error': 'Upload not found'}, 404
+
+    with open(_temp_path(session.id), 'r+b') as part:
+        if not _try_lock(session.id, part):
+            # A concurrent or retried PUT is writing; don't touch the file
+            return {'error': 'Upload in progress', 'offset': session.received}, 409
+        try:
+            # The committed offset can't move while we hold the lock
+            db.session.refresh(session)
+            if offset != session.received:
+                # Tell the client where to resume from
+                return {'error': 'Offset mismatch', 'offset': session.received}, 409
+
+            written = 0
+            interrupted = False
+            part.seek(offset)
+            try:
+                while True:
+                    block = stream.read(min(STREAM_BLOCK_SIZE, session.size - offset - written))
+                    if not block:
+                        break
+                    part.write(block)
+                    written += len(block)
+            except Exception as e:
+                # Keep what arrived; the client resumes from the new offset
+                print(f"Upload {session.id} interrupted: {str(e)}")
+                interrupted = True
+            part.truncate(offset + written)
+            part.flush()
+
+            session.received = offset + written
+            session.updated_at = datetime.utcnow()
+            if not commit_to_db():
+                return {'error': 'Could not save chunk', 'offset': offset}, 500
+        finally:
+            _unlock(session.id)
+
+    return session.to_dict(), 400 if interrupted else 200
+
+def finalize_upload(upload_id, recipient_username, content, client_message_id=None):
+    """Store a completed upload and send it as a message attachment.
+
+    The temp file is moved into the blob store without another copy, or
+    dropped if identical content is already stored. The upload is locked
+    like in ``write_chunk`` for the whole finalize, so a concurrent or
+    retried finalize gets a 409 instead of storing and sending it twice.
+
+    Returns:
+        tuple: Response dict and HTTP status code
+    """
+    from handlers.message_handler import send_message_api
+
+    session = _get_session(upload_id, recipient_username)
+    if not session:
+        return {'error': 'Upload not found'}, 404
+
+    upload_id = session.id
+    temp_path = _temp_path(upload_id)
+    try:
+        stream = open(temp_path, 'rb')
+    except FileNotFoundError:
+        # Another finalize already moved it into the store
+        return {'error': 'Upload already finalized'}, 409
+
+    with stream:
+        if not _try_lock(upload_id, stream):
+            return {'error': 'Upload in progress', 'offset': session.received}, 409
+        try:
+            # A finalize that held the lock before us may have deleted the session
+            session = db.session.get(UploadSession, upload_id, populate_existing=True)
+            if session is None:
+                return {'error': 'Upload already finalized'}, 409
+            if session.received != session.size:
+                return {'error': 'Upload incomplete', 'offset': session.received}, 409
+
+            moved_to = []
+
+            def move_into_store(upload, folder, stem):
+                filename = f"{stem}_{session.filename}"
+                os.replace(temp_path, os.path.join(folder, filename))
+                moved_to.append(os.path.join(folder, filename))
+                return filename, None
+
+            attachment_filename = store_blob(
+                'message_attachments', FileStorage(stream=stream, filename=session.filename), move_into_store
+            ).filename
+
+            db.session.delete(session)
+            result, status_code = send_message_api(
+                recipient_username, content, client_message_id, attachment_filename=attachment_filename
+            )
+
+            if status_code != 201:
+                # Nothing was stored; keep the upload so finalize can be retried
+                db.session.rollback()
+                if moved_to:
+                    os.replace(moved_to[0], temp_path)
+            elif os.path.exists(temp_path):
+                # The content was already stored; this copy is not needed
+                os.remove(temp_path)
+        finally:
+            _unlock(upload_id)
+    return result, status_code
+
+def prune_uploads(max_age_hours=24):
+    """Delete upload sessions that were abandoned, with their temp files.
+
+    Returns:
+        int: Number of sessions removed
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+    stale = UploadSession.query.filter(UploadSession.updated_at < cutoff).all()
+    for session in stale:
+        path = _temp_path(session.id)
+        if os.path.exists(path):
+            os.remove(path)
+        db.session.delete(session)
+    commit_to_db()
+    return len(stale)
@@ -0,0 +1,26 @@
+from datetime import datetime
+from models import db
+
+class Blob(db.Model):
+    """Content-addressed stored upload, shared by every record that references the same bytes."""
+    __tablename__ = 'blobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    namespace = db.Column(db.String(32), nullable=False)  # Upload kind, e.g. 'post_images'
+    digest = db.Column(db.String(64), nullable=False)     # SHA-256 of the uploaded bytes
+    filename = db.Column(db.String(255), nullable=False)  # Stored file, referenced by posts/users/messages
+    variants = db.Column(db.String(64), nullable=True)    # Responsive image widths, if any
+    width = db.Column(db.Integer, nullable=True)          # Intrinsic size of images
+    height = db.Column(db.Integer, nullable=True)
+    placeholder = db.Column(db.Text, nullable=True)       # Tiny inline data URI shown while loading
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('namespace', 'digest', name='unique_blob_digest'),
+        db.UniqueConstraint('namespace', 'filename', name='unique_blob_filename'),
+    )
+
+    def __repr__(self):
+        return f"Blob('{self.namespace}/{self.filename}', refs={self.ref_count})"
@@ -11,6 +11,29 @@ class Comment(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
+
+    # Composite index backing keyset pagination of a post's comments
+    __table_args__ = (
+        db.Index('ix_comments_post_created_id', 'post_id', 'created_at', 'id'),
+    )
+
+    def to_dict(self):
+        """Convert comment to dictionary for API responses; ``profile_image`` is a URL."""
+        from utils.thumbnails import avatar_url
+
+        return {
+            'id': self.id,
+            'content': self.content,
+            'created_at': self.created_at.isoformat(),
+            'post_id': self.post_id,
+            'user_id': self.user_id,
+            'author': {
+                'username': self.author.username,
+                'first_name': self.author.first_name,
+                'last_name': self.author.last_name,
+                'profile_image': avatar_url(self.author, 32)
+            }
+        }
     
     def __repr__(self):
         return f"Comment('{self.content[:20]}...', '{self.created_at}')"
@@ -0,0 +1,179 @@
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from models import db
+from models.message import Message
+
+class Conversation(db.Model):
+    """Summary of the messages between two users, one row per pair.
+
+    Kept up to date in the same flush as every message insert, read and
+    delete, so the inbox reads this table instead of grouping messages.
+    ``user_a_id`` is always the lower of the two user ids.
+    """
+    __tablename__ = 'conversations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_a_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_b_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    last_message_id = db.Column(db.Integer, db.ForeignKey('messages.id'), nullable=True)
+    last_activity_at = db.Column(db.DateTime, nullable=False)
+    unread_a = db.Column(db.Integer, default=0, nullable=False)  # Messages user A has not read
+    unread_b = db.Column(db.Integer, default=0, nullable=False)
+    # High-water marks: every message to that side with an id up to this one is read
+    read_up_to_a = db.Column(db.Integer, default=0, nullable=False)
+    read_up_to_b = db.Column(db.Integer, default=0, nullable=False)
+
+    last_message = db.relationship('Message', foreign_keys=[last_message_id])
+
+    __table_args__ = (
+        db.UniqueConstraint('user_a_id', 'user_b_id', name='unique_conversation'),
+        db.Index('ix_conversations_user_a_activity', 'user_a_id', 'last_activity_at'),
+        db.Index('ix_conversations_user_b_activity', 'user_b_id', 'last_activity_at'),
+    )
+
+    def other_user_id(self, user_id):
+        return self.user_b_id if user_id == self.user_a_id else self.user_a_id
+
+    def unread_for(self, user_id):
+        """Number of messages in the conversation the user has not read."""
+        return getattr(self, f'unread_{self.side(user_id)}')
+
+    def side(self, user_id):
+        """Return the column suffix (``'a'`` or ``'b'``) of a participant."""
+        return 'a' if user_id == self.user_a_id else 'b'
+
+    @staticmethod
+    def between(user_id, other_id):
+        """Get the conversation of two users, or None."""
+        user_a_id, user_b_id = Conversation.pair(user_id, other_id)
+        return Conversation.query.filter_by(user_a_id=user_a_id, user_b_id=user_b_id).first()
+
+    @staticmethod
+    def pair(user_id, other_id):
+        """Return the ``(user_a_id, user_b_id)`` key of two users."""
+        return (user_id, other_id) if user_id < other_id else (other_id, user_id)
+
+    @staticmethod
+    def for_user(user_id):
+        """Query the conversations a user takes part in, most recent first."""
+        return Conversation.query.filter(
+            (Conversation.user_a_id == user_id) | (Conversation.user_b_id == user_id)
+        ).order_by(Conversation.last_activity_at.desc(), Conversation.id.desc())
+
+    def __repr__(self):
+        return f"Conversation(user_a_id={self.user_a_id}, user_b_id={self.user_b_id})"
+
+
+def _unread_column(recipient_id, user_a_id):
+    table = Conversation.__table__
+    return table.c.unread_a if recipient_id == user_a_id else table.c.unread_b
+
+def record_message(session, message):
+    """Make a new message the last one of its conversation."""
+    table = Conversation.__table__
+    user_a_id, user_b_id = Conversation.pair(message.sender_id, message.recipient_id)
+    unread = 0 if message.read else 1
+    unread_column = _unread_column(message.recipient_id, user_a_id)
+
+    stmt = insert(table).values(
+        user_a_id=user_a_id,
+        user_b_id=user_b_id,
+        last_message_id=message.id,
+        last_activity_at=message.created_at,
+        unread_a=unread if unread_column is table.c.unread_a else 0,
+        unread_b=unread if unread_column is table.c.unread_b else 0
+    )
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.user_a_id, table.c.user_b_id],
+        set_={
+            'last_message_id': stmt.excluded.last_message_id,
+            'last_activity_at': stmt.excluded.last_activity_at,
+            unread_column.key: unread_column + unread
+        }
+    ))
+
+def record_read(session, sender_id, recipient_id, count=1, up_to_id=None):
+    """Take messages the recipient has just read off their unread count.
+
+    Both columns are changed in SQL, so a message recorded concurrently is
+    not lost from the count. ``up_to_id`` also advances the read watermark.
+    """
+    table = Conversation.__table__
+    user_a_id, user_b_id = Conversation.pair(sender_id, recipient_id)
+    unread_column = _unread_column(recipient_id, user_a_id)
+    values = {unread_column: func.max(unread_column - count, 0)}
+    if up_to_id is not None:
+        read_up_to = table.c.read_up_to_a if unread_column is table.c.unread_a else table.c.read_up_to_b
+        values[read_up_to] = func.max(read_up_to, up_to_id)
+    session.execute(
+        table.update()
+        .where(table.c.user_a_id == user_a_id, table.c.user_b_id == user_b_id)
+        .values(values)
+    )
+
+def record_removal(session, message):
+    """Point a conversation whose message row was deleted at the previous message."""
+    table = Conversation.__table__
+    messages = Message.__table__
+    user_a_id, user_b_id = Conversation.pair(message.sender_id, message.recipient_id)
+
+    latest = select(messages.c.id, messages.c.created_at)\
+        .where(Message.between(user_a_id, user_b_id))\
+        .order_by(messages.c.id.desc()).limit(1)
+    row = session.execute(latest).first()
+
+    where = (table.c.user_a_id == user_a_id) & (table.c.user_b_id == user_b_id)
+    if row is None:
+        session.execute(table.delete().where(where))
+        return
+    session.execute(table.update().where(where).values(
+        last_message_id=row.id, last_activity_at=row.created_at))
+    if not message.read:
+        record_read(session, message.sender_id, message.recipient_id)
+
+@event.listens_for(Session, 'after_flush')
+def _update_conversations(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, Message):
+            record_message(session, obj)
+
+    for obj in session.dirty:
+        if isinstance(obj, Message):
+            history = db.inspect(obj).attrs.read.history
+            if history.added and history.added[0] and history.deleted and not history.deleted[0]:
+                record_read(session, obj.sender_id, obj.recipient_id)
+
+    for obj in session.deleted:
+        if isinstance(obj, Message):
+            record_removal(session, obj)
+
+def rebuild_conversations():
+    """Recompute every conversation from the messages table.
+
+    Returns:
+        int: Number of conversations written
+    """
+    table = Conversation.__table__
+    messages = Message.__table__
+    user_a = func.min(messages.c.sender_id, messages.c.recipient_id)
+    user_b = func.max(messages.c.sender_id, messages.c.recipient_id)
+
+    summary = select(
+        user_a.label('user_a_id'),
+        user_b.label('user_b_id'),
+        func.max(messages.c.id).label('last_message_id'),
+        func.sum(((messages.c.recipient_id == user_a) & ~messages.c.read).cast(db.Integer)).label('unread_a'),
+        func.sum(((messages.c.recipient_id == user_b) & ~messages.c.read).cast(db.Integer)).label('unread_b')
+    ).group_by(user_a, user_b).subquery()
+
+    rows = select(
+        summary.c.user_a_id, summary.c.user_b_id, summary.c.last_message_id,
+        messages.c.created_at, summary.c.unread_a, summary.c.unread_b
+    ).join(messages, messages.c.id == summary.c.last_message_id)
+
+    db.session.execute(table.delete())
+    db.session.execute(table.insert().from_select(
+        ['user_a_id', 'user_b_id', 'last_message_id', 'last_activity_at', 'unread_a', 'unread_b'], rows))
+    db.session.commit()
+    return db.session.query(func.count(Conversation.id)).scalar()
@@ -1,4 +1,5 @@
 from datetime import datetime, timezone
+from sqlalchemy import literal_column, text
 from models import db
 
 class FriendRequest(db.Model):
@@ -13,7 +14,21 @@ class FriendRequest(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     # Ensure a user can't send multiple requests to the same recipient
-    __table_args__ = (db.UniqueConstraint('sender_id', 'recipient_id', name='unique_friend_request'),)
+    __table_args__ = (
+        db.UniqueConstraint('sender_id', 'recipient_id', name='unique_friend_request'),
+        # Partial index over the requests still awaiting an answer
+        db.Index('ix_friend_requests_pending', 'recipient_id', 'created_at',
+                 sqlite_where=text("status = 'pending'"), postgresql_where=text("status = 'pending'")),
+    )
+
+    @staticmethod
+    def is_pending():
+        """Filter for pending requests.
+
+        The status is rendered inline rather than as a bound parameter, which
+        SQLite needs to match the query to ix_friend_requests_pending.
+        """
+        return FriendRequest.status == literal_column("'pending'")
 
     def __repr__(self):
         return f"FriendRequest(sender_id={self.sender_id}, recipient_id={self.recipient_id}, status='{self.status}')"
@@ -29,7 +44,10 @@ class Friendship(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
 
     # Ensure a user can't be friends with the same person twice
-    __table_args__ = (db.UniqueConstraint('user_id', 'friend_id', name='unique_friendship'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'friend_id', name='unique_friendship'),
+        db.Index('ix_friendships_friend_user', 'friend_id', 'user_id'),
+    )
 
     def __repr__(self):
         return f"Friendship(user_id={self.user_id}, friend_id={self.friend_id})"
@@ -44,8 +62,11 @@ class Follow(db.Model):
     followed_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
 
-    # Ensure a user can't follow the same person twice
-    __table_args__ = (db.UniqueConstraint('follower_id', 'followed_id', name='unique_follow'),)
+    # Ensure a user can't follow the same person twice; followers of a user come from the second index
+    __table_args__ = (
+        db.UniqueConstraint('follower_id', 'followed_id', name='unique_follow'),
+        db.Index('ix_follows_followed_follower', 'followed_id', 'follower_id'),
+    )
 
     def __repr__(self):
         return f"Follow(follower_id={self.follower_id}, followed_id={self.followed_id})"
@@ -1,4 +1,6 @@
 from datetime import datetime, timezone
+from flask import url_for
+from sqlalchemy import event
 from models import db
 import re
 
@@ -34,9 +36,33 @@ class Message(db.Model):
     attachment_filename = db.Column(db.String(255), nullable=True)
     attachment_type = db.Column(db.String(20), nullable=True)  # image, pdf, document, file
 
+    __table_args__ = (
+        # Normalized (lower id, higher id) conversation key, see between(); ordered by
+        # id so history pages are keyset ranges
+        db.Index('ix_messages_conversation_id', db.func.min(sender_id, recipient_id),
+                 db.func.max(sender_id, recipient_id), id),
+        # Unread/undelivered lookups and per-recipient unread counts
+        db.Index('ix_messages_recipient_read_sender', recipient_id, read, sender_id),
+    )
+
     def __repr__(self):
         return f"Message('{self.content[:20]}...', '{self.created_at}')"
 
+    @staticmethod
+    def between(user_id, other_id):
+        """Filter for the messages exchanged by two users, in either direction.
+
+        Matches on the normalized pair rather than an OR of both directions,
+        so one range of ix_messages_conversation_id serves the conversation
+        already ordered by id.
+        """
+        return (db.func.min(Message.sender_id, Message.recipient_id) == min(user_id, other_id)) & \
+            (db.func.max(Message.sender_id, Message.recipient_id) == max(user_id, other_id))
+
+    def is_participant(self, user):
+        """Check whether a user is the sender or the recipient of the message."""
+        return user is not None and user.id in (self.sender_id, self.recipient_id)
+
     def mark_as_read(self):
         """Mark the message as read."""
         self.read = True
@@ -76,14 +102,14 @@ class Message(db.Model):
         self.updated_at = datetime.now(timezone.utc)
 
     def delete_attachment(self):
-        """Delete the message attachment file if it exists."""
+        """Release the message attachment, removing the file after the commit
+        once no other message shares it."""
         if self.attachment_filename:
             try:
                 import os
-                from flask import current_app
-                file_path = os.path.join(current_app.root_path, 'static', 'uploads', 'message_attachments', self.attachment_filename)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+                from utils.blob_store import release_blob, discard_files, namespace_folder
+                if release_blob('message_attachments', self.attachment_filename) is not False:
+                    discard_files([os.path.join(namespace_folder('message_attachments'), self.attachment_filename)])
                     return True
             except Exception as e:
                 print(f"Error deleting attachment: {str(e)}")
@@ -163,5 +189,21 @@ class Message(db.Model):
             'spam_score': self.spam_score,
             'attachment_filename': self.attachment_filename if not (self.deleted and not self.content) else None,
             'attachment_type': self.attachment_type if not (self.deleted and not self.content) else None,
-            'has_attachment': bool(self.attachment_filename) and not (self.deleted and not self.content)
+            'has_attachment': bool(self.attachment_filename) and not (self.deleted and not self.content),
+            'attachment_url': url_for('media.message_attachment', message_id=self.id)
+                if self.attachment_filename and not (self.deleted and not self.content) else None,
+            'thumbnail_url': url_for('thumbnails.attachment_thumbnail', width=320, height=0, message_id=self.id)
+                if self.attachment_type == 'image' and not (self.deleted and not self.content) else None
         }
+
+@event.listens_for(Message.read, 'set', active_history=True)
+def _load_previous_read(target, value, oldvalue, initiator):
+    """Load a message's stored ``read`` value before it is overwritten.
+
+    Does nothing itself: registering with ``active_history=True`` makes
+    SQLAlchemy load the old value when ``read`` is set on an expired
+    message, at the cost of a SELECT for that row. The flush hooks keeping
+    the badge counts (handlers/badge_counter.py) and the conversations'
+    unread counts (models/conversation.py) need that history to tell a
+    real unread -> read transition from writing the same value again.
+    """
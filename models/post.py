@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy import text
 from models import db
 
 class Post(db.Model):
@@ -8,17 +9,114 @@ class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     image = db.Column(db.String(100), nullable=True)
+    image_widths = db.Column(db.String(64), nullable=True)  # Responsive variant widths, e.g. "320,640,960"
+    image_width = db.Column(db.Integer, nullable=True)       # Intrinsic size, so pages reserve the space
+    image_height = db.Column(db.Integer, nullable=True)
+    image_placeholder = db.Column(db.Text, nullable=True)    # Tiny inline data URI shown while loading
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+    # Denormalized engagement counters (kept in sync by the feed handlers)
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Bumped whenever anything rendered on the post card changes
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    # Feed ranking: precomputed score, last engagement and last scoring run
+    score = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    engaged_at = db.Column(db.DateTime, nullable=True)
+    scored_at = db.Column(db.DateTime, nullable=True)
     
     # Relationships
     comments = db.relationship('Comment', backref='post', lazy=True, cascade='all, delete-orphan')
     likes = db.relationship('Like', backref='post', lazy=True, cascade='all, delete-orphan')
+
+    # Composite indexes backing keyset pagination of the feed and per-author timelines
+    __table_args__ = (
+        db.Index('ix_posts_created_at_id', 'created_at', 'id'),
+        db.Index('ix_posts_user_created_id', 'user_id', 'created_at', 'id'),
+        db.Index('ix_posts_score_id', 'score', 'id'),
+        # Partial indexes listing only the posts the ranking job still has to score
+        db.Index('ix_posts_unscored', 'id', sqlite_where=text('scored_at IS NULL'),
+                 postgresql_where=text('scored_at IS NULL')),
+        db.Index('ix_posts_rescore', 'id', sqlite_where=text('engaged_at > scored_at'),
+                 postgresql_where=text('engaged_at > scored_at')),
+    )
     
     def __repr__(self):
         return f"Post('{self.content[:20]}...', '{self.created_at}')"
 
+    def set_image(self, stored):
+        """Point the post at a stored image (a ``StoredBlob``)."""
+        self.image = stored.filename
+        self.image_widths = stored.variants
+        self.image_width = stored.width
+        self.image_height = stored.height
+        self.image_placeholder = stored.placeholder
+
+    def to_dict(self):
+        """Convert post to a compact dictionary for API responses.
+
+        Includes the viewer's like state when it has been attached with
+        ``attach_viewer_state``. Image fields are URLs clients can load as is.
+        """
+        from utils.image_pipeline import post_image_url
+        from utils.thumbnails import avatar_url
+
+        return {
+            'id': self.id,
+            'content': self.content,
+            'image': post_image_url(self),
+            'image_width': self.image_width,
+            'image_height': self.image_height,
+            'image_placeholder': self.image_placeholder,
+            'created_at': self.created_at.isoformat(),
+            'like_count': self.like_count,
+            'comment_count': self.comment_count,
+            'liked': getattr(self, 'liked_by_viewer', False),
+            'author': {
+                'id': self.user_id,
+                'username': self.author.username,
+                'first_name': self.author.first_name,
+                'last_name': self.author.last_name,
+                'profile_image': avatar_url(self.author, 40)
+            }
+        }
+
+    @staticmethod
+    def adjust_counters(post_id, likes=0, comments=0):
+        """Atomically adjust the engagement counters of a post.
+
+        Issues a single ``UPDATE posts SET like_count = like_count + :n``
+        statement in the current transaction, so concurrent likes and
+        comments never overwrite each other. The same statement stamps
+        ``engaged_at`` so the ranking job rescores the post and bumps
+        ``version`` so cached post cards are re-rendered. The caller
+        commits.
+
+        Args:
+            post_id: ID of the post to update
+            likes: Delta to apply to ``like_count``
+            comments: Delta to apply to ``comment_count``
+        """
+        values = {}
+        if likes:
+            values[Post.like_count] = Post.like_count + likes
+        if comments:
+            values[Post.comment_count] = Post.comment_count + comments
+        if values:
+            values[Post.engaged_at] = datetime.utcnow()
+            values[Post.version] = Post.version + 1
+            Post.query.filter_by(id=post_id).update(values, synchronize_session=False)
+
+    @staticmethod
+    def bump_author_versions(user_id):
+        """Invalidate the cached cards of every post by an author. The caller commits."""
+        Post.query.filter_by(user_id=user_id)\
+            .update({Post.version: Post.version + 1}, synchronize_session=False)
+
 class Like(db.Model):
     """Like model for storing post likes."""
     __tablename__ = 'likes'
@@ -29,7 +127,10 @@ class Like(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     # Add a unique constraint to prevent duplicate likes
-    __table_args__ = (db.UniqueConstraint('user_id', 'post_id', name='unique_user_post_like'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'post_id', name='unique_user_post_like'),
+        db.Index('ix_likes_post_id', 'post_id'),
+    )
     
     def __repr__(self):
         return f"Like(user_id={self.user_id}, post_id={self.post_id})"
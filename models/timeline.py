@@ -0,0 +1,21 @@
+from models import db
+
+class TimelineEntry(db.Model):
+    """Fan-out-on-write timeline row: a post pushed into one user's home timeline."""
+    __tablename__ = 'timeline_entries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)  # Timeline owner
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)  # Copied from the post for ordering
+
+    # One row per (owner, post); reads are a range scan over (user_id, created_at, post_id)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'post_id', name='unique_timeline_entry'),
+        db.Index('ix_timeline_entries_user_created', 'user_id', 'created_at', 'post_id'),
+        db.Index('ix_timeline_entries_post_id', 'post_id'),
+    )
+
+    def __repr__(self):
+        return f"TimelineEntry(user_id={self.user_id}, post_id={self.post_id})"
@@ -0,0 +1,14 @@
+from datetime import datetime
+from models import db
+
+class TrendingSnapshot(db.Model):
+    """Persisted per-minute engagement buckets of a trending post, restored on startup."""
+    __tablename__ = 'trending_snapshots'
+
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False, default=0.0)
+    buckets = db.Column(db.Text, nullable=False, default='{}')  # JSON {minute: weight}
+    captured_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"TrendingSnapshot(post_id={self.post_id}, score={self.score})"
@@ -0,0 +1,28 @@
+from datetime import datetime
+from models import db
+
+class UploadSession(db.Model):
+    """A resumable chunked upload in progress, attached to a message on finalize."""
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.String(32), primary_key=True)  # Random token, also names the temp file
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.Integer, nullable=False)      # Total bytes announced at initiation
+    received = db.Column(db.Integer, nullable=False, default=0)  # Contiguous bytes written so far
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert upload session to dictionary for API responses."""
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.received,
+            'complete': self.received == self.size
+        }
+
+    def __repr__(self):
+        return f"UploadSession('{self.filename}', {self.received}/{self.size})"
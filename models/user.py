@@ -16,7 +16,10 @@ class User(db.Model, UserMixin):
     password = db.Column(db.String(60), nullable=False)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
-    profile_image = db.Column(db.String(20), nullable=False, default='default.jpg')
+    profile_image = db.Column(db.String(100), nullable=False, default='default.jpg')
+    profile_image_width = db.Column(db.Integer, nullable=True)
+    profile_image_height = db.Column(db.Integer, nullable=True)
+    profile_image_placeholder = db.Column(db.Text, nullable=True)  # Tiny inline data URI shown while loading
     bio = db.Column(db.Text, nullable=True)
     date_of_birth = db.Column(db.Date, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
@@ -29,6 +32,9 @@ class User(db.Model, UserMixin):
     status_message = db.Column(db.String(100), nullable=True)
     typing_to = db.Column(db.Integer, nullable=True)  # User ID of who this user is typing to
 
+    # Timeline fan-out: accounts with a large audience are merged at read time
+    fanout_on_read = db.Column(db.Boolean, default=False, nullable=False)
+
     # Relationships
     posts = db.relationship('Post', backref='author', lazy=True, cascade='all, delete-orphan')
     comments = db.relationship('Comment', backref='author', lazy=True, cascade='all, delete-orphan')
@@ -87,6 +93,13 @@ class User(db.Model, UserMixin):
     def __repr__(self):
         return f"User('{self.username}', '{self.email}')"
 
+    def set_profile_image(self, stored):
+        """Point the user at a stored profile picture (a ``StoredBlob``)."""
+        self.profile_image = stored.filename
+        self.profile_image_width = stored.width
+        self.profile_image_height = stored.height
+        self.profile_image_placeholder = stored.placeholder
+
     def is_friends_with(self, user_id):
         """Check if the user is friends with another user."""
         return Friendship.query.filter(
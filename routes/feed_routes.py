@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, redirect, url_for
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify
 from flask_login import login_required, current_user
 from flask_wtf import FlaskForm
 from wtforms import StringField, TextAreaField, SubmitField
@@ -7,12 +7,20 @@ from flask_wtf.file import FileField, FileAllowed
 from models.post import Post
 from handlers.feed_handler import (
     get_posts, create_post_handler, update_post_handler, 
-    delete_post_handler, create_comment_handler, like_post_handler
+    delete_post_handler, create_comment_handler, like_post_handler,
+    attach_viewer_state, get_comments
 )
+from handlers.timeline_handler import get_timeline, get_timeline_since
+from handlers.ranking_handler import get_ranked_posts
+from handlers.trending_handler import get_trending_posts
+from utils.pagination import CursorPage, encode_cursor
 
 # Create Blueprint
 feed = Blueprint('feed', __name__)
 
+COMMENTS_PER_PAGE = 20
+FEED_API_MAX_LIMIT = 50
+
 # Form classes
 class PostForm(FlaskForm):
     content = TextAreaField('Content', validators=[DataRequired(), Length(min=1, max=500)])
@@ -28,10 +36,67 @@ class CommentForm(FlaskForm):
 @feed.route('/home')
 @login_required
 def index():
-    page = request.args.get('page', 1, type=int)
-    posts = get_posts(page=page, per_page=10)
+    # Personalized timeline paged by cursor; ?sort=top reads the ranked index
+    # and ?page= keeps the global page-number feed
+    page = request.args.get('page', None, type=int)
+    before = request.args.get('before', None, type=str)
+    sort = request.args.get('sort', None, type=str)
+    if page is not None:
+        posts = get_posts(page=page, per_page=10)
+    elif sort == 'top':
+        posts = get_ranked_posts(before=before, per_page=10)
+    else:
+        posts = get_timeline(current_user.id, before=before, per_page=10)
+
+    # Newest post on the first timeline page; auto-refresh polls from here
+    head = None
+    if page is None and sort != 'top' and not before and posts.items:
+        head = encode_cursor(posts.items[0].created_at, posts.items[0].id)
+
     form = PostForm()
-    return render_template('feed/index.html', title='Home', posts=posts, form=form)
+    return render_template('feed/index.html', title='Home', posts=posts, form=form, sort=sort, head=head)
+
+@feed.route('/api/v1/posts/feed')
+@login_required
+def feed_api():
+    # Compact JSON home timeline: ?before= pages older posts and ?since=
+    # returns only posts newer than the client's head, for auto-refresh
+    limit = min(max(request.args.get('limit', 10, type=int), 1), FEED_API_MAX_LIMIT)
+    before = request.args.get('before', None, type=str)
+    since = request.args.get('since', None, type=str)
+
+    if since:
+        posts, head, has_more = get_timeline_since(current_user.id, since, limit=limit)
+        next_cursor = None
+    else:
+        page = get_timeline(current_user.id, before=before, per_page=limit)
+        posts, next_cursor, has_more = page.items, page.next_cursor, page.has_next
+        # Only the first page defines the client's head
+        head = encode_cursor(posts[0].created_at, posts[0].id) if posts and not before else None
+
+    return jsonify({
+        'posts': [dict(post.to_dict(), is_owner=post.user_id == current_user.id) for post in posts],
+        'next_cursor': next_cursor,
+        'head': head,
+        'has_more': has_more
+    })
+
+@feed.route('/trending')
+@login_required
+def trending():
+    posts = CursorPage([post for post, _ in get_trending_posts()])
+    form = PostForm()
+    return render_template('feed/index.html', title='Trending', posts=posts, form=form, sort='trending')
+
+@feed.route('/api/v1/posts/trending')
+@login_required
+def trending_api():
+    # Reads only the maintained top K, never the likes/comments tables
+    limit = request.args.get('limit', None, type=int)
+    return jsonify({
+        'posts': [dict(post.to_dict(), trending_score=score, is_owner=post.user_id == current_user.id)
+                  for post, score in get_trending_posts(limit)]
+    })
 
 @feed.route('/post/new', methods=['GET', 'POST'])
 @login_required
@@ -48,8 +113,23 @@ def new_post():
 @login_required
 def view_post(post_id):
     post = Post.query.get_or_404(post_id)
+    attach_viewer_state([post], current_user.id)
+    comments = get_comments(post.id, per_page=COMMENTS_PER_PAGE)
     comment_form = CommentForm()
-    return render_template('feed/post.html', title=f'Post by {post.author.username}', post=post, form=comment_form)
+    return render_template('feed/post.html', title=f'Post by {post.author.username}', post=post,
+                           comments=comments, form=comment_form)
+
+@feed.route('/post/<int:post_id>/comments')
+@login_required
+def post_comments(post_id):
+    # JSON pages of comments for "load more", continuing from ?before=
+    post = Post.query.get_or_404(post_id)
+    before = request.args.get('before', None, type=str)
+    comments = get_comments(post.id, before=before, per_page=COMMENTS_PER_PAGE)
+    return jsonify({
+        'comments': [comment.to_dict() for comment in comments],
+        'next_cursor': comments.next_cursor
+    })
 
 @feed.route('/post/<int:post_id>/update', methods=['GET', 'POST'])
 @login_required
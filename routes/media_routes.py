@@ -0,0 +1,42 @@
+import posixpath
+from flask import Blueprint, abort, request
+from flask_login import login_required
+from handlers.media_handler import (
+    send_message_attachment, send_public_media, send_attachment_thumbnail, send_public_thumbnail
+)
+from utils.blob_store import LEGACY_ATTACHMENT_FOLDER
+
+# Create Blueprint
+media = Blueprint('media', __name__)
+
+@media.before_app_request
+def block_static_attachments():
+    # Attachments not yet moved out of static/ are only served through the
+    # participant check below; normalize so "//" and "./" can't dodge the prefix
+    if request.endpoint != 'static':
+        return
+    filename = (request.view_args or {}).get('filename', '').replace('\\', '/')
+    filename = posixpath.normpath('/' + filename.lstrip('/'))
+    if (filename + '/').startswith(f'/{LEGACY_ATTACHMENT_FOLDER}/'):
+        abort(404)
+
+@media.route('/attachments/<int:message_id>', methods=['GET', 'HEAD'])
+@login_required
+def message_attachment(message_id):
+    return send_message_attachment(message_id)
+
+@media.route('/<string:namespace>/<path:filename>', methods=['GET', 'HEAD'])
+def media_file(namespace, filename):
+    return send_public_media(namespace, filename)
+
+# Resized images, outside the /media prefix
+thumbnails = Blueprint('thumbnails', __name__)
+
+@thumbnails.route('/img/<int:width>x<int:height>/attachments/<int:message_id>', methods=['GET', 'HEAD'])
+@login_required
+def attachment_thumbnail(width, height, message_id):
+    return send_attachment_thumbnail(message_id, width, height)
+
+@thumbnails.route('/img/<int:width>x<int:height>/<string:namespace>/<path:filename>', methods=['GET', 'HEAD'])
+def public_thumbnail(width, height, namespace, filename):
+    return send_public_thumbnail(namespace, filename, width, height)
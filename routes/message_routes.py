@@ -11,6 +11,7 @@ from handlers.message_handler import (
     send_message_handler, delete_message_handler, edit_message_handler,
     get_messages_api, send_message_api, update_message_status_api
 )
+from handlers.upload_handler import initiate_upload, get_upload_status, write_chunk, finalize_upload
 
 # Create Blueprint
 messages = Blueprint('messages', __name__)
@@ -71,14 +72,6 @@ def conversation(username):
         from utils.db_utils import commit_to_db
         commit_to_db()
 
-    # Mark all messages from this user as read
-    for message in messages.items:
-        if message.sender_id == user.id and not message.read:
-            message.read = True
-            message.read_at = datetime.now(timezone.utc)
-            from utils.db_utils import commit_to_db
-            commit_to_db()
-
     return render_template('messages/conversation.html', title=f'Conversation with {username}',
                           messages=messages, user=user, form=form, uuid4=uuid.uuid4)
 
@@ -115,10 +108,7 @@ def delete_conversation(username):
     hard_delete = request.form.get('hard_delete') == 'true'
 
     # Get all messages between current user and the specified user
-    messages = Message.query.filter(
-        ((Message.sender_id == current_user.id) & (Message.recipient_id == user.id)) |
-        ((Message.sender_id == user.id) & (Message.recipient_id == current_user.id))
-    ).all()
+    messages = Message.query.filter(Message.between(current_user.id, user.id)).all()
 
     if hard_delete:
         # Hard delete - completely remove all message content and attachments
@@ -168,8 +158,10 @@ def edit_message(message_id):
 @login_required
 def api_get_messages(username):
     since_id = request.args.get('since_id', None, type=int)
+    before_id = request.args.get('before_id', None, type=int)
+    after_id = request.args.get('after_id', None, type=int)
     limit = request.args.get('limit', 50, type=int)
-    messages = get_messages_api(username, since_id, limit)
+    messages = get_messages_api(username, since_id, limit, before_id=before_id, after_id=after_id)
     return jsonify(messages)
 
 @messages.route('/api/users/search', methods=['GET'])
@@ -229,6 +221,48 @@ def api_send_message(username):
 
     return jsonify(message), status_code
 
+@messages.route('/api/messages/<string:username>/uploads', methods=['POST'])
+@login_required
+def api_initiate_upload(username):
+    data = request.json
+    if not data:
+        return jsonify({'error': 'Invalid request data'}), 400
+
+    result, status_code = initiate_upload(username, data.get('filename'), data.get('size'))
+    return jsonify(result), status_code
+
+@messages.route('/api/messages/<string:username>/uploads/<string:upload_id>', methods=['GET', 'HEAD'])
+@login_required
+def api_upload_status(username, upload_id):
+    result, status_code = get_upload_status(upload_id, username)
+    response = jsonify(result)
+    if 'offset' in result:
+        response.headers['Upload-Offset'] = str(result['offset'])
+    return response, status_code
+
+@messages.route('/api/messages/<string:username>/uploads/<string:upload_id>', methods=['PUT', 'PATCH'])
+@login_required
+def api_upload_chunk(username, upload_id):
+    # The chunk is the raw request body, read as a stream rather than parsed
+    offset = request.headers.get('Upload-Offset', request.args.get('offset'))
+    if offset is None or not offset.isdigit():
+        return jsonify({'error': 'Upload-Offset is required'}), 400
+
+    result, status_code = write_chunk(upload_id, username, int(offset), request.stream)
+    response = jsonify(result)
+    if 'offset' in result:
+        response.headers['Upload-Offset'] = str(result['offset'])
+    return response, status_code
+
+@messages.route('/api/messages/<string:username>/uploads/<string:upload_id>/finalize', methods=['POST'])
+@login_required
+def api_finalize_upload(username, upload_id):
+    data = request.json or {}
+    result, status_code = finalize_upload(
+        upload_id, username, data.get('content', ''), data.get('client_message_id')
+    )
+    return jsonify(result), status_code
+
 @messages.route('/api/messages/<int:message_id>/status', methods=['PUT'])
 @login_required
 def api_update_message_status(message_id):
@@ -274,10 +308,7 @@ def delete_conversation_api_route(username):
     user = User.query.filter_by(username=username).first_or_404()
 
     # Get all messages between current user and the specified user
-    messages = Message.query.filter(
-        ((Message.sender_id == current_user.id) & (Message.recipient_id == user.id)) |
-        ((Message.sender_id == user.id) & (Message.recipient_id == current_user.id))
-    ).all()
+    messages = Message.query.filter(Message.between(current_user.id, user.id)).all()
 
     if hard_delete:
         # Hard delete - completely remove all message content and attachments
@@ -74,6 +74,11 @@ function initDataSaver() {
  * Apply data saver mode to images
  */
 function applyDataSaverToImages() {
+    // Switch responsive post images to their data-saver variant
+    document.querySelectorAll('[data-saver-srcset]').forEach(element => {
+        element.srcset = element.dataset.saverSrcset;
+    });
+
     // Find all images from unsplash (our sample images)
     const images = document.querySelectorAll('img[src*="unsplash"]');
     
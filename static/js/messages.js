@@ -276,6 +276,92 @@ async function sendMessage(recipient, content, clientMessageId) {
     }
 }
 
+// Send a message with a large attachment as a resumable chunked upload.
+// The upload ID is remembered per file, so after a dropped connection or a
+// reload the same file resumes from the last byte the server has.
+async function sendAttachmentChunked(recipient, file, content, clientMessageId, onProgress) {
+    const baseUrl = `/messages/api/messages/${recipient}/uploads`;
+    const resumeKey = `chunkedUpload:${recipient}:${file.name}:${file.size}:${file.lastModified}`;
+
+    let upload = null;
+    const savedId = localStorage.getItem(resumeKey);
+    if (savedId) {
+        const response = await fetch(`${baseUrl}/${savedId}`);
+        if (response.ok) {
+            upload = await response.json();
+        }
+    }
+
+    if (!upload) {
+        const response = await fetch(baseUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ filename: file.name, size: file.size })
+        });
+        upload = await response.json();
+        if (!response.ok) {
+            throw new Error(upload.error || 'Failed to start upload');
+        }
+        localStorage.setItem(resumeKey, upload.upload_id);
+    }
+
+    const chunkSize = upload.chunk_size || 1024 * 1024;
+    let offset = upload.offset;
+    let retries = 0;
+
+    while (offset < file.size) {
+        try {
+            const response = await fetch(`${baseUrl}/${upload.upload_id}`, {
+                method: 'PUT',
+                headers: {
+                    'Content-Type': 'application/octet-stream',
+                    'Upload-Offset': String(offset)
+                },
+                body: file.slice(offset, offset + chunkSize)
+            });
+            const status = await response.json();
+            if (!response.ok && response.status !== 409) {
+                throw new Error(status.error || 'Failed to upload chunk');
+            }
+            // On 409 the server reports where to continue from
+            offset = status.offset;
+            retries = 0;
+            if (onProgress) {
+                onProgress(offset / file.size);
+            }
+        } catch (error) {
+            if (++retries > 5) {
+                throw error;
+            }
+            // Back off, then ask the server how much it kept
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            const response = await fetch(`${baseUrl}/${upload.upload_id}`);
+            if (response.ok) {
+                offset = (await response.json()).offset;
+            }
+        }
+    }
+
+    const response = await fetch(`${baseUrl}/${upload.upload_id}/finalize`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ content, client_message_id: clientMessageId })
+    });
+    const result = await response.json();
+    if (!response.ok) {
+        throw new Error(result.error || 'Failed to send attachment');
+    }
+
+    localStorage.removeItem(resumeKey);
+    return result;
+}
+
+window.sendAttachmentChunked = sendAttachmentChunked;
+
 document.addEventListener('DOMContentLoaded', function() {
     // Set current user ID from the page
     window.currentUserId = document.querySelector('meta[name="user-id"]')?.content;
@@ -37,6 +37,7 @@ function initSocket() {
     socket.on('new_message', handleNewMessage);
     socket.on('message_delivered', handleMessageDelivered);
     socket.on('message_read', handleMessageRead);
+    socket.on('messages_read_up_to', handleMessagesReadUpTo);
 
     // Typing events
     socket.on('typing_status', handleTypingStatus);
@@ -46,6 +47,9 @@ function initSocket() {
 
     // Conversation events
     socket.on('conversation_status', handleConversationStatus);
+
+    // Unread message / friend request badges
+    socket.on('badge_counts', handleBadgeCounts);
 }
 
 // Handle socket connection
@@ -396,6 +400,30 @@ function handleConversationStatus(data) {
     }
 }
 
+// Handle a read receipt covering every message up to an ID
+function handleMessagesReadUpTo(data) {
+    // Only the conversation with the reader is affected
+    const recipientInput = document.querySelector('input[name="recipient"]');
+    if (recipientInput && recipientInput.value !== data.reader_username) return;
+
+    document.querySelectorAll('.message.message-sent[data-message-id]').forEach(element => {
+        const messageId = parseInt(element.dataset.messageId, 10);
+        if (messageId <= data.up_to_id) {
+            handleMessageRead({ message_id: messageId, read_at: data.read_at });
+        }
+    });
+}
+
+// Handle badge count updates
+function handleBadgeCounts(counts) {
+    Object.keys(counts).forEach(kind => {
+        document.querySelectorAll(`[data-badge="${kind}"]`).forEach(badge => {
+            badge.textContent = counts[kind];
+            badge.hidden = counts[kind] === 0;
+        });
+    });
+}
+
 // Show system message in conversation
 function showSystemMessage(message) {
     const conversationContainer = document.querySelector('.conversation');
@@ -0,0 +1,75 @@
+"""
+Benchmark CPU time against bytes saved for response compression.
+Compresses representative bodies (a rendered-feed-sized HTML page, a feed
+API JSON page and the CSS/JS sources) at several gzip levels and, when the
+brotli package is installed, brotli qualities.
+
+Usage:
+    python -m sub.bench_compression [--repeat 20]
+"""
+
+import argparse
+import glob
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.compression import brotli
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def sample_bodies():
+    """Build bodies shaped like the app's largest responses."""
+    card = open(os.path.join(ROOT, 'templates', 'lite', 'feed', '_post_card.html')).read()
+    card = card.replace('{{', '').replace('}}', '')
+    html = '<html><body>' + ''.join(f'{card}<p>Post {i}: {os.urandom(24).hex()}</p>' for i in range(20)) \
+        + '</body></html>'
+
+    posts = [{
+        'id': i, 'content': f'Post number {i} about the weekend trip and some photos',
+        'image': f'{i:032x}_1280.jpg', 'created_at': '2026-10-18T12:00:00', 'like_count': i * 3,
+        'comment_count': i, 'liked': i % 2 == 0, 'is_owner': False,
+        'author': {'id': i % 7, 'username': f'user{i % 7}', 'first_name': 'First', 'last_name': 'Last',
+                   'profile_image': 'default.jpg'}
+    } for i in range(50)]
+    api = json.dumps({'posts': posts, 'next_cursor': 'abc', 'head': 'def', 'has_more': True})
+
+    assets = ''.join(open(path).read() for pattern in ('css/*.css', 'js/*.js')
+                     for path in sorted(glob.glob(os.path.join(ROOT, 'static', pattern))))
+    return [('Feed HTML', html.encode()), ('Feed API JSON', api.encode()), ('All CSS+JS', assets.encode())]
+
+def measure(compress, data, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        out = compress(data)
+    return len(out), (time.process_time() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20, help='Compressions timed per setting')
+    args = parser.parse_args()
+
+    settings = [(f'gzip -{level}', lambda data, level=level: gzip.compress(data, level, mtime=0))
+                for level in (1, 6, 9)]
+    if brotli is not None:
+        settings += [(f'br q{quality}', lambda data, quality=quality: brotli.compress(data, quality=quality))
+                     for quality in (1, 4, 6, 11)]
+    else:
+        print("brotli is not installed; measuring gzip only\n")
+
+    for label, data in sample_bodies():
+        print(f"{label}: {len(data) / 1024:,.1f} KiB")
+        print(f"  {'setting':<10} {'size':>10} {'saved':>7} {'CPU/op':>10} {'KiB saved/CPU ms':>17}")
+        for name, compress in settings:
+            size, seconds = measure(compress, data, args.repeat)
+            saved = len(data) - size
+            print(f"  {name:<10} {size / 1024:>8,.1f}Ki {saved / len(data):>6.0%} {seconds * 1000:>8.2f}ms"
+                  f" {saved / 1024 / max(seconds * 1000, 1e-6):>17,.0f}")
+        print()
+
+if __name__ == "__main__":
+    main()
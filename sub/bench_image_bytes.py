@@ -0,0 +1,86 @@
+"""
+Benchmark bytes served per feed page with and without responsive variants.
+Runs the image pipeline on a synthetic 12 MP phone-style JPEG and compares the
+original upload with the variant a browser would pick for common viewports.
+
+Usage:
+    python -m sub.bench_image_bytes [--posts 10]
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageFilter
+from config import Config
+from utils.image_pipeline import render_variants, variant_name, SAVER_SUFFIX
+
+# (label, rendered CSS width, device pixel ratio) for sizes="(max-width: 768px) 100vw, 680px"
+VIEWPORTS = (
+    ('Phone 390px @3x', 390, 3),
+    ('Phone 360px @2x', 360, 2),
+    ('Desktop 680px @1x', 680, 1),
+    ('Desktop 680px @2x', 680, 2),
+)
+
+def make_upload(width=4032, height=3024):
+    """Build a noisy, photo-like JPEG similar to a phone camera upload."""
+    red = Image.linear_gradient('L').resize((width, height))
+    green = Image.radial_gradient('L').resize((width, height))
+    blue = Image.effect_noise((width, height), 64).filter(ImageFilter.GaussianBlur(1))
+    image = Image.merge('RGB', (red, green, blue))
+    image = Image.blend(image, Image.effect_noise((width, height), 48).convert('RGB'), 0.35)
+
+    exif = Image.Exif()
+    exif[0x0110] = 'Benchmark Phone'  # Model
+    exif[0x0112] = 1                  # Orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=95, exif=exif)
+    return buffer.getvalue()
+
+def pick_width(widths, needed):
+    """Return the srcset candidate a browser picks for a needed pixel width."""
+    for width in widths:
+        if width >= needed:
+            return width
+    return widths[-1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--posts', type=int, default=10, help='Image posts per feed page')
+    args = parser.parse_args()
+
+    upload = make_upload()
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        widths, _, placeholder = render_variants(upload, tmp, 'bench', Config.IMAGE_VARIANT_WIDTHS,
+                                 Config.IMAGE_QUALITY, 800, 70)
+        elapsed = time.perf_counter() - start
+
+        def size(width, ext):
+            return os.path.getsize(os.path.join(tmp, variant_name('bench', width, ext)))
+
+        print(f"Original upload: {len(upload) / 1024:,.0f} KiB, pipeline took {elapsed * 1000:.0f} ms")
+        print(f"Inline placeholder: {len(placeholder)} bytes")
+        print("Variants (KiB):")
+        for width in widths + [SAVER_SUFFIX]:
+            print(f"  {str(width):>5}  webp {size(width, 'webp') / 1024:8,.1f}  jpg {size(width, 'jpg') / 1024:8,.1f}")
+
+        before = len(upload) * args.posts
+        print(f"\nBytes per feed page of {args.posts} image posts:")
+        print(f"  {'Viewport':<20} {'before':>10} {'after webp':>12} {'after jpg':>12}")
+        rows = [(label, pick_width(widths, css_width * dpr)) for label, css_width, dpr in VIEWPORTS]
+        rows.append(('Data saver', SAVER_SUFFIX))
+        for label, width in rows:
+            webp = size(width, 'webp') * args.posts
+            jpg = size(width, 'jpg') * args.posts
+            print(f"  {label:<20} {before / 1024:>8,.0f}Ki {webp / 1024:>10,.0f}Ki {jpg / 1024:>10,.0f}Ki"
+                  f"  ({before / webp:.0f}x / {before / jpg:.0f}x smaller)")
+
+if __name__ == "__main__":
+    main()
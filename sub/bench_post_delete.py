@@ -0,0 +1,119 @@
+"""
+Benchmark post deletion.
+Compares the ORM cascade (``db.session.delete(post)``) with the set-based
+bulk_delete_post path on a post with many likes and comments.
+
+Usage:
+    python -m sub.bench_post_delete [--likes 50000] [--comments 5000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config, TestingConfig
+
+def make_app(db_path):
+    """Create an application bound to a scratch SQLite database."""
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+
+    config['bench'] = BenchConfig
+    from app import create_app
+    return create_app('bench')
+
+def seed_post(likes, comments):
+    """Create one post with the given number of likes and comments.
+
+    Returns:
+        int: ID of the seeded post
+    """
+    from sqlalchemy import insert
+    from models import db
+    from models.user import User
+    from models.post import Post, Like
+    from models.comment import Comment
+
+    author = User.query.filter_by(username='bench').first()
+    if author is None:
+        author = User(username='bench', email='bench@example.com', password='x',
+                      first_name='Bench', last_name='User')
+        db.session.add(author)
+        db.session.commit()
+
+    post = Post(content='Benchmark post', user_id=author.id,
+                like_count=likes, comment_count=comments)
+    db.session.add(post)
+    db.session.commit()
+    post_id = post.id
+
+    now = datetime.utcnow()
+    # Likes only need distinct user IDs; SQLite does not enforce the foreign key
+    db.session.execute(insert(Like), [
+        {'user_id': user_id, 'post_id': post_id, 'created_at': now}
+        for user_id in range(1, likes + 1)
+    ])
+    db.session.execute(insert(Comment), [
+        {'content': 'Benchmark comment', 'user_id': author.id, 'post_id': post_id,
+         'created_at': now, 'updated_at': now}
+        for _ in range(comments)
+    ])
+    db.session.commit()
+    db.session.expunge_all()
+    return post_id
+
+def time_cascade(post_id):
+    """Delete a post through the ORM cascade and return the elapsed seconds."""
+    from models import db
+    from models.post import Post
+
+    start = time.perf_counter()
+    post = db.session.get(Post, post_id)
+    db.session.delete(post)
+    db.session.commit()
+    return time.perf_counter() - start
+
+def time_bulk(post_id):
+    """Delete a post with bulk_delete_post and return the elapsed seconds."""
+    from models import db
+    from models.post import Post
+    from handlers.feed_handler import bulk_delete_post
+
+    start = time.perf_counter()
+    post = db.session.get(Post, post_id)
+    if not bulk_delete_post(post):
+        raise RuntimeError('bulk_delete_post failed')
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--likes', type=int, default=50000)
+    parser.add_argument('--comments', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            from models.post import Like
+            from models.comment import Comment
+
+            print(f"Post with {args.likes} likes and {args.comments} comments")
+
+            post_id = seed_post(args.likes, args.comments)
+            cascade = time_cascade(post_id)
+            print(f"  ORM cascade delete: {cascade * 1000:9.1f} ms")
+
+            post_id = seed_post(args.likes, args.comments)
+            bulk = time_bulk(post_id)
+            print(f"  Bulk delete:        {bulk * 1000:9.1f} ms")
+
+            leftover = Like.query.count() + Comment.query.count()
+            print(f"  Speedup: {cascade / bulk:.1f}x (leftover dependent rows: {leftover})")
+
+if __name__ == "__main__":
+    main()
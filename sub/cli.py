@@ -0,0 +1,86 @@
+"""
+Command line maintenance tasks for SocialLite.
+Registers `flask` CLI commands on the application.
+"""
+
+import click
+
+def init_app(app):
+    """
+    Register maintenance commands with the application
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters():
+        """Backfill and repair the denormalized post like/comment counters."""
+        from handlers.feed_handler import reconcile_post_counters
+
+        updated = reconcile_post_counters()
+        click.echo(f"Reconciled counters for {updated} posts.")
+
+    @app.cli.command('rebuild-timelines')
+    def rebuild_timelines():
+        """Rebuild every home timeline by fanning out all existing posts."""
+        from handlers.timeline_handler import rebuild_timelines as rebuild
+
+        count = rebuild()
+        click.echo(f"Fanned out {count} posts.")
+
+    @app.cli.command('rescore-posts')
+    @click.option('--full', is_flag=True, help='Rescore every post, not only those with new engagement.')
+    @click.option('--batch-size', default=1000, show_default=True, help='Posts scored per batch.')
+    def rescore_posts(full, batch_size):
+        """Recompute feed ranking scores."""
+        from handlers.ranking_handler import rescore_posts as rescore
+
+        count = rescore(batch_size=batch_size, full=full)
+        click.echo(f"Rescored {count} posts.")
+
+    @app.cli.command('prune-uploads')
+    @click.option('--max-age-hours', type=int, default=None, help='Defaults to CHUNKED_UPLOAD_TTL_HOURS.')
+    def prune_uploads(max_age_hours):
+        """Delete abandoned chunked uploads and their partial files."""
+        from handlers.upload_handler import prune_uploads as prune
+
+        count = prune(max_age_hours or app.config.get('CHUNKED_UPLOAD_TTL_HOURS', 24))
+        click.echo(f"Pruned {count} uploads.")
+
+    @app.cli.command('build-assets')
+    def build_assets():
+        """Bundle, minify and fingerprint CSS/JS into static/dist."""
+        from utils.assets import build_assets as build, missing_minifiers
+
+        for name, filename in build(app).items():
+            click.echo(f"{name} -> {filename}")
+        for package, consequence in missing_minifiers():
+            click.echo(f"Warning: {package} is not installed; {consequence}. "
+                       f"Install requirements.txt for a full build.", err=True)
+
+    @app.cli.command('backfill-placeholders')
+    @click.option('--batch-size', default=200, show_default=True, help='Rows updated per transaction.')
+    def backfill_placeholders(batch_size):
+        """Compute image sizes and placeholders for existing posts and avatars."""
+        from handlers.media_handler import backfill_placeholders as backfill
+
+        count = backfill(batch_size=batch_size)
+        click.echo(f"Updated {count} images.")
+
+    @app.cli.command('migrate-uploads')
+    @click.option('--batch-size', default=500, show_default=True, help='Filenames read per batch.')
+    @click.option('--dry-run', is_flag=True, help='Only report what would be moved.')
+    def migrate_uploads(batch_size, dry_run):
+        """Move attachments out of static/, shard flat uploads and rewrite stored names."""
+        from sub.migrate_uploads import migrate_uploads as migrate
+
+        count = migrate(batch_size=batch_size, dry_run=dry_run)
+        click.echo(f"Migrated {count} uploads.")
+
+    @app.cli.command('rebuild-conversations')
+    def rebuild_conversations():
+        """Recompute the inbox conversation summaries from all messages."""
+        from models.conversation import rebuild_conversations as rebuild
+
+        count = rebuild()
+        click.echo(f"Rebuilt {count} conversations.")
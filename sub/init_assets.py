@@ -78,7 +78,7 @@ def create_upload_directories():
         os.path.join('static', 'uploads', 'profile_pics'),
         os.path.join('static', 'uploads', 'posts'),
         os.path.join('static', 'uploads', 'stories'),
-        os.path.join('static', 'uploads', 'message_attachments')
+        os.path.join('instance', 'message_attachments')
     ]
     
     for directory in upload_dirs:
@@ -93,7 +93,11 @@ def migrate_database():
             'last_login': 'DATETIME',
             'last_seen': 'DATETIME',
             'status_message': 'VARCHAR(100)',
-            'typing_to': 'INTEGER'
+            'typing_to': 'INTEGER',
+            'fanout_on_read': 'BOOLEAN DEFAULT 0 NOT NULL',
+            'profile_image_width': 'INTEGER',
+            'profile_image_height': 'INTEGER',
+            'profile_image_placeholder': 'TEXT'
         }
 
         for column, column_type in users_columns_to_add.items():
@@ -101,6 +105,103 @@ def migrate_database():
                 print(f"Adding column {column} to users table...")
                 cursor.execute(f"ALTER TABLE users ADD COLUMN {column} {column_type}")
 
+        # Now check and update the posts table
+        print("Checking posts table...")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='posts'")
+        if cursor.fetchone():
+            cursor.execute(f"PRAGMA table_info(posts)")
+            post_columns = [column[1] for column in cursor.fetchall()]
+            print(f"Current post columns: {post_columns}")
+
+            posts_columns_to_add = {
+                'like_count': 'INTEGER DEFAULT 0 NOT NULL',
+                'comment_count': 'INTEGER DEFAULT 0 NOT NULL',
+                'score': 'FLOAT DEFAULT 0 NOT NULL',
+                'engaged_at': 'DATETIME',
+                'scored_at': 'DATETIME',
+                'version': 'INTEGER DEFAULT 1 NOT NULL',
+                'image_widths': 'VARCHAR(64)',
+                'image_width': 'INTEGER',
+                'image_height': 'INTEGER',
+                'image_placeholder': 'TEXT'
+            }
+
+            for column, column_type in posts_columns_to_add.items():
+                if column not in post_columns:
+                    print(f"Adding column {column} to posts table...")
+                    cursor.execute(f"ALTER TABLE posts ADD COLUMN {column} {column_type}")
+
+            # Backfill the new counters from the likes and comments tables
+            if 'like_count' not in post_columns:
+                print("Backfilling post like/comment counters...")
+                cursor.execute("""
+                    UPDATE posts SET
+                        like_count = (SELECT COUNT(*) FROM likes WHERE likes.post_id = posts.id),
+                        comment_count = (SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id)
+                """)
+
+        # Image metadata on blobs stored before placeholders were computed
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='blobs'")
+        if cursor.fetchone():
+            cursor.execute("PRAGMA table_info(blobs)")
+            blob_columns = [column[1] for column in cursor.fetchall()]
+
+            blobs_columns_to_add = {
+                'width': 'INTEGER',
+                'height': 'INTEGER',
+                'placeholder': 'TEXT'
+            }
+
+            for column, column_type in blobs_columns_to_add.items():
+                if column not in blob_columns:
+                    print(f"Adding column {column} to blobs table...")
+                    cursor.execute(f"ALTER TABLE blobs ADD COLUMN {column} {column_type}")
+
+        # Read watermarks on conversations created before they existed
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='conversations'")
+        if cursor.fetchone():
+            cursor.execute("PRAGMA table_info(conversations)")
+            conversation_columns = [column[1] for column in cursor.fetchall()]
+
+            conversations_columns_to_add = {
+                'read_up_to_a': 'INTEGER NOT NULL DEFAULT 0',
+                'read_up_to_b': 'INTEGER NOT NULL DEFAULT 0'
+            }
+
+            for column, column_type in conversations_columns_to_add.items():
+                if column not in conversation_columns:
+                    print(f"Adding column {column} to conversations table...")
+                    cursor.execute(f"ALTER TABLE conversations ADD COLUMN {column} {column_type}")
+
+        # Create secondary indexes that db.create_all() only adds to new tables
+        indexes_to_create = {
+            'ix_posts_created_at_id': 'posts (created_at, id)',
+            'ix_posts_user_created_id': 'posts (user_id, created_at, id)',
+            'ix_posts_score_id': 'posts (score, id)',
+            'ix_posts_unscored': 'posts (id) WHERE scored_at IS NULL',
+            'ix_posts_rescore': 'posts (id) WHERE engaged_at > scored_at',
+            'ix_comments_post_created_id': 'comments (post_id, created_at, id)',
+            'ix_messages_conversation_id': 'messages (min(sender_id, recipient_id), max(sender_id, recipient_id), id)',
+            'ix_messages_recipient_read_sender': 'messages (recipient_id, read, sender_id)',
+            'ix_friend_requests_pending': "friend_requests (recipient_id, created_at) WHERE status = 'pending'",
+            'ix_friendships_friend_user': 'friendships (friend_id, user_id)',
+            'ix_follows_followed_follower': 'follows (followed_id, follower_id)',
+            'ix_likes_post_id': 'likes (post_id)',
+            'ix_timeline_entries_post_id': 'timeline_entries (post_id)'
+        }
+
+        # Superseded by ix_messages_conversation_id
+        cursor.execute("DROP INDEX IF EXISTS ix_messages_conversation")
+
+        for index_name, index_def in indexes_to_create.items():
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+                           (index_def.split(' ', 1)[0],))
+            if not cursor.fetchone():
+                # db.create_all() will create the table along with its indexes
+                continue
+            print(f"Ensuring index {index_name}...")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {index_def}")
+
         # Commit the changes
         conn.commit()
         print("Migration completed successfully!")
@@ -116,7 +217,9 @@ def migrate_database():
 
 def create_uploads_directory():
     """Create directory for message attachments."""
-    uploads_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads', 'message_attachments')
+    # Outside static/, so attachments are only served after the participant check
+    uploads_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'instance', 'message_attachments')
     if not os.path.exists(uploads_dir):
         print(f"Creating directory: {uploads_dir}")
         os.makedirs(uploads_dir)
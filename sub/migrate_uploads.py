@@ -0,0 +1,184 @@
+"""
+Move uploads stored flat in their namespace folder into the sharded layout.
+
+Message attachments still under ``static/uploads/message_attachments`` are
+first moved to MESSAGE_ATTACHMENT_FOLDER, outside static/. Each file is moved into its ``ab/cd`` shard directory, then every stored
+filename that refers to it (blobs, posts, users, messages) is rewritten in
+one transaction. Work is done in batches of filenames and only flat names
+are selected, so the migration can be stopped and re-run at any point: a
+file already moved by an interrupted run is detected and only its rows are
+updated.
+
+Usage:
+    python -m sub.migrate_uploads [--batch-size 500] [--dry-run]
+    flask migrate-uploads [--batch-size 500] [--dry-run]
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Pictures shipped with the app and shared by every user who has not uploaded one
+SHARED_FILES = {'default.jpg'}
+
+def _references():
+    """Return ``(namespace, model, column)`` for every stored upload filename."""
+    from models.blob import Blob
+    from models.post import Post
+    from models.user import User
+    from models.message import Message
+
+    return [
+        ('post_images', Post, Post.image),
+        ('profile_pics', User, User.profile_image),
+        ('message_attachments', Message, Message.attachment_filename),
+        ('post_images', Blob, Blob.filename),
+        ('profile_pics', Blob, Blob.filename),
+        ('message_attachments', Blob, Blob.filename),
+    ]
+
+def _files_of(namespace, filename):
+    """List the flat files that make up one stored upload."""
+    from models.post import Post
+    from utils.image_pipeline import image_stem
+    from utils.blob_store import namespace_folder
+
+    folder = namespace_folder(namespace)
+    if namespace == 'post_images':
+        post = Post.query.filter(Post.image == filename, Post.image_widths.isnot(None)).first()
+        if post is not None:
+            # Every responsive variant shares the stem of the stored name
+            stem = image_stem(filename, post.image_widths)
+            return [os.path.basename(path) for path in glob.glob(os.path.join(glob.escape(folder), stem + '_*'))]
+    return [filename]
+
+def migrate_file(namespace, filename, dry_run=False):
+    """Move one flat upload into its shard and rewrite its references.
+
+    Returns:
+        bool: True if the upload was migrated
+    """
+    from models import db
+    from models.blob import Blob
+    from models.post import Post
+    from models.user import User
+    from utils.blob_store import namespace_folder, shard_dir
+
+    folder = namespace_folder(namespace)
+    stem = filename.split('_', 1)[0].rsplit('.', 1)[0]
+    shard = shard_dir(stem)
+    new_filename = f"{shard}/{filename}"
+
+    names = _files_of(namespace, filename)
+    moved_before = not os.path.exists(os.path.join(folder, filename)) and \
+        os.path.exists(os.path.join(folder, shard, filename))
+    if not moved_before and not os.path.exists(os.path.join(folder, filename)):
+        print(f"Skipping {namespace}/{filename}: file not found")
+        return False
+
+    if dry_run:
+        print(f"Would move {namespace}/{filename} -> {new_filename} ({len(names)} files)")
+        return True
+
+    os.makedirs(os.path.join(folder, shard), exist_ok=True)
+    for name in names:
+        source = os.path.join(folder, name)
+        if os.path.exists(source):
+            os.replace(source, os.path.join(folder, shard, name))
+
+    try:
+        for ref_namespace, model, column in _references():
+            if ref_namespace != namespace:
+                continue
+            values = {column: new_filename}
+            query = model.query.filter(column == filename)
+            if model is Blob:
+                query = query.filter(Blob.namespace == namespace)
+            elif model is Post:
+                # Cached post cards embed the image URL
+                values[Post.version] = Post.version + 1
+            elif model is User:
+                for user_id, in db.session.query(User.id).filter(column == filename):
+                    Post.bump_author_versions(user_id)
+            query.update(values, synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error rewriting references to {namespace}/{filename}: {str(e)}")
+        return False
+    return True
+
+def move_legacy_attachments(dry_run=False):
+    """Move message attachments out of static/ into their private folder.
+
+    Relative paths are kept, so stored filenames stay valid.
+
+    Returns:
+        int: Number of files moved
+    """
+    from flask import current_app
+    from utils.blob_store import LEGACY_ATTACHMENT_FOLDER, namespace_folder
+
+    source = os.path.join(current_app.static_folder, LEGACY_ATTACHMENT_FOLDER)
+    target = namespace_folder('message_attachments')
+    moved = 0
+    for folder, _, names in os.walk(source):
+        for name in names:
+            path = os.path.join(folder, name)
+            destination = os.path.join(target, os.path.relpath(path, source))
+            if dry_run:
+                print(f"Would move {path} -> {destination}")
+            else:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                os.replace(path, destination)
+            moved += 1
+    return moved
+
+def migrate_uploads(batch_size=500, dry_run=False):
+    """Migrate every flat upload, one batch of filenames at a time.
+
+    Returns:
+        int: Number of uploads migrated
+    """
+    from models import db
+
+    moved = move_legacy_attachments(dry_run)
+    if moved:
+        print(f"message_attachments: {moved} files moved out of static/")
+
+    migrated = 0
+    for namespace, model, column in _references():
+        last = ''
+        while True:
+            query = db.session.query(column).distinct()\
+                .filter(column.isnot(None), column > last, ~column.contains('/'))
+            if hasattr(model, 'namespace'):
+                query = query.filter(model.namespace == namespace)
+            filenames = [name for name, in query.order_by(column).limit(batch_size)]
+            if not filenames:
+                break
+
+            for filename in filenames:
+                if filename not in SHARED_FILES and migrate_file(namespace, filename, dry_run):
+                    migrated += 1
+            last = filenames[-1]
+            print(f"{namespace} ({model.__tablename__}): {migrated} uploads migrated so far")
+    return migrated
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=500, help='Filenames read per batch')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        count = migrate_uploads(args.batch_size, args.dry_run)
+    print(f"Migrated {count} uploads.")
+
+if __name__ == "__main__":
+    main()
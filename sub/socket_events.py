@@ -56,6 +56,10 @@ def handle_connect():
         # Join user's personal room for direct messages
         join_room(f'user_{user_id}')
 
+        # Bring the page's badges up to date; later changes are pushed to the room
+        from handlers.badge_counter import badge_counter
+        emit('badge_counts', badge_counter.get(user_id))
+
         # Join rooms for all active conversations
         active_conversations = get_user_active_conversations(user_id)
         for conversation in active_conversations:
@@ -274,17 +278,10 @@ def handle_read_message(data):
             if message.recipient_id != user_id:
                 return {'error': 'Unauthorized'}
 
-            # Mark as read
-            if not message.read:
-                message.mark_as_read()
-                commit_to_db()
-
-                # Send read receipt to sender
-                read_data = {
-                    'message_id': message.id,
-                    'read_at': message.read_at.isoformat() if message.read_at else None
-                }
-                emit('message_read', read_data, room=f'user_{message.sender_id}')
+            # Reading a message means everything before it was seen too; the
+            # sender gets one messages_read_up_to receipt
+            from handlers.message_handler import mark_conversation_read
+            mark_conversation_read(user_id, message.sender_id, up_to_id=message.id)
 
             return {'success': True}
 
@@ -324,31 +321,18 @@ def get_user_friends(user_id):
         print(f"Error getting user friends: {str(e)}")
         return []
 
-def get_user_active_conversations(user_id):
-    """Get user's active conversations"""
-    # Get recent messages sent by or to the user
-    sent_messages = Message.query.filter_by(sender_id=user_id).order_by(Message.created_at.desc()).limit(20).all()
-    received_messages = Message.query.filter_by(recipient_id=user_id).order_by(Message.created_at.desc()).limit(20).all()
-
-    # Combine and sort by most recent
-    all_messages = sent_messages + received_messages
-    all_messages.sort(key=lambda x: x.created_at, reverse=True)
-
-    # Extract unique conversation partners
-    conversations = []
-    conversation_partners = set()
-
-    for message in all_messages:
-        other_user_id = message.recipient_id if message.sender_id == user_id else message.sender_id
+def get_user_active_conversations(user_id, limit=20):
+    """Get user's most recently active conversations"""
+    from sqlalchemy.orm import joinedload
+    from models.conversation import Conversation
 
-        if other_user_id not in conversation_partners:
-            conversation_partners.add(other_user_id)
-            conversations.append({
-                'other_user_id': other_user_id,
-                'last_message': message
-            })
+    conversations = Conversation.for_user(user_id)\
+        .options(joinedload(Conversation.last_message)).limit(limit).all()
 
-    return conversations
+    return [{
+        'other_user_id': conversation.other_user_id(user_id),
+        'last_message': conversation.last_message
+    } for conversation in conversations]
 
 # Periodic task to clean up inactive typing indicators
 def cleanup_typing_indicators():
@@ -0,0 +1,61 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config, TestingConfig
+
+@pytest.fixture
+def app(tmp_path):
+    """An application bound to a scratch database and upload folders."""
+    class ScratchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        MESSAGE_ATTACHMENT_FOLDER = str(tmp_path / 'message_attachments')
+        CHUNKED_UPLOAD_FOLDER = str(tmp_path / 'chunked_uploads')
+        THUMBNAIL_CACHE_FOLDER = str(tmp_path / 'thumbnails')
+
+    config['scratch'] = ScratchConfig
+    from app import create_app
+    from models import db
+    from handlers.badge_counter import badge_counter
+    from handlers.trending_handler import trending
+    from utils.fragment_cache import post_card_cache
+
+    app = create_app('scratch')
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+    # Process-wide caches keyed by ids the next scratch database reuses
+    post_card_cache.clear()
+    badge_counter.clear()
+    trending.clear()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def make_user(app):
+    """Create users named after the argument."""
+    from models import db
+    from models.user import User
+
+    def make(username):
+        user = User(username=username, email=f'{username}@example.com', password='x',
+                    first_name=username, last_name='User')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+@pytest.fixture
+def login(client):
+    """Log the test client in as a user without going through the form."""
+    def log_in(user):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+    return log_in
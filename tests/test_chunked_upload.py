@@ -0,0 +1,88 @@
+import os
+import pytest
+from models.message import Message
+from handlers import upload_handler
+
+@pytest.fixture
+def upload(client, login, make_user):
+    """Start a 10 byte upload from alice to bob."""
+    login(make_user('alice'))
+    make_user('bob')
+    response = client.post('/messages/api/messages/bob/uploads', json={'filename': 'notes.pdf', 'size': 10})
+    assert response.status_code == 201
+    return response.get_json()['upload_id']
+
+def put_chunk(client, upload_id, offset, data):
+    return client.put(f'/messages/api/messages/bob/uploads/{upload_id}', data=data,
+                      headers={'Upload-Offset': str(offset)})
+
+def part_bytes(app, upload_id):
+    with open(os.path.join(app.config['CHUNKED_UPLOAD_FOLDER'], upload_id + '.part'), 'rb') as f:
+        return f.read()
+
+def test_chunks_resume_from_committed_offset(app, client, upload):
+    assert put_chunk(client, upload, 0, b'hello').status_code == 200
+    assert put_chunk(client, upload, 5, b'world').get_json()['complete']
+    assert part_bytes(app, upload) == b'helloworld'
+
+def test_retried_chunk_does_not_truncate_committed_bytes(app, client, upload):
+    assert put_chunk(client, upload, 0, b'hello').status_code == 200
+    assert put_chunk(client, upload, 5, b'wor').status_code == 200
+
+    # A late retry of the second chunk, shorter than what is now committed
+    response = put_chunk(client, upload, 5, b'w')
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 8
+    assert part_bytes(app, upload) == b'hellowor'
+
+def test_chunk_is_refused_while_another_request_writes(app, client, upload):
+    path = os.path.join(app.config['CHUNKED_UPLOAD_FOLDER'], upload + '.part')
+    with open(path, 'r+b') as part:
+        assert upload_handler._try_lock(upload, part)
+        try:
+            response = put_chunk(client, upload, 0, b'hello')
+        finally:
+            upload_handler._unlock(upload)
+
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 0
+    assert part_bytes(app, upload) == b''
+    assert put_chunk(client, upload, 0, b'hello').status_code == 200
+
+def finalize(client, upload_id):
+    return client.post(f'/messages/api/messages/bob/uploads/{upload_id}/finalize', json={'content': 'Notes'})
+
+def test_finalize_is_refused_while_another_request_holds_the_upload(app, client, upload):
+    assert put_chunk(client, upload, 0, b'helloworld').status_code == 200
+
+    path = os.path.join(app.config['CHUNKED_UPLOAD_FOLDER'], upload + '.part')
+    with open(path, 'rb') as part:
+        assert upload_handler._try_lock(upload, part)
+        try:
+            response = finalize(client, upload)
+        finally:
+            upload_handler._unlock(upload)
+
+    assert response.status_code == 409
+    assert Message.query.count() == 0
+    assert finalize(client, upload).status_code == 201
+
+    # A retry after it went through neither crashes nor sends it again
+    assert finalize(client, upload).status_code in (404, 409)
+    assert Message.query.count() == 1
+
+def test_finalize_of_a_session_finalized_meanwhile_is_refused(app, client, upload, monkeypatch):
+    assert put_chunk(client, upload, 0, b'helloworld').status_code == 200
+
+    get_session = upload_handler._get_session
+
+    def get_session_then_finalize(upload_id, recipient_username):
+        # Another request finalizes after this one loaded the session
+        session = get_session(upload_id, recipient_username)
+        monkeypatch.setattr(upload_handler, '_get_session', get_session)
+        assert finalize(client, upload).status_code == 201
+        return session
+
+    monkeypatch.setattr(upload_handler, '_get_session', get_session_then_finalize)
+    assert finalize(client, upload).status_code == 409
+    assert Message.query.count() == 1
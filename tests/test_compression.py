@@ -0,0 +1,30 @@
+import gzip
+import pytest
+from utils import compression
+
+@pytest.fixture
+def static(app, tmp_path, monkeypatch):
+    """A static folder with a precompressed stylesheet, and a .gz file next to it."""
+    monkeypatch.setattr(compression, '_settings', lambda: (True, 6, 4))
+    folder = tmp_path / 'static'
+    (folder / 'css').mkdir(parents=True)
+    (folder / 'css' / 'site.css').write_text('body { color: red; }')
+    (folder / 'css' / 'site.css.gz').write_bytes(gzip.compress(b'body { color: red; }'))
+    (tmp_path / 'secret.txt.gz').write_bytes(gzip.compress(b'outside static'))
+
+    original = app.static_folder
+    app.static_folder = str(folder)
+    yield folder
+    app.static_folder = original
+
+def test_precompressed_sibling_is_served(client, static):
+    response = client.get('/static/css/site.css', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == b'body { color: red; }'
+
+@pytest.mark.parametrize('path', ['/static/..%2fsecret.txt', '/static/css/..%2f..%2fsecret.txt'])
+def test_sibling_outside_static_is_not_served(client, static, path):
+    response = client.get(path, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code != 200
+    assert 'Content-Encoding' not in response.headers
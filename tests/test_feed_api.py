@@ -0,0 +1,22 @@
+from models import db
+from models.post import Post
+from models.comment import Comment
+from handlers.timeline_handler import fan_out_post
+
+def test_feed_api_returns_loadable_image_urls(client, login, make_user):
+    alice = make_user('alice')
+    alice.profile_image = 'ab/cd/avatar.jpg'
+    post = Post(content='Photo', user_id=alice.id, image='12/34/stem_1280.jpg', image_widths='320,640,1280')
+    db.session.add(post)
+    db.session.commit()
+    fan_out_post(post)
+    db.session.add(Comment(content='Nice', user_id=alice.id, post_id=post.id))
+    db.session.commit()
+
+    login(alice)
+    data = client.get('/api/v1/posts/feed').get_json()['posts'][0]
+    assert data['image'] == '/media/post_images/12/34/stem_640.jpg'
+    assert data['author']['profile_image'] == '/img/80x80/profile_pics/ab/cd/avatar.jpg'
+
+    comment = client.get(f'/post/{post.id}/comments').get_json()['comments'][0]
+    assert comment['author']['profile_image'] == '/img/64x64/profile_pics/ab/cd/avatar.jpg'
@@ -0,0 +1,72 @@
+from contextlib import contextmanager
+import pytest
+from flask_login import login_user
+from sqlalchemy import event
+from models import db
+from models.post import Post, Like
+from models.comment import Comment
+from models.friendship import Follow
+from handlers.feed_handler import get_posts
+from handlers.timeline_handler import fan_out_post
+
+@contextmanager
+def count_queries():
+    """Count the statements sent to the database inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+@pytest.fixture
+def seed_posts(make_user):
+    """Create ``count`` posts, each by a different author, with likes and comments."""
+    def seed(count):
+        viewer = make_user('viewer')
+        for n in range(count):
+            author = make_user(f'author{n}')
+            db.session.add(Follow(follower_id=viewer.id, followed_id=author.id))
+            post = Post(content=f'Post {n}', user_id=author.id)
+            db.session.add(post)
+            db.session.flush()
+            db.session.add_all([
+                Like(user_id=viewer.id, post_id=post.id),
+                Comment(content='Nice', user_id=viewer.id, post_id=post.id),
+            ])
+            Post.adjust_counters(post.id, likes=1, comments=1)
+            fan_out_post(post)
+        return viewer
+    return seed
+
+def feed_page_queries(app, viewer, per_page):
+    """Count the statements that load one feed page and everything its cards show."""
+    with app.test_request_context():
+        login_user(viewer)
+        with count_queries() as statements:
+            posts = get_posts(page=1, per_page=per_page)
+            for post in posts.items:
+                post.author.username, post.like_count, post.comment_count, post.liked_by_viewer
+    assert len(posts.items) == per_page
+    return len(statements)
+
+def test_feed_page_query_count_does_not_depend_on_page_size(app, seed_posts):
+    viewer = seed_posts(20)
+    # The page, its total, its authors and the viewer's likes, however many posts
+    assert feed_page_queries(app, viewer, 2) == feed_page_queries(app, viewer, 20) == 4
+
+def test_feed_api_query_count_does_not_depend_on_limit(client, login, seed_posts):
+    viewer = seed_posts(20)
+    login(viewer)
+
+    counts = []
+    for limit in (2, 20):
+        with count_queries() as statements:
+            response = client.get(f'/api/v1/posts/feed?limit={limit}')
+        assert len(response.get_json()['posts']) == limit
+        counts.append(len(statements))
+    assert counts[0] == counts[1]
@@ -0,0 +1,46 @@
+import pytest
+from flask_login import login_user
+from models import db
+from models.post import Post
+from utils.fragment_cache import render_post_card, render_card_pieces, fill_viewer_state
+
+# Text a post may contain that looks like the old card placeholders
+LOOKALIKE = '__CSRF_TOKEN__ __LIKED_CLASS__ __LIKE_ICON__ @@0123456789abcdef:csrf_token@@'
+
+@pytest.fixture
+def post(app, make_user):
+    author = make_user('alice')
+    post = Post(content=LOOKALIKE, user_id=author.id)
+    db.session.add(post)
+    db.session.commit()
+    post.liked_by_viewer = True
+    return post
+
+def test_user_content_is_not_substituted(app, post):
+    with app.test_request_context():
+        html = fill_viewer_state(render_card_pieces(post), post, post.user_id, 'secret-token')
+
+    assert LOOKALIKE in html
+    assert post.created_at.strftime('%b %d, %Y') in html
+    assert html.count('secret-token') == 2
+    assert 'fas fa-thumbs-up' in html
+
+def test_owner_block_is_only_shown_to_the_author(app, post):
+    with app.test_request_context():
+        pieces = render_card_pieces(post)
+    assert 'Delete Post' in fill_viewer_state(pieces, post, post.user_id, 'token')
+    owner_hidden = fill_viewer_state(pieces, post, post.user_id + 1, 'token')
+    assert 'Delete Post' not in owner_hidden
+    assert LOOKALIKE in owner_hidden
+
+def test_cached_card_is_filled_per_viewer(app, post, make_user):
+    viewer = make_user('bob')
+    with app.test_request_context():
+        login_user(viewer)
+        post.liked_by_viewer = False
+        first = render_post_card(post)
+        post.liked_by_viewer = True
+        second = render_post_card(post)
+
+    assert 'far fa-thumbs-up' in first and 'fas fa-thumbs-up' in second
+    assert 'Delete Post' not in first
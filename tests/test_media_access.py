@@ -0,0 +1,72 @@
+import os
+import pytest
+from models import db
+from models.message import Message
+from utils.blob_store import LEGACY_ATTACHMENT_FOLDER, namespace_folder
+
+SECRET = b'private attachment bytes'
+
+@pytest.fixture
+def attachment(app, make_user):
+    """A message between two users with an attachment stored on disk."""
+    sender, recipient = make_user('alice'), make_user('bob')
+    filename = 'ab/cd/0123abcd_notes.txt'
+    path = os.path.join(namespace_folder('message_attachments'), filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(SECRET)
+
+    message = Message(content='See attached', sender_id=sender.id, recipient_id=recipient.id,
+                      attachment_filename=filename, attachment_type='file')
+    db.session.add(message)
+    db.session.commit()
+    return message
+
+@pytest.fixture
+def legacy_static(app, tmp_path):
+    """Point the static folder somewhere an unmigrated attachment can be placed."""
+    static = tmp_path / 'static'
+    legacy = static / LEGACY_ATTACHMENT_FOLDER / 'ab' / 'cd'
+    legacy.mkdir(parents=True)
+    (legacy / '0123abcd_notes.txt').write_bytes(SECRET)
+
+    original = app.static_folder
+    app.static_folder = str(static)
+    yield
+    app.static_folder = original
+
+def test_attachments_are_stored_outside_static(app):
+    folder = os.path.realpath(namespace_folder('message_attachments'))
+    static = os.path.realpath(app.static_folder)
+    assert os.path.commonpath([folder, static]) != static
+
+def test_participant_can_download_attachment(client, login, attachment):
+    login(attachment.recipient)
+    response = client.get(f'/media/attachments/{attachment.id}')
+    assert response.status_code == 200
+    assert response.data == SECRET
+
+def test_anonymous_request_is_refused(client, attachment):
+    response = client.get(f'/media/attachments/{attachment.id}')
+    assert response.status_code != 200
+    assert SECRET not in response.data
+
+@pytest.mark.parametrize('path', [
+    '/static/uploads/message_attachments/ab/cd/0123abcd_notes.txt',
+    '/static/uploads//message_attachments/ab/cd/0123abcd_notes.txt',
+    '/static/uploads/./message_attachments/ab/cd/0123abcd_notes.txt',
+    '/static//uploads/message_attachments/ab/cd/0123abcd_notes.txt',
+    '/static/img/../uploads/message_attachments/ab/cd/0123abcd_notes.txt',
+])
+def test_static_route_does_not_serve_attachments(client, legacy_static, path):
+    response = client.get(path)
+    assert response.status_code != 200
+    assert SECRET not in response.data
+
+def test_api_attachment_url_serves_the_attachment(app, client, login, attachment):
+    with app.test_request_context():
+        data = attachment.to_dict()
+    assert data['thumbnail_url'] is None
+
+    login(attachment.recipient)
+    assert client.get(data['attachment_url']).data == SECRET
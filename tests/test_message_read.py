@@ -0,0 +1,45 @@
+from sqlalchemy.orm import Session
+from models import db
+from models.message import Message
+from models.conversation import Conversation
+from handlers.message_handler import mark_conversation_read
+
+def send(session, sender, recipient, content):
+    message = Message(content=content, sender_id=sender.id, recipient_id=recipient.id)
+    session.add(message)
+    session.commit()
+    return message.id
+
+def test_marking_read_advances_watermark_and_unread_count(app, make_user):
+    alice, bob = make_user('alice'), make_user('bob')
+    ids = [send(db.session, alice, bob, f'Hi {n}') for n in range(3)]
+
+    assert mark_conversation_read(bob.id, alice.id, up_to_id=ids[1]) == 2
+    conversation = Conversation.between(alice.id, bob.id)
+    assert conversation.unread_for(bob.id) == 1
+    assert getattr(conversation, f'read_up_to_{conversation.side(bob.id)}') == ids[1]
+
+    # Repeating it changes nothing
+    assert mark_conversation_read(bob.id, alice.id, up_to_id=ids[1]) == 0
+    assert Conversation.between(alice.id, bob.id).unread_for(bob.id) == 1
+
+def test_message_sent_while_marking_read_stays_unread(app, make_user, monkeypatch):
+    alice, bob = make_user('alice'), make_user('bob')
+    ids = [send(db.session, alice, bob, f'Hi {n}') for n in range(2)]
+
+    between = Conversation.between
+
+    def between_then_send(user_id, other_id):
+        # Another request sends a message after the conversation row is loaded
+        conversation = between(user_id, other_id)
+        with Session(db.engine) as other:
+            send(other, alice, bob, 'Late')
+        return conversation
+
+    monkeypatch.setattr(Conversation, 'between', staticmethod(between_then_send))
+    assert mark_conversation_read(bob.id, alice.id, up_to_id=ids[1]) == 2
+    monkeypatch.undo()
+
+    db.session.expire_all()
+    assert Conversation.between(alice.id, bob.id).unread_for(bob.id) == 1
+    assert Message.query.filter_by(recipient_id=bob.id, read=False).count() == 1
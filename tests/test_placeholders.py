@@ -0,0 +1,28 @@
+import os
+from PIL import Image
+from models import db
+from models.blob import Blob
+from models.post import Post
+from handlers.media_handler import backfill_placeholders
+from utils.image_pipeline import responsive_image
+
+def test_backfill_fills_legacy_post_and_its_blob(app, make_user, tmp_path):
+    app.static_folder = str(tmp_path / 'static')
+    folder = tmp_path / 'static' / 'img' / 'post_images'
+    os.makedirs(folder)
+    Image.new('RGB', (300, 200), 'red').save(folder / 'legacy.jpg')
+
+    author = make_user('alice')
+    post = Post(content='Old upload', user_id=author.id, image='legacy.jpg')
+    db.session.add_all([post, Blob(namespace='post_images', digest='0' * 64, filename='legacy.jpg', size=1)])
+    db.session.commit()
+
+    assert backfill_placeholders() == 1
+    blob = Blob.query.filter_by(filename='legacy.jpg').one()
+    assert (post.image_width, post.image_height) == (blob.width, blob.height) == (300, 200)
+    assert post.image_placeholder and blob.placeholder == post.image_placeholder
+
+    with app.test_request_context():
+        html = responsive_image(post)
+    assert 'width="300" height="200"' in html
+    assert f'style="background: url({post.image_placeholder})' in html
@@ -0,0 +1,29 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask_login import login_user
+from werkzeug.datastructures import FileStorage
+from models.post import Post
+from routes.feed_routes import PostForm
+from handlers.feed_handler import create_post_handler
+from utils import image_pipeline
+
+def test_unreadable_image_is_reported_on_the_form(app, make_user, tmp_path, monkeypatch):
+    app.static_folder = str(tmp_path / 'static')
+    # Worker processes forked under the test run's eventlet hub hang; decode in a thread
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(image_pipeline, '_executor', executor)
+    author = make_user('alice')
+    upload = FileStorage(io.BytesIO(b'not really a jpeg'), filename='photo.jpg', content_type='image/jpeg')
+
+    with app.test_request_context(method='POST', data={'content': 'Look', 'image': upload}):
+        login_user(author)
+        form = PostForm()
+        assert create_post_handler(form) is None
+        assert form.image.errors
+        assert form.image.data is None
+
+    executor.shutdown()
+    assert Post.query.count() == 0
+    # Nothing but empty shard directories is left behind
+    assert not [name for _, _, names in os.walk(tmp_path / 'static') for name in names]
@@ -0,0 +1,104 @@
+"""
+Check that the hot queries are served by indexes.
+
+Each case runs one handler against a scratch database with a few rows
+seeded, captures the SQL it issues and runs ``EXPLAIN QUERY PLAN`` on every
+statement. A statement that scans a table instead of searching an index
+fails, so a dropped index or a rewritten query that no longer matches one
+is caught before it reaches production.
+"""
+
+from contextlib import contextmanager
+import pytest
+from flask_login import login_user
+from sqlalchemy import Select, event
+from models import db
+from models.post import Post, Like
+from models.comment import Comment
+from models.message import Message
+from models.friendship import FriendRequest, Follow, Friendship
+from handlers import message_handler, friendship_handler, feed_handler, timeline_handler, ranking_handler
+from handlers.badge_counter import badge_counter
+from sub.socket_events import get_user_active_conversations
+
+# (name, run(seed)); a returned Select is executed too
+HOT_QUERIES = [
+    ('inbox', lambda seed: message_handler.get_received_messages()),
+    ('sent', lambda seed: message_handler.get_sent_messages()),
+    ('conversation', lambda seed: message_handler.get_conversation(seed.other.username)),
+    ('messages api', lambda seed: message_handler.get_messages_api(seed.other.username)),
+    ('older history', lambda seed: message_handler.get_messages_api(seed.other.username, before_id=2)),
+    ('newer messages', lambda seed: message_handler.get_messages_api(seed.other.username, after_id=1)),
+    ('active conversations', lambda seed: get_user_active_conversations(seed.user.id)),
+    ('badge counts', lambda seed: badge_counter._query([seed.user.id, seed.other.id])),
+    ('friend requests', lambda seed: friendship_handler.get_friend_requests()),
+    ('followers', lambda seed: friendship_handler.get_followers(seed.other.id)),
+    ('following', lambda seed: friendship_handler.get_following(seed.user.id)),
+    ('post audience', lambda seed: timeline_handler._audience_query(seed.other.id).subquery().select()),
+    ('author affinity', lambda seed: ranking_handler._author_affinities([seed.other.id])),
+    ('comments', lambda seed: feed_handler.get_comments(seed.post.id)),
+]
+
+class Seed:
+    def __init__(self, user, other, post):
+        self.user, self.other, self.post = user, other, post
+
+@pytest.fixture
+def seed(app, make_user):
+    """Create a few users with a little of everything between them."""
+    alice, bob, carol = make_user('alice'), make_user('bob'), make_user('carol')
+    post = Post(content='Query plan check', user_id=bob.id)
+    db.session.add(post)
+    db.session.commit()
+
+    db.session.add_all([
+        Message(content='Hi', sender_id=alice.id, recipient_id=bob.id),
+        Message(content='Hello', sender_id=bob.id, recipient_id=alice.id),
+        Message(content='Hey', sender_id=carol.id, recipient_id=alice.id),
+        FriendRequest(sender_id=carol.id, recipient_id=alice.id),
+        Follow(follower_id=alice.id, followed_id=bob.id),
+        Friendship(user_id=alice.id, friend_id=bob.id),
+        Friendship(user_id=bob.id, friend_id=alice.id),
+        Like(user_id=alice.id, post_id=post.id),
+        Comment(content='Nice', user_id=alice.id, post_id=post.id),
+    ])
+    db.session.commit()
+    return Seed(alice, bob, post)
+
+@contextmanager
+def capture():
+    """Collect the ``(statement, parameters)`` of every query issued."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+def table_scans(connection, statement, parameters):
+    """Return the plan lines of a statement that read a whole table."""
+    tables = set(db.metadata.tables)
+    plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    # "SCAN <subquery alias>" reads an already-narrowed intermediate result
+    return [row[3] for row in plan if row[3].startswith('SCAN ') and row[3].split()[1] in tables]
+
+@pytest.mark.parametrize('run', [run for _, run in HOT_QUERIES], ids=[name for name, _ in HOT_QUERIES])
+def test_hot_query_uses_indexes(app, seed, run):
+    with app.test_request_context():
+        login_user(seed.user)
+        with capture() as statements:
+            result = run(seed)
+            if isinstance(result, Select):
+                db.session.execute(result).all()
+        db.session.rollback()
+
+    assert statements
+    with db.engine.connect() as connection:
+        scans = {' '.join(statement.split()): table_scans(connection, statement, parameters)
+                 for statement, parameters in statements}
+    assert not {statement: plan for statement, plan in scans.items() if plan}
@@ -0,0 +1,43 @@
+import pytest
+from flask_login import login_user
+from models import db
+from models.post import Post
+from handlers.ranking_handler import get_ranked_posts, initial_score, ranking_job
+from sub.socket_events import socketio
+
+class Stop(Exception):
+    pass
+
+def test_first_ranked_read_starts_the_rescoring_loop(app, make_user, monkeypatch):
+    started = []
+    monkeypatch.setattr(ranking_job, '_running', False)
+    monkeypatch.setattr(socketio, 'start_background_task', lambda target: started.append(target))
+
+    with app.test_request_context():
+        login_user(make_user('alice'))
+        get_ranked_posts()
+        get_ranked_posts()
+    assert started == [ranking_job._run]
+
+def test_rescoring_loop_ranks_engaged_posts_up(app, make_user, monkeypatch):
+    author = make_user('alice')
+    posts = [Post(content=f'Post {n}', user_id=author.id) for n in range(2)]
+    db.session.add_all(posts)
+    db.session.commit()
+    for post in posts:
+        post.score = initial_score(post)
+    db.session.commit()
+    older, newer = posts
+
+    Post.adjust_counters(older.id, likes=50, comments=10)
+    db.session.commit()
+
+    def sleep(seconds):
+        raise Stop()
+    monkeypatch.setattr(socketio, 'sleep', sleep)
+    monkeypatch.setattr(ranking_job, '_app', app)
+    with pytest.raises(Stop):
+        ranking_job._run()
+
+    db.session.expire_all()
+    assert older.score > newer.score
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+import pytest
+from models import db
+from models.post import Post
+from models.friendship import Follow
+from models.timeline import TimelineEntry
+from handlers.timeline_handler import fan_out_post, get_timeline, prune_timeline
+
+@pytest.fixture
+def author(app, make_user):
+    """An author followed by three users, pulled above two followers, pushed again at one."""
+    app.config.update(FEED_FANOUT_THRESHOLD=2, FEED_FANOUT_RESUME_THRESHOLD=1)
+    author = make_user('author')
+    for name in ('f1', 'f2', 'f3'):
+        db.session.add(Follow(follower_id=make_user(name).id, followed_id=author.id))
+    db.session.commit()
+    return author
+
+def post(author, content):
+    created_at = datetime(2024, 1, 1) + timedelta(minutes=Post.query.count())
+    post = Post(content=content, user_id=author.id, created_at=created_at)
+    db.session.add(post)
+    db.session.commit()
+    fan_out_post(post)
+    return post
+
+def unfollow(author, username):
+    follow = Follow.query.join(Follow.follower).filter_by(username=username).one()
+    follower_id = follow.follower_id
+    db.session.delete(follow)
+    db.session.commit()
+    prune_timeline(follower_id, author.id)
+
+def timeline(username):
+    user_id = Follow.query.join(Follow.follower).filter_by(username=username).one().follower_id
+    return [post.content for post in get_timeline(user_id, per_page=50).items]
+
+def pushed(username):
+    user_id = Follow.query.join(Follow.follower).filter_by(username=username).one().follower_id
+    return TimelineEntry.query.filter_by(user_id=user_id).count()
+
+def test_pulled_posts_are_pushed_when_the_author_drops_back(author):
+    post(author, 'p0')
+    assert author.fanout_on_read and pushed('f1') == 0
+
+    # Between the two thresholds the author stays pulled
+    unfollow(author, 'f3')
+    post(author, 'p1')
+    assert author.fanout_on_read and pushed('f1') == 0
+
+    unfollow(author, 'f2')
+    post(author, 'p2')
+    assert not author.fanout_on_read
+    assert pushed('f1') == 3
+    assert timeline('f1') == ['p2', 'p1', 'p0']
+
+def test_pushed_posts_stay_visible_when_the_author_is_pulled(author, make_user):
+    unfollow(author, 'f3')
+    unfollow(author, 'f2')
+    post(author, 'p0')
+    assert not author.fanout_on_read
+
+    for name in ('f4', 'f5'):
+        db.session.add(Follow(follower_id=make_user(name).id, followed_id=author.id))
+    db.session.commit()
+    post(author, 'p1')
+    assert author.fanout_on_read
+    assert timeline('f1') == ['p1', 'p0']
@@ -0,0 +1,39 @@
+import time
+from models import db
+from models.post import Post
+from models.trending import TrendingSnapshot
+from handlers.feed_handler import bulk_delete_post
+from handlers.trending_handler import TrendingTracker, trending
+
+def test_reading_top_does_not_scan_the_counters(monkeypatch):
+    tracker = TrendingTracker(window=5, top_k=2)
+    now = time.time()
+    for post_id, likes in ((1, 1), (2, 3), (3, 2)):
+        tracker.record(post_id, likes=likes, now=now)
+
+    def tick(now=None):
+        raise AssertionError('top() must leave expiry to the background loop')
+    monkeypatch.setattr(tracker, 'tick', tick)
+    assert [post_id for post_id, _ in tracker.top()] == [2, 3]
+
+def test_tick_expires_minutes_that_left_the_window():
+    tracker = TrendingTracker(window=5, top_k=2)
+    now = time.time()
+    tracker.record(1, likes=1, now=now - 10 * 60)
+    tracker.record(2, likes=1, now=now)
+
+    tracker.tick(now)
+    assert [post_id for post_id, _ in tracker.top()] == [2]
+
+def test_deleting_a_post_deletes_its_snapshot(app, make_user):
+    author = make_user('alice')
+    post = Post(content='Trending', user_id=author.id)
+    db.session.add(post)
+    db.session.commit()
+    db.session.add(TrendingSnapshot(post_id=post.id, score=1.0))
+    trending.record(post.id, likes=1)
+    db.session.commit()
+
+    assert bulk_delete_post(post)
+    assert TrendingSnapshot.query.count() == 0
+    assert trending.top() == []
@@ -0,0 +1,206 @@
+"""
+Static asset bundles.
+`flask build-assets` concatenates, minifies and content-hashes the CSS/JS
+bundles into static/dist and records them in a manifest. Templates resolve
+bundles through ``asset_urls``, which falls back to the individual source
+files when no build exists, e.g. in development.
+"""
+
+import hashlib
+import json
+import os
+import re
+from flask import current_app, request, url_for
+from utils.compression import precompress, ENCODING_SUFFIXES
+from utils.config_utils import load_config, get_config_value
+
+# Bundle name -> source files under static/, in load order
+ASSET_BUNDLES = {
+    'lite.css': ['css/lite-ui.css'],
+    'lite-head.js': ['js/config-loader.js'],
+    'main.css': ['css/main.css'],
+    'dark-theme.css': ['css/dark-theme.css'],
+    'main.js': ['js/main.js', 'js/theme-switcher.js'],
+}
+
+# static/dist sits at the same depth as static/css and static/js, so
+# relative url() references in the stylesheets keep resolving
+DIST_FOLDER = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+_manifest = {'mtime': None, 'bundles': {}}
+
+def _fallback_minify_css(css):
+    """Strip comments and insignificant whitespace from a stylesheet."""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,])\s*', r'\1', css)
+    css = css.replace(';}', '}')
+    return css.strip()
+
+def minify_css(css):
+    """Minify CSS with rcssmin when installed, otherwise a conservative fallback."""
+    if rcssmin is not None:
+        return rcssmin.cssmin(css)
+    return _fallback_minify_css(css)
+
+def minify_js(js):
+    """Minify JavaScript with rjsmin when installed.
+
+    Without it the source is kept as is: unlike CSS, JavaScript cannot be
+    safely minified with regular expressions.
+    """
+    if rjsmin is not None:
+        return rjsmin.jsmin(js)
+    return js
+
+def missing_minifiers():
+    """Report which minifiers are not installed and what the build does instead.
+
+    Returns:
+        list: ``(package, consequence)`` pairs
+    """
+    missing = []
+    if rcssmin is None:
+        missing.append(('rcssmin', 'CSS is minified with the basic fallback'))
+    if rjsmin is None:
+        missing.append(('rjsmin', 'JavaScript is not minified'))
+    return missing
+
+def _dist_folder(app):
+    return os.path.join(app.static_folder, DIST_FOLDER)
+
+def _manifest_path(app):
+    return os.path.join(_dist_folder(app), MANIFEST_NAME)
+
+def build_bundle(app, name, sources, minify):
+    """Concatenate and optionally minify one bundle.
+
+    Returns:
+        str: The bundle contents
+    """
+    parts = []
+    for source in sources:
+        with open(os.path.join(app.static_folder, source), encoding='utf-8') as f:
+            parts.append(f.read())
+
+    if name.endswith('.js'):
+        # Terminate each file so concatenation can't merge statements
+        content = ';\n'.join(parts)
+        return minify_js(content) if minify else content
+
+    content = '\n'.join(parts)
+    return minify_css(content) if minify else content
+
+def build_assets(app):
+    """Build every bundle into static/dist and write the manifest.
+
+    Bundles are named after a hash of their contents, so an unchanged
+    bundle keeps its URL across builds, and each gets precompressed
+    .gz/.br siblings. Files from the previous build are kept for pages
+    that still reference them; older ones are removed.
+
+    Returns:
+        dict: Bundle name -> hashed filename
+    """
+    config = load_config()
+    minify = {
+        'css': get_config_value(config, 'performance.minification.css', True),
+        'js': get_config_value(config, 'performance.minification.js', True)
+    }
+
+    folder = _dist_folder(app)
+    os.makedirs(folder, exist_ok=True)
+    previous = read_manifest(app)
+
+    bundles = {}
+    for name, sources in ASSET_BUNDLES.items():
+        stem, ext = name.rsplit('.', 1)
+        content = build_bundle(app, name, sources, minify[ext]).encode('utf-8')
+        filename = f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}.{ext}"
+        with open(os.path.join(folder, filename), 'wb') as f:
+            f.write(content)
+        precompress(os.path.join(folder, filename))
+        bundles[name] = filename
+
+    # Write the manifest atomically so requests never read a partial one
+    temp_path = _manifest_path(app) + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(bundles, f, indent=2, sort_keys=True)
+    os.replace(temp_path, _manifest_path(app))
+
+    keep = {MANIFEST_NAME}
+    for filename in set(bundles.values()) | set(previous.values()):
+        keep.add(filename)
+        keep.update(filename + suffix for _, suffix in ENCODING_SUFFIXES)
+    for filename in os.listdir(folder):
+        if filename not in keep and os.path.isfile(os.path.join(folder, filename)):
+            os.remove(os.path.join(folder, filename))
+
+    return bundles
+
+def read_manifest(app):
+    """Read the manifest, reloading it only when the file has changed.
+
+    Returns:
+        dict: Bundle name -> hashed filename, empty if nothing was built
+    """
+    try:
+        mtime = os.stat(_manifest_path(app)).st_mtime
+    except OSError:
+        _manifest.update(mtime=None, bundles={})
+        return {}
+
+    if mtime != _manifest['mtime']:
+        try:
+            with open(_manifest_path(app)) as f:
+                bundles = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading asset manifest: {str(e)}")
+            return _manifest['bundles']
+        _manifest.update(mtime=mtime, bundles=bundles)
+    return _manifest['bundles']
+
+def asset_urls(name):
+    """Get the URLs to load a bundle from.
+
+    Args:
+        name (str): Bundle name, a key of ASSET_BUNDLES
+
+    Returns:
+        list: The hashed bundle's URL, or the source files' URLs when the
+        bundle has not been built
+    """
+    filename = read_manifest(current_app).get(name)
+    if filename:
+        return [url_for('static', filename=f"{DIST_FOLDER}/{filename}")]
+    return [url_for('static', filename=source) for source in ASSET_BUNDLES[name]]
+
+def init_app(app):
+    """
+    Expose bundle URLs to templates and cache hashed bundles forever
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    app.jinja_env.globals['asset_urls'] = asset_urls
+
+    @app.after_request
+    def cache_hashed_assets(response):
+        filename = (request.view_args or {}).get('filename', '')
+        if request.endpoint == 'static' and filename.startswith(DIST_FOLDER + '/') \
+                and not filename.endswith(MANIFEST_NAME) and response.status_code in (200, 304):
+            # The name changes whenever the content does
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
@@ -1,14 +1,13 @@
 import os
-import secrets
 from PIL import Image
-from flask import current_app
+from utils.blob_store import StoredBlob, store_blob, release_blob, namespace_folder, discard_files
+from utils.image_pipeline import make_placeholder
 
-def save_profile_picture(form_picture):
-    """Save user profile picture with a random name."""
-    random_hex = secrets.token_hex(8)
+def _write_profile_picture(form_picture, folder, stem):
+    """Resize an uploaded profile picture and write it to the blob folder."""
     _, f_ext = os.path.splitext(form_picture.filename)
-    picture_fn = random_hex + f_ext
-    picture_path = os.path.join(current_app.root_path, 'static/img/profile_pics', picture_fn)
+    picture_fn = stem + f_ext.lower()
+    picture_path = os.path.join(folder, picture_fn)
     
     # Resize image to save space and improve load time
     output_size = (150, 150)
@@ -16,4 +15,21 @@ def save_profile_picture(form_picture):
     i.thumbnail(output_size)
     i.save(picture_path)
     
-    return picture_fn
+    return StoredBlob(picture_fn, None, i.width, i.height, make_placeholder(i))
+
+def save_profile_picture(form_picture):
+    """Save user profile picture, reusing an identical upload if one is stored.
+
+    Returns:
+        StoredBlob: The stored picture with its size and placeholder
+    """
+    return store_blob('profile_pics', form_picture, _write_profile_picture)
+
+def release_profile_picture(picture_fn):
+    """Drop a user's reference to a profile picture. The caller commits.
+
+    Pictures stored before the blob store existed, such as the default
+    image, are never removed.
+    """
+    if picture_fn and release_blob('profile_pics', picture_fn):
+        discard_files([os.path.join(namespace_folder('profile_pics'), picture_fn)])
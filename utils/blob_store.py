@@ -0,0 +1,167 @@
+"""
+Content-addressed, reference-counted upload storage.
+Uploads are keyed by a SHA-256 of the finished upload, read in chunks before
+anything is written, so identical files are written to disk once and shared by
+every record using them.
+Files are spread over two levels of hash-prefix directories, e.g.
+``3f/a2/<name>``, and stored filenames include that prefix.
+"""
+
+import glob
+import hashlib
+import os
+import secrets
+from collections import namedtuple
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from models import db
+from models.blob import Blob
+
+# Static subfolder of each public namespace
+NAMESPACE_FOLDERS = {
+    'post_images': 'img/post_images',
+    'profile_pics': 'img/profile_pics'
+}
+
+# Config key of the folder of each private namespace; kept outside static/ so
+# the files can only be fetched through an endpoint that checks access
+PRIVATE_NAMESPACE_FOLDERS = {
+    'message_attachments': 'MESSAGE_ATTACHMENT_FOLDER'
+}
+
+# Where message attachments were stored before they moved out of static/
+LEGACY_ATTACHMENT_FOLDER = 'uploads/message_attachments'
+
+CHUNK_SIZE = 64 * 1024
+
+# What a writer stored; width, height and placeholder are only set for images
+StoredBlob = namedtuple('StoredBlob', ['filename', 'variants', 'width', 'height', 'placeholder'],
+                        defaults=(None, None, None))
+PENDING_REMOVALS = 'blob_store_pending_removals'
+
+def shard_dir(stem):
+    """Return the ``ab/cd`` directory a file with this stem is stored in."""
+    digest = hashlib.sha1(stem.encode('utf-8')).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}"
+
+def namespace_folder(namespace):
+    """Return the absolute directory files of a namespace are stored in."""
+    if namespace in PRIVATE_NAMESPACE_FOLDERS:
+        folder = current_app.config[PRIVATE_NAMESPACE_FOLDERS[namespace]]
+    else:
+        folder = os.path.join(current_app.static_folder, NAMESPACE_FOLDERS[namespace])
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+def hash_upload(upload):
+    """Compute the SHA-256 and size of an upload without writing it anywhere.
+
+    The stream is read in chunks and rewound afterwards.
+
+    Returns:
+        tuple: ``(hex digest, size in bytes)``
+    """
+    stream = upload.stream
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return digest.hexdigest(), size
+
+def store_blob(namespace, upload, write):
+    """Store an upload, or add a reference to an identical one already stored.
+
+    Args:
+        namespace (str): Upload kind, a key of NAMESPACE_FOLDERS or
+            PRIVATE_NAMESPACE_FOLDERS
+        upload: The uploaded FileStorage
+        write: ``write(upload, folder, stem) -> (filename, variants[, width,
+            height, placeholder])``, called only when the content is new; it
+            writes the file(s) named after ``stem`` into ``folder``, the
+            blob's shard directory, and the shard prefix is added to the
+            returned filename
+
+    Returns:
+        StoredBlob: The stored blob
+    """
+    digest, size = hash_upload(upload)
+
+    existing = Blob.query.filter_by(namespace=namespace, digest=digest).first()
+    if existing is not None:
+        # Only while still referenced: if the last reference was released
+        # meanwhile, the row and file are being deleted, so store a new copy
+        claimed = Blob.query.filter(Blob.id == existing.id, Blob.ref_count > 0)\
+            .update({Blob.ref_count: Blob.ref_count + 1}, synchronize_session=False)
+        if claimed:
+            return StoredBlob(existing.filename, existing.variants, existing.width,
+                              existing.height, existing.placeholder)
+
+    stem = secrets.token_hex(16)
+    shard = shard_dir(stem)
+    folder = os.path.join(namespace_folder(namespace), shard)
+    os.makedirs(folder, exist_ok=True)
+    written = StoredBlob(*write(upload, folder, stem))
+    written = written._replace(filename=f"{shard}/{written.filename}")
+
+    # Insert, or count a reference if a concurrent upload stored the same bytes first
+    statement = insert(Blob).values(
+        namespace=namespace, digest=digest, size=size, ref_count=1, created_at=datetime.utcnow(),
+        **written._asdict()
+    ).on_conflict_do_update(
+        index_elements=[Blob.namespace, Blob.digest],
+        set_={'ref_count': Blob.ref_count + 1}
+    ).returning(Blob.filename, Blob.variants, Blob.width, Blob.height, Blob.placeholder)
+    stored = StoredBlob(*db.session.execute(statement).one())
+
+    if stored.filename != written.filename:
+        discard_files(glob.glob(os.path.join(glob.escape(folder), stem + '*')))
+    return stored
+
+def release_blob(namespace, filename):
+    """Drop one reference to a stored file. The caller commits.
+
+    Returns:
+        True if that was the last reference and the file(s) may be removed,
+        False if the file is still referenced, or None if the file was stored
+        before the blob store existed and is not tracked.
+    """
+    blob = Blob.query.filter_by(namespace=namespace, filename=filename).first()
+    if blob is None:
+        return None
+
+    Blob.query.filter_by(id=blob.id)\
+        .update({Blob.ref_count: Blob.ref_count - 1}, synchronize_session=False)
+    deleted = Blob.query.filter(Blob.id == blob.id, Blob.ref_count <= 0)\
+        .delete(synchronize_session=False)
+    return deleted > 0
+
+def discard_files(paths):
+    """Remove files once the current transaction commits; forget them on rollback."""
+    if paths:
+        db.session.info.setdefault(PENDING_REMOVALS, []).extend(paths)
+
+def remove_files(paths):
+    """Remove files from the filesystem if they still exist."""
+    for path in paths:
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            print(f"Error removing file {path}: {str(e)}")
+
+@event.listens_for(Session, 'after_commit')
+def _remove_discarded_files(session):
+    paths = session.info.pop(PENDING_REMOVALS, None)
+    if paths:
+        # Off the request: the commit has already made the removal safe
+        from sub.socket_events import socketio
+        socketio.start_background_task(remove_files, paths)
+
+@event.listens_for(Session, 'after_rollback')
+def _keep_discarded_files(session):
+    session.info.pop(PENDING_REMOVALS, None)
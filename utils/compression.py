@@ -0,0 +1,182 @@
+"""
+Response compression.
+Negotiates brotli or gzip per request from Accept-Encoding, following
+config.json's performance.compression settings. Static files are served
+from .br/.gz siblings written at build time rather than compressed per
+request, and streamed responses are compressed chunk by chunk.
+"""
+
+import gzip
+import os
+import zlib
+from flask import current_app, g, request, send_file
+from werkzeug.security import safe_join
+from utils.config_utils import load_config, get_config_value
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript',
+    'application/javascript', 'application/json', 'application/xml',
+    'image/svg+xml'
+}
+
+# Sibling file extension of each encoding, in server preference order
+ENCODING_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+
+def available_encodings():
+    """Return the encodings this server can produce, preferred first."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def negotiate_encoding(encodings=None):
+    """Pick the best encoding the client accepts, or None."""
+    return request.accept_encodings.best_match(encodings or available_encodings())
+
+def _settings():
+    config = getattr(g, 'config', None) or load_config()
+    return (
+        get_config_value(config, 'performance.compression.enabled', False),
+        get_config_value(config, 'performance.compression.level', 6),
+        get_config_value(config, 'performance.compression.brotliQuality', 4)
+    )
+
+def compress(data, encoding, level=6, brotli_quality=4):
+    """Compress a complete body with gzip or brotli."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+def _compressor(encoding, level, brotli_quality):
+    """Return ``(compress, flush, finish)`` callables for incremental compression."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=brotli_quality)
+        return compressor.process, compressor.flush, compressor.finish
+
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+def compress_stream(chunks, encoding, level=6, brotli_quality=4):
+    """Compress an iterable of chunks without buffering the whole body.
+
+    Each chunk is flushed as it is produced, so a client reading a slow
+    stream still sees data as soon as the application yields it.
+    """
+    process, flush, finish = _compressor(encoding, level, brotli_quality)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = process(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+def precompress(path, level=9, brotli_quality=11):
+    """Write .gz (and .br when brotli is installed) siblings of a static file.
+
+    Returns:
+        list: Paths of the files written
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    written = []
+    for encoding, suffix in ENCODING_SUFFIXES:
+        if encoding not in available_encodings():
+            continue
+        compressed = compress(data, encoding, level, brotli_quality)
+        if len(compressed) >= len(data):
+            continue
+        with open(path + suffix, 'wb') as f:
+            f.write(compressed)
+        written.append(path + suffix)
+    return written
+
+def _add_vary(response):
+    response.vary.add('Accept-Encoding')
+
+def _precompressed_response(response):
+    """Swap a static file response for its precompressed sibling, if one exists."""
+    filename = (request.view_args or {}).get('filename')
+    if not filename or request.range:
+        return None
+
+    # The static route refuses unsafe paths itself, but only with a 404
+    path = safe_join(current_app.static_folder, filename)
+    if path is None:
+        return None
+    encodings = [encoding for encoding, suffix in ENCODING_SUFFIXES if os.path.isfile(path + suffix)]
+    encoding = negotiate_encoding(encodings) if encodings else None
+    if encoding is None:
+        return None
+
+    sibling = send_file(path + dict(ENCODING_SUFFIXES)[encoding], mimetype=response.mimetype,
+                        conditional=True)
+    sibling.headers['Content-Encoding'] = encoding
+    if 'Cache-Control' in response.headers:
+        sibling.headers['Cache-Control'] = response.headers['Cache-Control']
+    return sibling
+
+def compress_response(response):
+    """Compress a response in place when the client and content allow it."""
+    enabled, level, brotli_quality = _settings()
+    if not enabled or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    _add_vary(response)
+    if response.status_code < 200 or response.status_code in (204, 206, 304) \
+            or 'Content-Encoding' in response.headers or request.method == 'HEAD':
+        return response
+
+    if request.endpoint == 'static':
+        if response.status_code != 200:
+            # Only a file the static route actually served has a sibling to swap in
+            return response
+        sibling = _precompressed_response(response)
+        if sibling is None:
+            return response
+        _add_vary(sibling)
+        response.close()
+        return sibling
+
+    if response.direct_passthrough:
+        # Other file responses may be ranged or conditional; leave them alone
+        return response
+
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, level, brotli_quality)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < current_app.config.get('COMPRESSION_MIN_SIZE', 1024):
+            return response
+        compressed = compress(data, encoding, level, brotli_quality)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+
+    response.headers['Content-Encoding'] = encoding
+    if response.headers.get('ETag'):
+        # A different representation needs a different validator
+        response.set_etag(f"{response.get_etag()[0]}-{encoding}", weak=True)
+    return response
+
+def init_app(app):
+    """
+    Compress responses after each request
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    app.after_request(compress_response)
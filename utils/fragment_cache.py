@@ -0,0 +1,163 @@
+"""
+Rendered fragment cache for post cards.
+Caches viewer-neutral post card markup keyed by (post id, post version).
+"""
+
+import re
+import secrets
+import threading
+from collections import OrderedDict
+from flask import render_template
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+
+POST_CARD_TEMPLATE = 'lite/feed/_post_card.html'
+
+# Per-viewer slots of a card, emitted by the template as {{ slot.<name> }};
+# "owner" ... "end_owner" wraps the markup only the post's author sees
+SLOTS = ('csrf_token', 'liked_class', 'like_icon', 'owner', 'end_owner')
+
+class FragmentCache:
+    """In-process LRU cache of rendered HTML bounded by a byte budget."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached fragment for a key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, html):
+        """Store a fragment, evicting least recently used entries over budget.
+
+        The fragment is markup, or a sequence of markup pieces.
+        """
+        pieces = [html] if isinstance(html, str) else html
+        cost = sum(len(piece.encode('utf-8')) for piece in pieces)
+        if cost > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+
+            self._entries[key] = (html, cost)
+            self.size += cost
+
+            while self.size > self.max_bytes:
+                _, (_, evicted_cost) = self._entries.popitem(last=False)
+                self.size -= evicted_cost
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached fragment."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """Return hit/miss counters and current usage."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes
+            }
+
+post_card_cache = FragmentCache(8 * 1024 * 1024)
+
+def render_card_pieces(post):
+    """Render a viewer-neutral post card split around its per-viewer slots.
+
+    The slots are rendered as sentinels carrying a random per-render nonce
+    and the markup is split on exactly those, so text in the post that
+    looks like a slot is never substituted.
+
+    Returns:
+        tuple: Literal markup at even indexes, slot names at odd indexes
+    """
+    nonce = secrets.token_hex(8)
+    slot = {name: f'@@{nonce}:{name}@@' for name in SLOTS}
+    html = render_template(POST_CARD_TEMPLATE, post=post, slot=slot)
+    return tuple(re.split(f'@@{nonce}:({"|".join(SLOTS)})@@', html))
+
+def fill_viewer_state(pieces, post, viewer_id, csrf_token):
+    """Fill the per-viewer slots of a cached post card.
+
+    Args:
+        pieces: Split card from ``render_card_pieces``
+        post: The Post the card renders; ``liked_by_viewer`` must be set
+        viewer_id: ID of the viewing user
+        csrf_token (str): The viewer's CSRF token
+
+    Returns:
+        str: Markup ready to be sent to this viewer
+    """
+    is_owner = post.user_id == viewer_id
+    liked = getattr(post, 'liked_by_viewer', False)
+    values = {
+        'csrf_token': csrf_token,
+        'liked_class': 'text-primary' if liked else '',
+        'like_icon': 'fas' if liked else 'far'
+    }
+
+    html = []
+    hidden = False
+    for index, piece in enumerate(pieces):
+        if index % 2 == 0:
+            if not hidden:
+                html.append(piece)
+        elif piece == 'owner':
+            hidden = not is_owner
+        elif piece == 'end_owner':
+            hidden = False
+        elif not hidden:
+            html.append(values[piece])
+    return ''.join(html)
+
+def render_post_card(post):
+    """Render a post card through the fragment cache.
+
+    The markup is shared across viewers and keyed by ``(post.id,
+    post.version)``; the version is bumped whenever anything shown on the
+    card changes, so stale entries are simply never looked up again.
+    """
+    if getattr(post, 'viewer_pending', False):
+        # The card shows the viewer's unflushed like; don't share that markup
+        pieces = render_card_pieces(post)
+    else:
+        key = (post.id, post.version)
+        pieces = post_card_cache.get(key)
+        if pieces is None:
+            pieces = render_card_pieces(post)
+            post_card_cache.set(key, pieces)
+
+    return Markup(fill_viewer_state(pieces, post, current_user.id, generate_csrf()))
+
+def init_app(app):
+    """
+    Configure the post card cache and expose it to templates
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    post_card_cache.max_bytes = app.config.get('FRAGMENT_CACHE_MAX_BYTES', post_card_cache.max_bytes)
+    app.jinja_env.globals['render_post_card'] = render_post_card
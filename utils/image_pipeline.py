@@ -0,0 +1,328 @@
+"""
+Responsive image pipeline for post uploads.
+Decodes each upload once and writes WebP and JPEG variants at several widths,
+plus a data-saver variant that follows config.json's app.dataSaver settings.
+"""
+
+import atexit
+import base64
+import glob
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, g, url_for
+from markupsafe import Markup, escape
+from PIL import Image, ImageOps
+from utils.blob_store import StoredBlob, remove_files
+from utils.config_utils import load_config, get_config_value
+
+POST_IMAGE_FOLDER = 'img/post_images'
+SAVER_SUFFIX = 'ds'
+PLACEHOLDER_SIZE = 16
+
+# (file extension, Pillow format, MIME type); the last one is the <img> fallback
+FORMATS = (
+    ('webp', 'WEBP', 'image/webp'),
+    ('jpg', 'JPEG', 'image/jpeg'),
+)
+
+_executor = None
+
+def _get_executor():
+    """Create the worker pool on first use and shut it down at interpreter exit."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=current_app.config.get('IMAGE_PIPELINE_WORKERS', 2))
+        atexit.register(_executor.shutdown)
+    return _executor
+
+def variant_name(stem, width, ext):
+    """Build the filename of one variant, e.g. ``3f2a_640.webp`` or ``3f2a_ds.jpg``."""
+    return f"{stem}_{width}.{ext}"
+
+def _save_variant(image, path, image_format, quality):
+    if image_format == 'JPEG':
+        image.save(path, image_format, quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(path, image_format, quality=quality, method=4)
+
+def make_placeholder(image):
+    """Encode a tiny blurred stand-in for an image as an inline data URI.
+
+    The longest side is scaled to PLACEHOLDER_SIZE pixels, which encodes to
+    a few hundred bytes of WebP that pages can inline.
+    """
+    small = image.copy()
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.BILINEAR)
+    if small.mode not in ('RGB', 'RGBA'):
+        small = small.convert('RGB')
+    buffer = io.BytesIO()
+    small.save(buffer, 'WEBP', quality=40)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+def render_variants(data, output_dir, stem, widths, quality, saver_width, saver_quality):
+    """Decode an upload once and write all of its variants.
+
+    Runs in a worker process. JPEG draft mode lets libjpeg decode straight
+    to 1/2, 1/4 or 1/8 scale when the largest variant allows it, so a
+    12 MP upload never has to be held at full size. EXIF orientation is
+    applied and then all metadata is dropped.
+
+    Args:
+        data (bytes): The uploaded file
+        output_dir (str): Directory the variants are written to
+        stem (str): Random filename stem shared by the variants
+        widths: Candidate variant widths
+        quality (int): Encoder quality of the regular variants
+        saver_width (int): Maximum width of the data-saver variant
+        saver_quality (int): Encoder quality of the data-saver variant
+
+    Returns:
+        tuple: ``(widths, (width, height), placeholder)`` with the widths
+        actually written, ascending, the intrinsic size of the largest
+        variant and its placeholder data URI
+    """
+    image = Image.open(io.BytesIO(data))
+    largest = max(widths)
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        image = Image.new('RGB', rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel('A'))
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.info = {}
+
+    def scaled(width):
+        if width >= image.width:
+            return image
+        height = max(1, round(image.height * width / image.width))
+        return image.resize((width, height), Image.LANCZOS)
+
+    # Never upscale: widths past the source collapse into one full-size variant
+    written = sorted({width for width in widths if width < image.width} | {min(image.width, largest)})
+    for width in written:
+        variant = scaled(width)
+        for ext, image_format, _ in FORMATS:
+            _save_variant(variant, os.path.join(output_dir, variant_name(stem, width, ext)), image_format, quality)
+
+    saver = scaled(min(saver_width, written[-1]))
+    for ext, image_format, _ in FORMATS:
+        _save_variant(saver, os.path.join(output_dir, variant_name(stem, SAVER_SUFFIX, ext)),
+                      image_format, saver_quality)
+
+    largest_variant = scaled(written[-1])
+    return written, largest_variant.size, make_placeholder(largest_variant)
+
+def render_thumbnail(source_path, output_path, width, height, image_format, quality):
+    """Write a resized copy of an image. Runs in a worker process.
+
+    A height of 0 keeps the aspect ratio; otherwise the image is cropped to
+    fill ``width`` x ``height``. Images are never upscaled.
+    """
+    image = Image.open(source_path)
+    image.draft('RGB', (width, height or width))
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    if image.mode == 'RGBA' and image_format == 'JPEG':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+
+    if height:
+        size = (min(width, image.width), min(height, image.height))
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+    elif width < image.width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+
+    image.info = {}
+    _save_variant(image, output_path, image_format, quality)
+
+def make_thumbnail(source_path, output_path, width, height, image_format):
+    """Render a thumbnail in the worker pool and wait for it."""
+    future = _get_executor().submit(
+        render_thumbnail, source_path, output_path, width, height, image_format,
+        current_app.config.get('THUMBNAIL_QUALITY', 82)
+    )
+    future.result()
+
+def _data_saver_settings():
+    config = getattr(g, 'config', None) or load_config()
+    return (
+        get_config_value(config, 'app.dataSaver.maxImageWidth', 800),
+        get_config_value(config, 'app.dataSaver.imageQuality', 70),
+        get_config_value(config, 'app.dataSaver.enabled', False)
+    )
+
+def process_post_image(upload, folder, stem):
+    """Write an uploaded post image as a set of responsive variants.
+
+    Used as the blob store writer for the ``post_images`` namespace.
+
+    Args:
+        upload: The uploaded FileStorage
+        folder (str): Directory the variants are written to
+        stem (str): Filename stem shared by the variants
+
+    Returns:
+        StoredBlob: The largest JPEG variant as filename, stored as
+        ``Post.image``, the comma-separated widths stored as
+        ``Post.image_widths``, and the image's size and placeholder
+
+    Raises:
+        OSError: The upload is not an image Pillow can decode
+    """
+
+    saver_width, saver_quality, _ = _data_saver_settings()
+
+    future = _get_executor().submit(
+        render_variants,
+        upload.read(),
+        folder,
+        stem,
+        tuple(current_app.config.get('IMAGE_VARIANT_WIDTHS', (320, 640, 960, 1280))),
+        current_app.config.get('IMAGE_QUALITY', 80),
+        saver_width,
+        saver_quality
+    )
+    try:
+        widths, (width, height), placeholder = future.result()
+    except Exception:
+        # Not an image Pillow can decode; drop any variant written before it failed
+        remove_files(glob.glob(os.path.join(glob.escape(folder), stem + '_*')))
+        raise
+    return StoredBlob(variant_name(stem, widths[-1], 'jpg'), ','.join(str(width) for width in widths),
+                      width, height, placeholder)
+
+def parse_widths(image_widths):
+    """Parse a stored ``Post.image_widths`` value into a list of ints."""
+    if not image_widths:
+        return []
+    return [int(width) for width in image_widths.split(',')]
+
+def image_stem(filename, image_widths):
+    """Recover the variant stem from the stored largest-variant filename."""
+    return filename.rsplit('_', 1)[0] if image_widths else None
+
+def variant_paths(filename, image_widths):
+    """List every file on disk that belongs to a post image.
+
+    Args:
+        filename (str): ``Post.image``
+        image_widths (str): ``Post.image_widths``; None for legacy uploads
+
+    Returns:
+        list: Absolute paths of the image files
+    """
+    folder = os.path.join(current_app.static_folder, POST_IMAGE_FOLDER)
+    stem = image_stem(filename, image_widths)
+    if stem is None:
+        return [os.path.join(folder, filename)]
+
+    names = [variant_name(stem, width, ext)
+             for width in parse_widths(image_widths) + [SAVER_SUFFIX]
+             for ext, _, _ in FORMATS]
+    return [os.path.join(folder, name) for name in names]
+
+def placeholder_style(placeholder):
+    """Render a ``style`` attribute painting a placeholder behind an image.
+
+    Returns:
+        Markup: The attribute, or an empty string without a placeholder
+    """
+    if not placeholder:
+        return Markup('')
+    return Markup(f'style="background: url({escape(placeholder)}) center / cover no-repeat"')
+
+def _size_attributes(width, height):
+    if not width or not height:
+        return ''
+    return f' width="{int(width)}" height="{int(height)}"'
+
+def _variant_url(stem, width, ext):
+    return url_for('media.media_file', namespace='post_images', filename=variant_name(stem, width, ext))
+
+def _default_width(widths):
+    return min(widths, key=lambda width: abs(width - 640))
+
+def post_image_url(post):
+    """URL of one JPEG of a post image, for clients that render a plain ``<img>``.
+
+    Returns:
+        str: The URL, or None if the post has no image
+    """
+    if not post.image:
+        return None
+    widths = parse_widths(post.image_widths)
+    if not widths:
+        return url_for('media.media_file', namespace='post_images', filename=post.image)
+    return _variant_url(image_stem(post.image, post.image_widths), _default_width(widths), FORMATS[-1][0])
+
+def responsive_image(post, sizes='(max-width: 768px) 100vw, 680px', css_class='post-image', alt='Post image'):
+    """Render a post image as a ``<picture>`` with WebP/JPEG ``srcset``.
+
+    Each source also carries a ``data-saver-srcset`` pointing at the
+    data-saver variant, which the client switches to in data saver mode.
+    When data saver is enabled site-wide it is served directly. The
+    intrinsic size lets the browser reserve the space before the image
+    loads, with the inline placeholder painted there meanwhile.
+
+    Args:
+        post: The Post whose image is rendered
+        sizes (str): The ``sizes`` attribute for width selection
+        css_class (str): Class of the ``<img>`` element
+        alt (str): Alternative text
+
+    Returns:
+        Markup: The HTML, or an empty string if the post has no image
+    """
+    if not post.image:
+        return Markup('')
+
+    widths = parse_widths(post.image_widths)
+    if not widths:
+        # Uploaded before the pipeline existed: a single original file
+        src = url_for('media.media_file', namespace='post_images', filename=post.image)
+        return Markup(f'<img src="{escape(src)}" alt="{escape(alt)}" class="{escape(css_class)}" '
+                      f'loading="lazy" decoding="async"{_size_attributes(post.image_width, post.image_height)} '
+                      f'{placeholder_style(post.image_placeholder)}>')
+
+    stem = image_stem(post.image, post.image_widths)
+    saver_enabled = _data_saver_settings()[2]
+
+    def srcsets(ext):
+        full = ', '.join(f"{_variant_url(stem, width, ext)} {width}w" for width in widths)
+        saver = _variant_url(stem, SAVER_SUFFIX, ext)
+        return (saver if saver_enabled else full), saver
+
+    parts = ['<picture>']
+    for ext, _, mime in FORMATS[:-1]:
+        srcset, saver = srcsets(ext)
+        parts.append(f'<source type="{mime}" srcset="{escape(srcset)}" sizes="{escape(sizes)}" '
+                     f'data-saver-srcset="{escape(saver)}">')
+
+    fallback_ext = FORMATS[-1][0]
+    srcset, saver = srcsets(fallback_ext)
+    parts.append(
+        f'<img src="{escape(_variant_url(stem, _default_width(widths), fallback_ext))}" '
+        f'srcset="{escape(srcset)}" sizes="{escape(sizes)}" data-saver-srcset="{escape(saver)}" '
+        f'alt="{escape(alt)}" class="{escape(css_class)}" loading="lazy" decoding="async"'
+        f'{_size_attributes(post.image_width, post.image_height)} {placeholder_style(post.image_placeholder)}>'
+    )
+    parts.append('</picture>')
+    return Markup(''.join(parts))
+
+def init_app(app):
+    """
+    Expose the responsive image helpers to templates
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    app.jinja_env.globals['responsive_image'] = responsive_image
+    app.jinja_env.globals['placeholder_style'] = placeholder_style
@@ -0,0 +1,108 @@
+"""
+Keyset (cursor) pagination helpers.
+Pages through ordered queries with opaque cursor tokens instead of OFFSET.
+"""
+
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+class CursorPage:
+    """A page of results fetched with keyset pagination.
+
+    Mirrors the parts of Flask-SQLAlchemy's Pagination object that the
+    templates use (``items``, ``has_next``) without a total count.
+    """
+
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+def encode_cursor(*values):
+    """Encode sort key values into an opaque, URL-safe cursor token.
+
+    Args:
+        *values: Sort key values (datetimes, numbers or strings)
+
+    Returns:
+        str: The cursor token
+    """
+    payload = [['dt', value.isoformat()] if isinstance(value, datetime) else value
+               for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Decode a cursor token produced by encode_cursor.
+
+    Args:
+        token (str): The cursor token
+
+    Returns:
+        list: The sort key values, or None if the token is invalid
+    """
+    if not token:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+
+    if not isinstance(payload, list):
+        return None
+
+    values = []
+    for value in payload:
+        if isinstance(value, list):
+            if len(value) != 2 or value[0] != 'dt':
+                return None
+            try:
+                value = datetime.fromisoformat(value[1])
+            except (TypeError, ValueError):
+                return None
+        values.append(value)
+    return values
+
+def paginate_keyset(query, sort_columns, before=None, per_page=10):
+    """Fetch one page of a query in descending keyset order.
+
+    The query is ordered by ``sort_columns`` descending and, when a cursor
+    is given, restricted to rows strictly before it with a row-value
+    comparison that a composite index on the same columns can serve.
+
+    Args:
+        query: The base query
+        sort_columns: Columns forming a unique sort key, e.g. (created_at, id)
+        before (str): Cursor token of the last item of the previous page
+        per_page (int): Number of items per page
+
+    Returns:
+        CursorPage: The page of items and the cursor for the next one
+    """
+    values = decode_cursor(before)
+    if values is not None and len(values) == len(sort_columns):
+        query = query.filter(tuple_(*sort_columns) < tuple(values))
+
+    items = query.order_by(*[column.desc() for column in sort_columns])\
+        .limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor(*[getattr(last, column.key) for column in sort_columns])
+
+    return CursorPage(items, next_cursor)
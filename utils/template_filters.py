@@ -0,0 +1,26 @@
+"""
+Jinja filters shared by the templates.
+"""
+
+def format_datetime(value, format='%b %d, %Y at %I:%M %p'):
+    """Format a timestamp for display, e.g. ``Mar 05, 2024 at 02:30 PM``.
+
+    Args:
+        value (datetime): The timestamp; None renders as an empty string
+        format (str): strftime format
+
+    Returns:
+        str: The formatted timestamp
+    """
+    if value is None:
+        return ''
+    return value.strftime(format)
+
+def init_app(app):
+    """
+    Register the template filters
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    app.jinja_env.filters['datetime'] = format_datetime
@@ -0,0 +1,175 @@
+"""
+On-demand image thumbnails.
+Resized copies of profile pictures and image attachments are rendered on
+first request, kept on disk under a byte budget with least-recently-used
+eviction, and concurrent misses for one thumbnail share a single resize.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from flask import current_app, url_for
+from utils.image_pipeline import make_thumbnail
+
+# (file extension, Pillow format, MIME type)
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpg': ('JPEG', 'image/jpeg'),
+}
+
+DEFAULT_AVATAR = 'default.jpg'
+
+class ThumbnailCache:
+    """Disk cache of rendered thumbnails bounded by a byte budget."""
+
+    def __init__(self, folder=None, max_bytes=256 * 1024 * 1024):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key (relative path) -> size in bytes, oldest first
+        self._inflight = {}            # key -> lock held while the thumbnail is rendered
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        """Configure the cache and index thumbnails left by a previous run."""
+        self.folder = app.config['THUMBNAIL_CACHE_FOLDER']
+        self.max_bytes = app.config.get('THUMBNAIL_CACHE_MAX_BYTES', self.max_bytes)
+        os.makedirs(self.folder, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for root, _, names in os.walk(self.folder):
+            for name in names:
+                path = os.path.join(root, name)
+                if name.endswith('.tmp'):
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+                files.append((stat.st_mtime, os.path.relpath(path, self.folder), stat.st_size))
+
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            for _, key, size in sorted(files):
+                self._entries[key] = size
+                self.size += size
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used thumbnails until under budget. Caller holds the lock."""
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.folder, key))
+            except OSError as e:
+                print(f"Error evicting thumbnail {key}: {str(e)}")
+
+    def _hit(self, key):
+        """Mark a thumbnail as used. Caller holds the lock."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+        return False
+
+    def get_or_create(self, key, render):
+        """Return the path of a cached thumbnail, rendering it on a miss.
+
+        Only one caller renders a given key; concurrent callers wait for
+        it and then read the same file.
+
+        Args:
+            key (str): Path of the thumbnail relative to the cache folder
+            render: ``render(output_path)``, writes the thumbnail
+
+        Returns:
+            str: Absolute path of the thumbnail
+        """
+        path = os.path.join(self.folder, key)
+        with self._lock:
+            if self._hit(key):
+                return path
+            lock = self._inflight.setdefault(key, threading.Lock())
+
+        with lock:
+            with self._lock:
+                if self._hit(key):
+                    return path
+                self.misses += 1
+
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = path + '.tmp'
+                render(temp_path)
+                os.replace(temp_path, path)
+                size = os.path.getsize(path)
+                with self._lock:
+                    self._entries[key] = size
+                    self.size += size
+                    self._evict()
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+        return path
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+thumbnail_cache = ThumbnailCache()
+
+def thumbnail(source_path, namespace, filename, width, height, ext):
+    """Get a thumbnail of a stored image, rendering it on first request.
+
+    Returns:
+        str: Absolute path of the thumbnail
+    """
+    key = os.path.join(namespace, f"{width}x{height}", f"{filename}.{ext}")
+    image_format = THUMBNAIL_FORMATS[ext][0]
+    return thumbnail_cache.get_or_create(
+        key, lambda output_path: make_thumbnail(source_path, output_path, width, height, image_format)
+    )
+
+def thumbnail_url(namespace, filename, width, height=0):
+    """URL of a stored image's thumbnail at an allowed size."""
+    return url_for('thumbnails.public_thumbnail', width=width, height=height,
+                   namespace=namespace, filename=filename)
+
+def avatar_url(user, size):
+    """URL of a user's profile picture sized for a ``size`` px square.
+
+    Picks the smallest allowed square of at least twice the size, so the
+    avatar stays sharp on high-density screens.
+
+    Args:
+        user: The User, or None for the default picture
+        size (int): Displayed width and height in CSS pixels
+    """
+    squares = sorted(width for width, height in current_app.config['THUMBNAIL_SIZES'] if width == height)
+    width = next((width for width in squares if width >= 2 * size), squares[-1])
+    filename = (user.profile_image if user is not None else None) or DEFAULT_AVATAR
+    return thumbnail_url('profile_pics', filename, width, width)
+
+def init_app(app):
+    """
+    Set up the thumbnail cache and expose thumbnail URLs to templates
+
+    Args:
+        app (Flask): The Flask application instance
+    """
+    thumbnail_cache.init_app(app)
+    app.jinja_env.globals['thumbnail_url'] = thumbnail_url
+    app.jinja_env.globals['avatar_url'] = avatar_url